@@ -1,427 +1,306 @@
 import streamlit as st
-import json
-import re
 import os
-import requests
-from bs4 import BeautifulSoup
-import pdfplumber
-import io
-import pandas as pd
-from collections import defaultdict
-from typing import List, Dict, Any
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional, Tuple
 from datetime import datetime
 
-# ==========================================
-# 1. 設定・定数定義
-# ==========================================
-# ローカル実行時はファイルが作成されますが、Streamlit Cloudではセッションが切れると削除されます。
-DATASET_PATH = "incident_dataset.json"
-CHECKLISTS_PATH = "generated_checklists.json"
-
-# ★★★★★ ここがスクレイピングのターゲットURLです ★★★★★
-TARGET_URLS = [
-    "https://www.med-safe.jp/report/index.html",  # 医療安全情報（主にPDFリンク集）
-    "https://www.med-safe.jp/medical_safety/index.html",  # 医療事故情報収集等事業
-]
-
-# 修正1: 脳神経外科特有の処置と管理項目を追加
-PROCEDURES = {
-    "患者確認・指導": ["患者", "確認", "指導", "説明", "同意", "アレルギー"],
-    "採血": ["採血", "血液", "静脈", "血管", "穿刺"],
-    "輸血": ["輸血", "血液製剤", "血液型", "ポンピング"],
-    "点滴・薬剤": ["点滴", "輸液", "IV", "薬剤投与", "シリンジポンプ", "輸液ポンプ", "抗凝固薬", "抗てんかん薬"],
-    "手術": ["手術", "オペ", "術中", "麻酔", "執刀", "ガーゼカウント"],
-    "内視鏡": ["内視鏡", "胃カメラ", "大腸", "スコープ", "CF", "GF"],
-    "気管挿管": ["挿管", "気道", "換気", "チューブ", "抜管"],
-    "中心静脈カテーテル": ["CVC", "中心静脈", "カテーテル", "CV", "ガイドワイヤー"],
-    "ドレナージ管理": ["ドレナージ", "脳室", "腰椎", "シャント", "髄液"],
-    "脳神経外科管理": ["意識レベル", "瞳孔", "麻痺", "頭蓋内圧", "クッシング"],
-}
-
-# チェックリスト項目抽出用キーワード
-ACTION_KEYWORDS = [
-    "確認", "照合", "二重", "固定", "緩める", "実施", "記録", "徹底", "維持", "変更",
-    "抜針", "駆血帯", "止血", "部位", "選択", "アセスメント", "把握", "指示", "遵守",
-    "識別", "注意", "カウント", "測定", "比較", "観察"
-]
-
-# ノイズ除去キーワード (変更なし)
-NOISE_KEYWORDS = [
-    "再発防止に努める", "ご理解いただければ幸い", "情報提供と位置づけ", "施行されている",
-    "再発防止に向けて取り組んでいる姿を", "再発防止に資する", "情報提供と位置づけております",
-    "ヒヤリ・ハット事例収集事業", "資料３", "全般コード化情報", "製造（輸入販売）業者名",
-    "定点医療機関一覧", "平成", "月日現在", "定点医療機関とは", "事故の内容医療",
-    "発生場面", "事例の概要", "全般コード化", "原因分析", "再発防止策", "実施した医療行為の目的",
-    "検討結果", "病院名", "部門名", "職種", "性別", "年齢", "購入年月", "1517", "16",
-    "発生要因", "対応と対策", "経過と結末", "背景要因", "別紙", "参照"
-]
-
-# 修正2: 脳神経外科病棟向けのチェックリスト項目を追加・拡充
-STANDARD_CHECKLIST_ITEMS: Dict[str, List[str]] = {
-    # 既存の項目 (例: 輸血) は維持
-    "輸血": [
-        "【準備】同意書の確認および患者への説明を行いましたか？",
-        "【準備】交差適合試験の結果と血液製剤、指示書の内容（患者氏名、血液型、放射線照射有無）が一致しているか確認しましたか？",
-        "【実施前】患者氏名、ID、血液型、製剤の有効期限、外観（凝集・変色・破損）を医師・看護師の2名で声出し確認しましたか？",
-        "【実施中】投与開始直前および開始後5分、15分にバイタルサインを測定・観察しましたか？",
-        "【実施後】副作用の有無を確認し、空バッグを所定の方法で保管・廃棄しましたか？"
-    ],
-    
-    # 脳神経外科で特に重要な項目を個別に追加
-    "患者確認・指導": [
-        "【確認】患者の氏名とIDをリストバンドと照合し、本人に名乗ってもらい確認しましたか？",
-        "【確認】アレルギー歴（特に造影剤アレルギー）を再確認し、記録しましたか？",
-        "【指導】処置・検査前に、体動リスクを評価し、体動しないよう具体的かつ簡潔に説明しましたか？",
-        "【説明】患者または家族に対し、これから行う処置や治療内容を説明し、同意を得ましたか？",
-    ],
-
-    "点滴・薬剤": [
-        "【FIVE-RIGHTs】医師・薬剤師の指示書に基づき、正しい薬剤、量、時間、経路であることをダブルチェックしましたか？",
-        "【抗凝固薬】手術や侵襲的処置の前に、休薬指示と最終投与時間を確認しましたか？",
-        "【高浸透圧薬】Mannitolなどの高浸透圧薬に結晶化や沈殿物がないか確認し、投与速度は指示通りですか？",
-        "【抗てんかん薬】処方開始・変更時に、適切な血中濃度採血オーダーがされているか確認しましたか？",
-        "【持続点滴】ポンプ設定（薬剤名、単位、設定量）を2名のスタッフで声出し確認しましたか？",
-        "【管理】麻薬・向精神薬は投与前後の残薬確認、記録、施錠保管を複数人で行いましたか？",
-    ],
-    
-    "中心静脈カテーテル": [
-        "【準備】エコーガイド下穿刺の準備（プローブカバー等）はできていますか？",
-        "【実施中】ガイドワイヤー挿入時、抵抗がないことを確認しましたか？（無理な挿入は禁止）",
-        "【実施中】動脈穿刺の除外（短軸・長軸像での確認、圧波形など）を行いましたか？",
-        "【実施後】ガイドワイヤーが体内に残存していないことを本数確認しましたか？",
-        "【実施後】カテーテル先端位置確認のためのX線撮影オーダーを行いましたか？",
-        "【観察】刺入部の感染兆候（発赤・腫脹）の有無を毎日チェックしましたか？",
-    ],
-    
-    "ドレナージ管理": [
-        "【指示確認】ドレナージバッグの**高さ（cmH2O）**、クランプ・開放指示が明確ですか？",
-        "【操作確認】体位変換や移送前後で、指示されたドレナージラインのクランプ操作を確実に実施しましたか？",
-        "【排液観察】排液の**量（時間毎）**、色、混濁を記録し、急激な変化や異常な量はありませんか？",
-        "【閉塞確認】ラインの屈曲、閉塞がないか確認しましたか？ ",
-        "【刺入部】刺入部に感染兆候がないか確認し、無菌操作でドレッシング材を交換しましたか？",
-    ],
-
-    "脳神経外科管理": [
-        "【意識レベル】JCSまたはGCSに基づき、正確かつ経時的に意識レベルを評価・記録しましたか？",
-        "【瞳孔所見】瞳孔径と対光反射を左右で比較し、急激な**左右差の出現**や**散瞳**がないか確認しましたか？",
-        "【麻痺評価】運動麻痺や感覚麻痺の有無、および昨日からの**進行・悪化**がないか詳細に評価しましたか？",
-        "【バイタル】**クッシング現象**（徐脈、血圧上昇）などの頭蓋内圧亢進症状のサインがないか確認しましたか？",
-        "【緊急体制】意識障害や呼吸状態の急変時、どの医師に**何分以内**に連絡するか確認されていますか？",
-    ],
-
-    # 既存の項目（採血、手術、気管挿管、内視鏡）は変更なしで維持
-    "採血": [
-        "【準備】検査指示書と採血管のラベル（氏名、ID、検査項目）を照合しましたか？",
-        "【実施前】患者本人に氏名を名乗ってもらい、リストバンドと照合しましたか？",
-        "【実施中】神経損傷予防のため、穿刺時の激痛やしびれの有無を患者に確認しましたか？",
-        "【実施中】駆血帯は1分以内に解除しましたか？（特に抜針前の解除忘れに注意）",
-        "【実施後】止血確認を行い、採血管の転倒混和を適切に行いましたか？"
-    ],
-    "手術": [
-        "【Sign In】患者確認、手術部位、術式の確認、麻酔器・モニターのチェックは完了しましたか？",
-        "【Time Out】執刀直前に全スタッフの手が止まり、患者名・術式・部位・予想される危険操作を全員で共有しましたか？",
-        "【Time Out】予防的抗菌薬の投与は執刀60分以内に行われましたか？",
-        "【Sign Out】ガーゼ・器械・縫合針のカウント数は一致しましたか？",
-        "【Sign Out】摘出標本のラベル（患者名・検体名）は正しいですか？"
-    ],
-    "気管挿管": [
-        "【準備】喉頭鏡のライト点灯、カフの破損がないか確認しましたか？",
-        "【準備】困難気道が予想される場合、ビデオ喉頭鏡やブジーなどの代替器具を準備しましたか？",
-        "【実施中】挿管後、聴診（5点聴診）およびカプノメータで二酸化炭素の波形を確認しましたか？",
-        "【実施後】チューブの固定位置（歯列のcm）を記録し、確実に固定しましたか？",
-        "【実施後】胸部X線でチューブ先端位置を確認しましたか？"
-    ],
-    "内視鏡": [
-        "【準備】内視鏡洗浄消毒履歴を確認し、使用機器の動作確認を行いましたか？",
-        "【実施前】抗血栓薬の休薬状況、アレルギー歴、既往歴を確認しましたか？",
-        "【実施前】鎮静を行う場合、同意書の確認と蘇生用具（酸素、アンビュー等）の準備はできていますか？",
-        "【実施中】患者のSpO2、呼吸状態、血圧のモニタリングを継続していますか？",
-        "【実施後】覚醒状態を確認し、飲水・食事開始の指示を明確にしましたか？"
-    ]
-}
-
+from core import (CHECKLISTS_PATH, CHECKLISTS_SCHEMA_VERSION, DOWNLOAD_CONCURRENCY, JOB_REBUILD, METRICS_PATH,
+                  METRICS_PROMETHEUS_PATH, OUTCOME_ACCEPTED, OUTCOME_BAD_ZIP, OUTCOME_DUPLICATE, OUTCOME_GARBLED,
+                  OUTCOME_NOT_PDF, OUTCOME_TOO_LARGE, OUTCOME_TOO_SHORT, PDF_TIMEOUT_SEC,
+                  STANDARD_CHECKLIST_ITEMS, append_data, checklist_item_label, get_completion_log, get_http_cache,
+                  get_incident_snapshot, get_incident_store, get_job_runner, ingest_lock, ingest_uploaded_files,
+                  read_checklists, read_checklists_header, read_checklists_version, rebuild_dataset_job,
+                  run_checklist_generation, update_checklists)
+from file_utils import LockBusy
+from incident_snapshot import filter_snapshot, garbled_ratio, monthly_counts, top_causes
+from jobs import JOB_FAILED, JOB_INTERRUPTED, JOB_RUNNING, JOB_SUCCEEDED
+from metrics import load_snapshot
+from pdf_extraction import ERROR_EMPTY, ERROR_FAILED, ERROR_MEMORY, ERROR_TIMEOUT
+
+# データ取得・解析・チェックリスト生成の処理は core.py（Streamlitなしで動かすCLIは ingest.py）
+# pandas / pyarrow はデータ管理・傾向分析ページでのみ使うため、チェックリストの閲覧時には読み込まない
 
 # ==========================================
-# 2. ロジック関数群
+# 3. UI (Streamlit Pages)
 # ==========================================
 
-def load_data() -> List[Dict]:
-    """インシデントデータセットを読み込む"""
-    try:
-        if os.path.exists(DATASET_PATH):
-            with open(DATASET_PATH, "r", encoding="utf-8", errors='ignore') as f:
-                return json.load(f)
-        return []
-    except Exception:
-        if os.path.exists(DATASET_PATH):
-            os.remove(DATASET_PATH)
-        return []
-
-
-def save_data(data: List[Dict]):
-    """インシデントデータセットを保存する"""
-    try:
-        with open(DATASET_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
-
-
-@st.cache_data
-def load_checklists() -> Dict[str, str]:
-    """チェックリストデータを読み込む (キャッシュ対象)"""
-    try:
-        if not os.path.exists(CHECKLISTS_PATH):
-            return {}
-            
-        with open(CHECKLISTS_PATH, "r", encoding="utf-8", errors='ignore') as f:
-            return json.load(f)
-    except Exception:
-        return {}
-
-
-def classify_procedure(text: str) -> str:
-    """テキストから処置・手術の種類を分類する"""
-    if not text:
-        return "その他"
-    for proc, words in PROCEDURES.items():
-        if any(w in text for w in words):
-            return proc
-    return "その他"
+# 検索結果・データセット一覧の1ページに表示する件数
+SEARCH_PAGE_SIZE = 20
+BROWSE_PAGE_SIZE = 20
+# 傾向分析ページに表示する原因の件数
+TOP_CAUSES_LIMIT = 15
+# データセット一覧の並び順（表示名: IncidentStore.browse の order）
+BROWSE_ORDERS = {"登録順": "id", "日付": "date", "種別": "incident_type"}
+
+# アップロードしたファイルを取り込まなかった理由
+UPLOAD_OUTCOME_MESSAGES = {
+    OUTCOME_DUPLICATE: "同じ内容の報告書が既に登録されています（重複）",
+    OUTCOME_TOO_SHORT: "有効なテキストがほとんど抽出できませんでした（短すぎる）",
+    OUTCOME_GARBLED: "文字化けしています（暗号化・特殊なフォントの可能性）",
+    OUTCOME_NOT_PDF: "PDFではありません",
+    OUTCOME_TOO_LARGE: "ファイルが大きすぎます",
+    OUTCOME_BAD_ZIP: "ZIPを展開できません（破損・暗号化・未対応の形式）",
+    ERROR_TIMEOUT: f"解析が制限時間（{PDF_TIMEOUT_SEC}秒）内に終わりませんでした",
+    ERROR_MEMORY: "解析中にメモリ上限を超えました（ファイルが大きすぎる可能性）",
+    ERROR_FAILED: "PDFとして読み込めませんでした（破損している可能性）",
+    ERROR_EMPTY: "ファイルが空です",
+}
 
+# 処理時間の表に表示するステージ（処理順）
+METRIC_STAGES = {
+    "fetch": "取得 (HTTP)",
+    "extract": "PDF抽出",
+    "normalize": "テキスト正規化",
+    "parse": "見出し解析",
+    "classify": "処置分類",
+    "generate": "チェックリスト生成",
+    "snapshot": "分析用スナップショット更新",
+}
 
-def is_likely_garbled(text: str) -> bool:
-    """テキストが文字化けしている可能性が高いか判定する。"""
-    if not text or len(text) < 5:
-        return True
+# 実行中の再構築ジョブの進捗を読み直す間隔（秒）と、段階ごとの表示名
+JOB_POLL_INTERVAL_SEC = 1.0
+REBUILD_STAGES = {"wait": "待機中", "crawl": "索引ページを巡回中", "ingest": "PDF解析中"}
 
-    total_len = len(text)
-    japanese_pattern = re.compile(r'[\u4E00-\u9FFF\u3040-\u309F\u30A0-\u30FF\u0020-\u007E\uff00-\uffef]')
-    valid_chars_count = len(japanese_pattern.findall(text))
-    valid_ratio = valid_chars_count / total_len
+LOCK_BUSY_MESSAGE = "⏳ 別の処理（CLIまたは他の画面）がデータセットを更新中です。完了後にもう一度お試しください。"
 
-    if valid_ratio < 0.1:
-        return True
-    if re.search(r'https?://', text) or re.search(r'[a-zA-Z]{3,4}://', text):
-        return True
 
-    return False
+@st.cache_resource(max_entries=2)
+def load_checklists(header: Tuple[int, int]) -> Dict[str, Dict[str, Any]]:
+    """チェックリストデータを読み込む (ファイル先頭の (形式, 世代) ごとにキャッシュ)
 
+    チェックボックス操作のたびの再実行でファイルの読み込み・コピーをしないよう、
+    全セッションで同じオブジェクトを共有する（呼び出し側で変更しないこと）。
+    別のプロセス・レプリカが書き換えた場合も世代が変わるため、キャッシュを消さずに切り替わる。
+    """
+    return read_checklists()
 
-def extract_action_items(prevention_text: str) -> List[str]:
-    """具体的アクションに基づいてチェックリスト項目を抽出する"""
-    actions = []
-    sentences = re.split(r'[。\n]', prevention_text)
 
-    for s in sentences:
-        s = s.strip()
-        if not s: continue
-        if len(s) < 5 or len(s) > 100: continue
-        if any(noise in s for noise in NOISE_KEYWORDS): continue
+def progress_reporter():
+    """st.progress に進捗を表示するコールバックと、表示を消す関数を返す"""
+    my_bar = st.progress(0)
+    status_text = st.empty()
 
-        if any(action in s for action in ACTION_KEYWORDS):
-            cleaned_s = re.sub(r'[、。]$', '', s)
-            cleaned_s = re.sub(r'^[-\d\.\s・]+', '', cleaned_s).strip()
-            actions.append(cleaned_s)
-    return actions
+    def _report(done: int, total: int, source: str):
+        status_text.text(f"PDF解析中 ({done}/{total}): {source}")
+        my_bar.progress(done / total)
+
+    def _clear():
+        status_text.empty()
+        my_bar.empty()
+
+    return _report, _clear
+
+
+def render_metrics_panel():
+    """直近に書き出された処理時間の計測値をステージごとの p50/p95 の表にする"""
+    import pandas as pd
+
+    snapshot = load_snapshot(METRICS_PATH)
+    if not snapshot:
+        st.caption("計測データはまだありません。データ取得またはチェックリスト生成を実行すると記録されます。")
+        return
+
+    rows = []
+    for stage, label in METRIC_STAGES.items():
+        s = snapshot["stages"].get(stage)
+        if not s:
+            continue
+        rows.append({
+            "ステージ": label,
+            "件数": s["count"],
+            "p50 (ms)": round(s["quantiles"]["0.5"] * 1000, 1),
+            "p95 (ms)": round(s["quantiles"]["0.95"] * 1000, 1),
+            "最大 (ms)": round(s["max_seconds"] * 1000, 1),
+            "合計 (秒)": round(s["sum_seconds"], 2),
+            "処理量 (MB)": round(s["bytes"] / (1024 * 1024), 2),
+        })
+    st.table(pd.DataFrame(rows))
+
+    counters = snapshot["counters"]
+    checked = counters.get("garbled_checked", 0)
+    c1, c2, c3 = st.columns(3)
+    c1.metric("文字化けで除外", f"{counters.get('garbled_rejected', 0) / checked:.1%}" if checked else "-")
+    c2.metric("抽出エラー (タイムアウト/メモリ/その他)",
+              f"{counters.get('extract_timeout', 0)} / {counters.get('extract_memory', 0)} / "
+              f"{counters.get('extract_error', 0)}")
+    c3.metric("取得失敗", counters.get("fetch_failed", 0))
+    updated = datetime.fromtimestamp(snapshot["updated_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    st.caption(f"最終更新: {updated} / {snapshot['processes']}プロセスの合計（p50/p95・最大はプロセスごとの値の最大）"
+               f"（Prometheus形式: {METRICS_PROMETHEUS_PATH}）")
+
+
+@st.cache_data(max_entries=4)
+def load_procedure_counts(revision: int) -> List[Tuple[Optional[str], int, int]]:
+    """処置ごとの (処置, 件数, 有効件数) を読み込む (データセットの版ごとにキャッシュ)"""
+    return get_incident_store().procedure_counts()
+
+
+def incident_type_options() -> List[str]:
+    return sorted(list(STANDARD_CHECKLIST_ITEMS.keys()) + ["その他"])
+
+
+def render_dataset_browser():
+    """データセットを絞り込み・並べ替えて、表示するページの分だけ読み込んで表示する"""
+    import pandas as pd
+
+    store = get_incident_store()
+    counts = load_procedure_counts(store.revision())
+    total = sum(c[1] for c in counts)
+    clean = sum(c[2] for c in counts)
+    if total == 0:
+        st.write("有効なデータがありません。PDFのアップロードまたは手動入力を試してください。")
+        return
+    st.caption(f"全データ件数: {total}件 (うち、文字化けを除外した有効件数: {clean}件)")
+    with st.expander("処置ごとの件数"):
+        st.table(pd.DataFrame([{"処置": p or "(未判定)", "件数": n, "有効件数": c} for p, n, c in counts]))
+
+    col1, col2, col3 = st.columns(3)
+    incident_type = col1.selectbox("種別", ["すべて"] + incident_type_options(), key="browse_type")
+    source_prefix = col2.text_input("取得元 (前方一致)", key="browse_source", placeholder="例: https://www.med-safe.jp/")
+    order = col3.selectbox("並び順", list(BROWSE_ORDERS), key="browse_order")
+    col4, col5, col6 = st.columns(3)
+    date_from = col4.date_input("日付 (から)", value=None, key="browse_date_from")
+    date_to = col5.date_input("日付 (まで)", value=None, key="browse_date_to")
+    with col6:
+        descending = st.checkbox("新しい順・降順", value=True, key="browse_descending")
+        include_garbled = st.checkbox("文字化けしたデータも表示", key="browse_garbled")
+
+    conditions = dict(
+        incident_type=None if incident_type == "すべて" else incident_type,
+        source_prefix=source_prefix.strip() or None,
+        date_from=date_from.isoformat() if date_from else None,
+        date_to=date_to.isoformat() if date_to else None,
+        include_garbled=include_garbled,
+        order=BROWSE_ORDERS[order],
+        descending=descending,
+    )
+    # 絞り込み・並び順を変えたら1ページ目から表示する（前の条件でのページ番号は意味を持たない）
+    filters = tuple(sorted(conditions.items()))
+    if st.session_state.get("browse_filters") != filters:
+        st.session_state["browse_filters"] = filters
+        st.session_state["browse_page"] = 1
+    page = st.session_state.get("browse_page", 1)
+    matched, rows = store.browse(limit=BROWSE_PAGE_SIZE, offset=(page - 1) * BROWSE_PAGE_SIZE, **conditions)
+    if matched == 0:
+        st.info("条件に合うデータがありません。")
+        return
+    pages = (matched - 1) // BROWSE_PAGE_SIZE + 1
+    if page > pages:
+        # 同じ条件のままデータが減った場合は最後のページを表示する
+        st.session_state["browse_page"] = page = pages
+        _, rows = store.browse(limit=BROWSE_PAGE_SIZE, offset=(page - 1) * BROWSE_PAGE_SIZE, **conditions)
+    st.number_input(f"ページ (全{pages}ページ・{matched}件)", 1, pages, key="browse_page")
+    st.table(pd.DataFrame([
+        {"ID": incident_id,
+         "種別": i.get("incident_type"),
+         "日付": i.get("date"),
+         "取得元": i.get("source"),
+         "概要": i.get("description", "").replace('\n', ' ')[:40] + "..."}
+        for incident_id, i in rows
+    ]).set_index("ID"))
+
+
+def render_upload_results(records: List[Dict], results: List[Tuple[str, str]]):
+    """アップロードしたファイルごとの取り込み結果を表示する"""
+    import pandas as pd
+
+    if records:
+        st.success(f"{len(results)}件中 {len(records)}件の報告書をデータセットに追加し、チェックリストを更新しました。")
+        st.info("左のメニューから「チェックリストビューア」へ移動して確認してください。")
+    else:
+        st.error("追加できる報告書はありませんでした。")
+    st.table(pd.DataFrame([
+        {"ファイル": name,
+         "結果": "✅ 追加" if outcome == OUTCOME_ACCEPTED else "❌ 除外",
+         "理由": UPLOAD_OUTCOME_MESSAGES.get(outcome, outcome) if outcome != OUTCOME_ACCEPTED else ""}
+        for name, outcome in results
+    ]))
+
+
+def render_job_progress(job: Dict[str, Any]):
+    """ジョブの状態ファイルに記録された進捗を表示する"""
+    progress = job["progress"]
+    if not progress:
+        st.text("開始しています...")
+        return
+    done, total = progress["done"], progress["total"]
+    st.progress(min(done / total, 1.0) if total else 0.0)
+    st.text(f"{REBUILD_STAGES.get(progress['stage'], progress['stage'])} ({done}/{total}): {progress['message']}")
+
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SEC)
+def poll_rebuild_job():
+    """実行中の再構築ジョブの進捗を定期的に読み直す（終わったら結果を出すため画面全体を再実行する）"""
+    job = get_job_runner().status(JOB_REBUILD)
+    if job is None or job["state"] != JOB_RUNNING:
+        st.rerun()
+    render_job_progress(job)
+
+
+def render_rebuild_result(job: Dict[str, Any]):
+    """最後に実行した再構築ジョブの結果を表示する"""
+    finished = datetime.fromtimestamp(job["finished_at"] or job["started_at"]).strftime("%Y-%m-%d %H:%M")
+    if job["state"] == JOB_SUCCEEDED:
+        result = job["result"]
+        if result["duplicates"]:
+            st.info(f"取り込み済みの文書 {result['duplicates']} 件をスキップしました。")
+        st.success(f"完了しました（{finished}）。全 {result['incidents']} 件のデータを取得し、"
+                   f"うち {result['clean']} 件が有効な事例として解析されました。")
+        st.info("左のメニューから「チェックリストビューア」へ移動して確認してください。")
+    elif job["state"] == JOB_FAILED:
+        st.error(f"再構築に失敗しました（{finished}）: {job['error']}")
+        st.caption("以前のデータセット・チェックリストをそのまま使用しています。")
+    elif job["state"] == JOB_INTERRUPTED:
+        st.warning("再構築が途中で中断されました（サーバーの再起動など）。以前のデータセット・チェックリストをそのまま使用しています。")
 
 
-def extract_text_from_pdf(pdf_bytes: bytes) -> str:
-    """PDFからテキストを抽出し、強力な文字化け除去を行う"""
-    text = ""
+def regenerate_checklists_if_idle():
+    """チェックリストを再生成する。CLI等が更新中であれば、その結果を待たずに現在のものを表示する"""
     try:
-        with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-            if pdf.pages:
-                page = pdf.pages[0]
-                text = page.extract_text(errors='ignore') or ""
-
-        text_bytes = text.encode('utf-8', errors='ignore')
-        text = text_bytes.decode('utf-8', errors='ignore')
-
-        text = text.replace('\ufffd', '')
-        text = re.sub(r'[\x00-\x1F\x7F]', '', text)
-        text = text.replace(u'\xa0', u' ').replace('　', ' ')
-
-        text = re.sub(r'\s+', ' ', text).strip()
-
-        for noise in NOISE_KEYWORDS:
-            text = text.replace(noise, '')
-
-        allowed_chars_regex = r'[^\u4E00-\u9FFF\u3040-\u309F\u30A0-\u30FF\u3000-\u303F\u0020-\u007E\uff10-\uff19\n、。]'
-        text = re.sub(allowed_chars_regex, '', text)
-
-        return text
-    except Exception:
-        return ""
-
-
-def parse_report_text(text: str, source_url: str) -> Dict[str, str]:
-    """テキストから原因と対策を切り出す（簡易版）"""
-    description = "抽出不可"
-    cause = ""
-    prevention = ""
-
-    if "概要" in text:
-        parts = text.split("概要")
-        if len(parts) > 1: description = parts[1][:200]
-
-    if "原因" in text:
-        parts = text.split("原因")
-        if len(parts) > 1: cause = parts[1][:200]
-
-    if "対策" in text:
-        parts = text.split("対策")
-        if len(parts) > 1: prevention = parts[1][:300]
-    elif "再発防止" in text:
-        parts = text.split("再発防止")
-        if len(parts) > 1: prevention = parts[1][:300]
-
-    if len(description) < 10:
-        description = text[:200]
-
-    return {
-        "source": source_url,
-        "date": datetime.now().strftime("2025-12-01"),
-        "department": "PDF解析",
-        "incident_type": classify_procedure(description),
-        "description": description.replace('\n', ' ').strip(),
-        "cause": cause.replace('\n', ' ').strip(),
-        "prevention": prevention.replace('\n', ' ').strip(),
-        "impact": "不明"
-    }
-
-
-def scrape_pdf_links() -> List[str]:
-    """ターゲットURLからPDFリンクを収集"""
-    pdf_links = set()
-    base_url = "https://www.med-safe.jp"
-    for url in TARGET_URLS:
-        try:
-            response = requests.get(url, timeout=10)
-            soup = BeautifulSoup(response.content, 'html.parser')
-            for link in soup.find_all('a', href=True):
-                href = link['href']
-                if href.lower().endswith('.pdf'):
-                    if href.startswith('/'):
-                        abs_url = base_url + href
-                    elif not href.startswith('http'):
-                        abs_url = requests.compat.urljoin(url, href)
-                    else:
-                        abs_url = href
-                    pdf_links.add(abs_url)
-        except Exception:
-            pass
-    return list(pdf_links)
-
-
-def scrape_and_update_dataset(limit_pdfs: int = 5) -> List[Dict]:
-    """WebからPDFを取得してデータセットを更新"""
-    pdf_urls = scrape_pdf_links()
-    new_incidents: List[Dict] = []
+        with ingest_lock(timeout=0):
+            run_checklist_generation()
+    except LockBusy:
+        pass
 
-    my_bar = st.progress(0)
-    status_text = st.empty()
 
-    target_pdfs = pdf_urls[:limit_pdfs]
-    total = len(target_pdfs)
+def checkbox_key(proc: str, item_id: str) -> str:
+    """チェックボックスのキー（項目の内容から決まるIDを使い、再生成で項目の順番が変わってもずれない）"""
+    return f"chk_{proc}_{item_id}"
 
-    for i, pdf_url in enumerate(target_pdfs):
-        status_text.text(f"PDF解析中 ({i + 1}/{total}): {pdf_url}")
-        my_bar.progress((i + 1) / total)
-        try:
-            pdf_response = requests.get(pdf_url, timeout=30)
-            raw_text = extract_text_from_pdf(pdf_response.content)
-            if len(raw_text) > 50:
-                record = parse_report_text(raw_text, pdf_url)
-                new_incidents.append(record)
-        except Exception:
-            pass
-
-    status_text.empty()
-    my_bar.empty()
-
-    current_data = load_data()
-    combined_data = current_data + new_incidents
-    save_data(combined_data)
-    return combined_data
-
-
-def run_checklist_generation(incidents: List[Dict]):
-    """インシデントデータと標準項目からチェックリストを生成"""
-    causes = defaultdict(list)
-    preventions_items = defaultdict(list)
-
-    filtered_incidents = [item for item in incidents if not is_likely_garbled(item.get("description", ""))]
-
-    for item in filtered_incidents:
-        proc = classify_procedure(item.get("description", ""))
-        cause = item.get("cause", "")
-        prevention = item.get("prevention", "")
-        if cause: causes[proc].append(cause.strip())
-        if prevention:
-            preventions_items[proc].extend(extract_action_items(prevention))
-
-    checklists: Dict[str, str] = {}
-    
-    # PROCEDURESのキーを全て取得し、ソートしてループする
-    all_procedures = sorted(list(STANDARD_CHECKLIST_ITEMS.keys()) + ["その他"])
-
-    for proc in all_procedures:
-        checklist: List[str] = []
-
-        # 1. 標準チェック項目 (★必ず表示★)
-        standard_items = STANDARD_CHECKLIST_ITEMS.get(proc, [])
-        if standard_items:
-            checklist.append(f"### 【標準安全手順（{proc}）】")
-            # 確実な箇条書きのためのMarkdownリスト記号を追加
-            for p in standard_items: checklist.append(f"- ✅ {p}")
-
-        # 2. 事例からの追加項目
-        unique_actions = sorted(list(set(preventions_items[proc])))
-        filtered_actions = [a for a in unique_actions if a not in standard_items]
-        if filtered_actions:
-            if checklist: checklist.append("")
-            checklist.append("### 【過去の事例に学ぶ追加チェック】")
-            # 確実な箇条書きのためのMarkdownリスト記号を追加
-            for p in filtered_actions: checklist.append(f"- □ {p}")
-
-        # 3. 原因
-        unique_causes = sorted(list(set(causes[proc])))
-        if unique_causes:
-            if checklist: checklist.append("")
-            checklist.append("#### (参考) 過去の主な原因")
-            # 確実な箇条書きのためのMarkdownリスト記号を追加
-            for c in unique_causes: checklist.append(f"- {c}")
-
-        if checklist:
-            checklists[proc] = "\n".join(checklist)
-
-    # st.cache_dataをクリアし、新しいチェックリストを保存
-    st.cache_data.clear()  
-    with open(CHECKLISTS_PATH, "w", encoding="utf-8") as f:
-        json.dump(checklists, f, ensure_ascii=False, indent=2)
-
-
-def reset_system(limit_pdfs: int):
-    """システムをリセットし再構築する"""
-    if os.path.exists(DATASET_PATH): os.remove(DATASET_PATH)
-    if os.path.exists(CHECKLISTS_PATH): os.remove(CHECKLISTS_PATH)
-
-    incidents = scrape_and_update_dataset(limit_pdfs)
-    run_checklist_generation(incidents)
-    return incidents
 
+def restore_checklist_states(user: str, proc: str):
+    """記録者の前回までのチェック状態を実施記録から読み込む（記録者・処置ごとに最初の表示時だけ）"""
+    states = st.session_state['checklist_states']
+    if st.session_state.get('checklist_owner') != user:
+        # 記録者が変わったら、前の記録者のチェック状態（チェックボックスの状態を含む）を画面から消す
+        for key in [k for k in st.session_state if str(k).startswith("chk_")]:
+            del st.session_state[key]
+        states.clear()
+        st.session_state['checklist_owner'] = user
+        st.session_state['checklist_restored'] = set()
+    restored = st.session_state['checklist_restored']
+    if user and proc not in restored:
+        states[proc] = {checkbox_key(proc, i): True for i in get_completion_log().checked_items(user, proc)}
+        restored.add(proc)
 
-# ==========================================
-# 3. UI (Streamlit Pages)
-# ==========================================
 
 # リセット処理関数
-def reset_checklist_state(proc_key):
+def reset_checklist_state(proc_key, user=""):
     """特定の処置のチェック状態をリセットし、再実行する"""
     # 該当する処置のチェック状態を空の辞書で上書きし、リセット
     if proc_key in st.session_state.get('checklist_states', {}):
+        prefix = checkbox_key(proc_key, "")
+        if user:
+            # チェックしていた項目はチェック解除として実施記録に残す
+            now = time.time()
+            get_completion_log().record_many(
+                (user, proc_key, key[len(prefix):], False, now)
+                for key, checked in st.session_state['checklist_states'][proc_key].items() if checked)
         st.session_state['checklist_states'][proc_key] = {}
+        # チェックボックス自身の状態も消さないと、次の表示でチェックが残る
+        for key in [k for k in st.session_state if str(k).startswith(prefix)]:
+            del st.session_state[key]
         st.info(f"✅ 「{proc_key}」のチェック状態をリセットしました。画面を更新します。")
         
     st.rerun() 
@@ -431,11 +310,14 @@ def reset_checklist_state(proc_key):
 def page_viewer():
     st.title("📋 医療安全チェックリスト")
     
-    if not os.path.exists(CHECKLISTS_PATH):
+    # 再生成中も、置き換えが終わるまでは最後に生成されたチェックリストが表示される
+    # 再実行のたびにファイル先頭の世代だけを読み、変わったときにだけ全体を読み直す
+    header = read_checklists_header()
+    if header is None:
         st.warning("⚠️ チェックリストファイルが生成されていません。データ管理・更新ページで生成してください。")
         checklists = {}
     else:
-        checklists = load_checklists()
+        checklists = load_checklists(header)
 
     procedures = sorted(list(STANDARD_CHECKLIST_ITEMS.keys()) + ["その他"])
     
@@ -446,10 +328,14 @@ def page_viewer():
         default_index = procedures.index("輸血")
 
     selected_proc = st.selectbox("処置を選択してください", procedures, index=default_index)
+    # 記録者を入力すると、チェック操作を実施記録に残し、次回の表示でもチェック状態を復元する
+    user = st.text_input("記録者（氏名・職員ID）", key="checklist_user",
+                         placeholder="未入力の場合、チェック状態はこの画面を閉じると消えます").strip()
 
     # 【修正1】セッションステートの初期化を関数の最初に移動し、選択された処置のキーを確実に準備
     if 'checklist_states' not in st.session_state:
         st.session_state['checklist_states'] = {}
+    restore_checklist_states(user, selected_proc)
     if selected_proc not in st.session_state['checklist_states']:
         st.session_state['checklist_states'][selected_proc] = {}
         
@@ -460,55 +346,44 @@ def page_viewer():
     # --- チェックボックス表示とセッションステートによる状態保持 ---
 
     if content:
-        # 項目を解析するための変数
-        lines = content.split('\n')
-        item_count = 0
-        
         # チェック項目の総数とチェック済みの項目の数をカウント
         total_items = 0
         checked_items = 0
         
-        # チェックリストの表示と処理
-        for line in lines:
-            line = line.strip()
-
+        # チェックリストの表示と処理（生成時に構造化済みのセクション・項目をそのまま描画する）
+        for section in content["sections"]:
             # 1. 見出しの処理 (H3/H4)
-            if line.startswith("### "):
-                current_section = line.replace("### ", "--- \n**") + "**"
-                st.markdown(current_section)
-                continue
-            if line.startswith("#### "):
-                st.markdown(line)
-                continue
-                
-            # 2. チェック項目 (リスト形式: - ✅ または - □) の処理
-            if line.startswith("- ✅ ") or line.startswith("- □ "):
-                # チェック項目のテキストを抽出
-                item_text = line.replace("- ✅ ", "").replace("- □ ", "").strip()
-                
-                # ユニークなキーを生成 (処置名_セクション名_インデックス)
-                checkbox_key = f"chk_{selected_proc}_{item_count}"
+            if section["level"] == 3:
+                st.markdown(f"--- \n**{section['title']}**")
+            else:
+                st.markdown(f"{'#' * section['level']} {section['title']}")
+
+            for item in section["items"]:
+                # チェック対象でない項目（原因のリストなど）はそのまま表示
+                if not section["checkable"]:
+                    st.markdown(f"- {checklist_item_label(item)}")
+                    continue
+
+                # 2. チェック項目の処理
+                key = checkbox_key(selected_proc, item["id"])
                 total_items += 1
 
                 # st.checkboxを使用してチェックリストとして表示
                 # valueはセッションステートから取得。存在しない場合はFalse (未チェック)
-                is_checked = st.session_state['checklist_states'][selected_proc].get(checkbox_key, False)
+                is_checked = st.session_state['checklist_states'][selected_proc].get(key, False)
                 
                 # チェックボックスを表示。keyを指定することで状態を保持
-                new_state = st.checkbox(item_text, value=is_checked, key=checkbox_key)
+                new_state = st.checkbox(checklist_item_label(item), value=is_checked, key=key)
                 
                 # 状態が変化した場合、セッションステートを更新 (このロジックは冗長ですが、明示的に記述することで動作を保証)
                 if new_state != is_checked:
-                    st.session_state['checklist_states'][selected_proc][checkbox_key] = new_state
+                    st.session_state['checklist_states'][selected_proc][key] = new_state
+                    # 実施記録は書き込み待ちに積むだけで、書き出しは別スレッドでまとめて行う
+                    if user:
+                        get_completion_log().record(user, selected_proc, item["id"], new_state)
                     
                 if new_state:
                     checked_items += 1
-                    
-                item_count += 1
-            
-            # 3. その他の行（原因のリスト項目など）の処理
-            elif line:
-                st.markdown(line)
         
         # 進捗バーの表示
         if total_items > 0:
@@ -539,12 +414,176 @@ def page_viewer():
         "この処置のチェック状態をリセット", 
         key=reset_key,
         on_click=reset_checklist_state,
-        args=(selected_proc,) # 関数に引数として現在の処置名を渡す
+        args=(selected_proc, user) # 関数に引数として現在の処置名と記録者を渡す
     )
             
     # --- チェックボックス表示とセッションステートによる状態保持の終わり ---
 
 
+def page_search():
+    st.title("🔎 インシデント検索")
+    st.caption('概要・原因・再発防止策を全文検索します。空白区切りの語はすべてを含むもの、"..." で囲んだ語は語句そのものを検索します。')
+
+    col1, col2 = st.columns([3, 1])
+    query = col1.text_input("検索語", placeholder='例: 患者確認 "ダブルチェック"')
+    types = ["すべて"] + incident_type_options()
+    selected_type = col2.selectbox("種別", types)
+    if not query.strip():
+        return
+
+    store = get_incident_store()
+    page = st.session_state.get("search_page", 0)
+    # 検索条件が変わったら1ページ目に戻す
+    if st.session_state.get("search_condition") != (query, selected_type):
+        st.session_state["search_condition"] = (query, selected_type)
+        st.session_state["search_page"] = page = 0
+
+    incident_type = None if selected_type == "すべて" else selected_type
+    start = time.perf_counter()
+    total, hits = store.search(query, incident_type, limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE)
+    last_page = max(total - 1, 0) // SEARCH_PAGE_SIZE
+    if page > last_page:
+        # 同じ条件のままデータが減った場合は、最後のページを検索し直して表示する
+        st.session_state["search_page"] = page = last_page
+        total, hits = store.search(query, incident_type, limit=SEARCH_PAGE_SIZE, offset=page * SEARCH_PAGE_SIZE)
+        last_page = max(total - 1, 0) // SEARCH_PAGE_SIZE
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    if total == 0:
+        st.info(f"該当するインシデントはありません。({elapsed_ms:.0f} ms)")
+        return
+
+    st.caption(f"{total}件中 {page * SEARCH_PAGE_SIZE + 1}〜{page * SEARCH_PAGE_SIZE + len(hits)}件目 "
+               f"(検索 {elapsed_ms:.0f} ms)")
+
+    # 本文は表示する分だけ、関連度順に読み込む
+    for incident in store.load_by_ids([doc_id for doc_id, _ in hits]):
+        description = incident.get("description", "").replace('\n', ' ')
+        with st.expander(f"[{incident.get('incident_type')}] {description[:60]}"):
+            st.markdown(f"**概要**: {incident.get('description', '')}")
+            st.markdown(f"**原因**: {incident.get('cause', '')}")
+            st.markdown(f"**再発防止策**: {incident.get('prevention', '')}")
+            st.caption(f"出典: {incident.get('source', '')}")
+
+    prev_col, next_col = st.columns(2)
+    if prev_col.button("◀ 前へ", disabled=page == 0):
+        st.session_state["search_page"] = page - 1
+        st.rerun()
+    if next_col.button("次へ ▶", disabled=page >= last_page):
+        st.session_state["search_page"] = page + 1
+        st.rerun()
+
+
+@st.cache_resource(max_entries=1)
+def load_snapshot_table(generation: int):
+    """分析用スナップショットをメモリマップで開く（世代ごとに全セッションで共有）"""
+    return get_incident_snapshot().read()
+
+
+def _month_labels(index) -> List[str]:
+    return [m.strftime("%Y-%m") if m else "(日付なし)" for m in index]
+
+
+def page_analytics():
+    st.title("📈 傾向分析")
+    st.caption("取り込み時に更新される列指向スナップショットから、処置ごとの件数の推移・主な原因・文字化けの割合を集計します。")
+
+    manifest = get_incident_snapshot().manifest()
+    if manifest is None or manifest["rows"] == 0:
+        st.info("分析できるデータがありません。データ管理・更新ページでデータを取り込んでください。")
+        return
+    table = load_snapshot_table(manifest["generation"])
+
+    col1, col2, col3 = st.columns([2, 1, 1])
+    procedures = col1.multiselect("処置", incident_type_options(), placeholder="すべて")
+    date_from = col2.date_input("日付 (から)", value=None, key="analytics_date_from")
+    date_to = col3.date_input("日付 (まで)", value=None, key="analytics_date_to")
+
+    start = time.perf_counter()
+    filtered = filter_snapshot(table, procedures, date_from, date_to)
+    monthly = monthly_counts(filtered)
+    causes = top_causes(filtered, TOP_CAUSES_LIMIT)
+    ratio, by_month = garbled_ratio(filtered)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    updated = datetime.fromtimestamp(manifest["updated_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    st.caption(f"全{table.num_rows}件中 {filtered.num_rows}件を集計 (集計 {elapsed_ms:.0f} ms / スナップショット更新: {updated})")
+
+    c1, c2, c3 = st.columns(3)
+    c1.metric("件数", filtered.num_rows)
+    c2.metric("有効件数 (文字化けを除く)", int(monthly.to_numpy().sum()) if not monthly.empty else 0)
+    c3.metric("文字化けで除外", f"{ratio:.1%}")
+
+    st.subheader("処置ごとの件数の推移（月別）")
+    if monthly.empty:
+        st.info("条件に合う有効なデータがありません。")
+    else:
+        monthly.index = _month_labels(monthly.index)
+        st.line_chart(monthly)
+
+    st.subheader("主な原因")
+    if causes.empty:
+        st.write("原因が記載されたデータがありません。")
+    else:
+        st.table(causes.set_index("原因"))
+
+    st.subheader("文字化けで除外した割合（月別）")
+    if not by_month.empty:
+        by_month.index = _month_labels(by_month.index)
+        st.bar_chart(by_month["ratio"].rename("文字化けの割合"))
+
+
+def _checkable_items(content: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    if not content:
+        return []
+    return [item for section in content["sections"] if section["checkable"] for item in section["items"]]
+
+
+def page_compliance():
+    st.title("✅ チェックリスト実施状況")
+    st.caption("チェックリストビューアで記録者を入力して行ったチェック操作の集計です。"
+               "操作の書き出し時に更新される集計表を表示するため、実施記録全体は読み直しません。")
+    import pandas as pd
+
+    log = get_completion_log()
+    totals = log.procedure_totals()
+    if not totals:
+        st.info("実施記録がありません。チェックリストビューアで記録者を入力してチェックすると記録されます。")
+        return
+    header = read_checklists_header()
+    checklists = load_checklists(header) if header is not None else {}
+
+    # 実施率は現在のチェックリストの項目について、(チェック済みの記録者数) / (記録者数) で求める
+    items_by_proc = {proc: _checkable_items(checklists.get(proc)) for proc in totals}
+    item_totals = {proc: log.item_totals(proc) for proc in totals}
+    rows = []
+    for proc, (users, events, updated_at) in sorted(totals.items()):
+        items = items_by_proc[proc]
+        checked = sum(item_totals[proc].get(item["id"], (0,))[0] for item in items)
+        rows.append({
+            "処置": proc, "記録者数": users, "項目数": len(items),
+            "実施率": f"{checked / (users * len(items)):.1%}" if users and items else "-",
+            "操作回数": events, "最終記録": datetime.fromtimestamp(updated_at).strftime("%Y-%m-%d %H:%M"),
+        })
+    st.subheader("処置ごとの実施率")
+    st.table(pd.DataFrame(rows))
+
+    st.subheader("項目ごとの実施率")
+    proc = st.selectbox("処置", sorted(totals), key="compliance_proc")
+    users = totals[proc][0]
+    items = items_by_proc[proc]
+    if not items:
+        st.info("この処置の現在のチェックリストにはチェック項目がありません。")
+    else:
+        rows = []
+        for item in items:
+            checked, events, _ = item_totals[proc].get(item["id"], (0, 0, None))
+            rows.append({"項目": checklist_item_label(item), "チェック済み": checked,
+                         "実施率": f"{checked / users:.1%}" if users else "-", "操作回数": events})
+        st.table(pd.DataFrame(rows))
+    retired = set(item_totals[proc]) - {item["id"] for item in items}
+    if retired:
+        st.caption(f"再生成で現在のチェックリストから外れた項目の記録 {len(retired)} 件は集計に含めていません。")
+
+
 def page_manager():
     st.title("⚙️ データ管理・更新")
 
@@ -552,46 +591,63 @@ def page_manager():
     st.caption("Web上のヒヤリ・ハット報告書(PDF)を解析し、チェックリストを自動生成します。")
 
     limit = st.number_input("解析するPDF数 (多いと時間がかかります)", 1, 50, 5)
+    concurrency = st.number_input("同時ダウンロード数", 1, 16, DOWNLOAD_CONCURRENCY)
+
+    # 再構築はバックグラウンドジョブで実行し、この画面は状態ファイルの進捗を表示するだけにする
+    # （画面を離れる・再読み込みしても続行され、他のユーザーも同じ進捗を見る）
+    runner = get_job_runner()
+    job = runner.status(JOB_REBUILD)
+    running = job is not None and job["state"] == JOB_RUNNING
+    if st.button("🔄 システムを完全リセットして再構築", disabled=running):
+        try:
+            runner.start(JOB_REBUILD, rebuild_dataset_job, limit_pdfs=limit, concurrency=concurrency)
+        except LockBusy:
+            st.warning("⏳ 再構築は既に実行中です。")
+        else:
+            st.rerun()
 
-    if st.button("🔄 システムを完全リセットして再構築"):
-        with st.spinner("データを削除し、Webから再取得中..."):
-            st.cache_data.clear()
-            incidents = reset_system(limit)
+    if running:
+        st.caption("バックグラウンドで再構築中です。完了するまでは以前のチェックリストが表示されます。")
+        poll_rebuild_job()
+    elif job:
+        render_rebuild_result(job)
 
-        clean_incidents_count = len([i for i in incidents if not is_likely_garbled(i.get("description", ""))])
-        st.success(
-            f"完了しました。全 {len(incidents)} 件のデータを取得し、うち {clean_incidents_count} 件が有効な事例として解析されました。")
-        st.info("左のメニューから「チェックリストビューア」へ移動して確認してください。")
+    cache_stats = get_http_cache().summary()
+    c1, c2, c3, c4 = st.columns(4)
+    c1.metric("HTTPキャッシュ ヒット", cache_stats["hits"])
+    c2.metric("HTTPキャッシュ ミス", cache_stats["misses"])
+    c3.metric("キャッシュ容量", f"{cache_stats['bytes'] / (1024 * 1024):.1f} MB ({cache_stats['entries']}件)")
+    c4.metric("重複スキップ (累計)", get_incident_store().duplicates_skipped())
+
+    with st.expander("⏱️ 処理時間の内訳 (直近の計測)"):
+        render_metrics_panel()
 
     st.markdown("---")
 
     st.subheader("2. PDFファイルをアップロードしてデータセットに追加")
-    st.caption("お手元のインシデント報告書PDFを直接解析し、データセットに追加します。")
-
-    uploaded_file = st.file_uploader("インシデント報告書 (PDF)", type="pdf")
-
-    if uploaded_file is not None:
-        if st.button("📄 アップロードされたPDFを解析"):
-            with st.spinner("PDFを解析中..."):
-                try:
-                    pdf_bytes = uploaded_file.read()
-                    raw_text = extract_text_from_pdf(pdf_bytes)
-
-                    if len(raw_text) > 100 and not is_likely_garbled(raw_text):
-                        record = parse_report_text(raw_text, f"アップロードファイル: {uploaded_file.name}")
-
-                        current = load_data()
-                        current.append(record)
-                        save_data(current)
-                        run_checklist_generation(current)
-
-                        st.success(f"PDFファイル「{uploaded_file.name}」の解析に成功し、データセットが更新されました。")
-                        st.markdown(f"**解析結果概要:** {record['description']}")
-                        st.info("左のメニューから「チェックリストビューア」へ移動して確認してください。")
-                    else:
-                        st.error("エラー: PDFから有効な日本語テキストを抽出できませんでした。ファイルが暗号化されているか、文字化けが激しい可能性があります。")
-                except Exception as e:
-                    st.error(f"解析中に予期せぬエラーが発生しました: {e}")
+    st.caption("お手元のインシデント報告書PDF（複数可）またはPDFをまとめたZIPを解析し、データセットに追加します。")
+
+    uploaded_files = st.file_uploader("インシデント報告書 (PDF / ZIP)", type=["pdf", "zip"],
+                                      accept_multiple_files=True)
+
+    if uploaded_files:
+        if st.button(f"📄 アップロードされた{len(uploaded_files)}件のファイルを解析"):
+            try:
+                with ingest_lock(timeout=0), st.spinner("PDFを解析中..."):
+                    # 壊れたPDFで画面が固まらないよう、抽出はワーカープロセスで制限時間付きで並行して行う
+                    report, clear_progress = progress_reporter()
+                    records, results = ingest_uploaded_files([(f.name, f.getvalue()) for f in uploaded_files],
+                                                             on_progress=report)
+                    clear_progress()
+                    # 全件を追記してから、チェックリストは最後に1回だけ更新する
+                    if records:
+                        update_checklists(records, get_incident_store().count())
+            except LockBusy:
+                st.warning(LOCK_BUSY_MESSAGE)
+            except Exception as e:
+                st.error(f"解析中に予期せぬエラーが発生しました: {e}")
+            else:
+                render_upload_results(records, results)
 
     st.markdown("---")
 
@@ -615,30 +671,19 @@ def page_manager():
                 "source": "手動入力",
                 "date": datetime.now().strftime("2025-12-01")
             }
-            current = load_data()
-            current.append(new_record)
-            save_data(current)
-            run_checklist_generation(current)
-            st.success("追加しました！チェックリストが更新されました。")
+            try:
+                with ingest_lock(timeout=0):
+                    dataset_size = append_data([new_record])
+                    update_checklists([new_record], dataset_size)
+                st.success("追加しました！チェックリストが更新されました。")
+            except LockBusy:
+                st.warning(LOCK_BUSY_MESSAGE)
+            except sqlite3.Error as e:
+                st.error(f"データセットへの保存に失敗しました: {e}")
 
     st.markdown("---")
-    st.subheader("現在のデータセット概要 (最新10件)")
-    incidents = load_data()
-
-    clean_incidents = [i for i in incidents if not is_likely_garbled(i.get("description", ""))]
-
-    if clean_incidents:
-        df = pd.DataFrame([
-            {"種別": i.get("incident_type"),
-             "概要": i.get("description", "").replace('\n', ' ')[:40] + "...",
-             "原因": i.get("cause", "").replace('\n', ' ')[:40] + "..."
-             }
-            for i in clean_incidents[-10:]
-        ])
-        st.caption(f"全データ件数: {len(incidents)}件 (うち、文字化けを除外した有効件数: {len(clean_incidents)}件)")
-        st.table(df)
-    else:
-        st.write("有効なデータがありません。PDFのアップロードまたは手動入力を試してください。")
+    st.subheader("現在のデータセット")
+    render_dataset_browser()
 
 
 # ==========================================
@@ -649,32 +694,24 @@ def main():
     
     # ★★★ 最終強制リセットロジック ★★★
     if os.path.exists(CHECKLISTS_PATH) and not st.session_state.get('initial_load_done', False):
-        try:
-            st.session_state['initial_load_done'] = True
-            
-            with open(CHECKLISTS_PATH, 'r', encoding='utf-8') as f:
-                content = json.load(f)
-                # データのサイズが非常に小さい場合は、古いデータ構造の可能性があるため再構築
-                if len(content.get('輸血', '')) < 100:
-                    st.warning("🔄 古いチェックリストデータが検出されました。最新のコードでリストを再生成します。")
-                    if os.path.exists(DATASET_PATH):  
-                        incidents = load_data()
-                        run_checklist_generation(incidents)
-                    else:
-                        run_checklist_generation([])
-
-        except (json.JSONDecodeError, FileNotFoundError):
-            if os.path.exists(DATASET_PATH):  
-                incidents = load_data()
-                run_checklist_generation(incidents)
-            else:
-                run_checklist_generation([])
+        st.session_state['initial_load_done'] = True
+
+        # ファイル先頭の形式バージョンだけを読み、旧形式・壊れたファイルであれば再構築
+        if read_checklists_version() != CHECKLISTS_SCHEMA_VERSION:
+            st.warning("🔄 古いチェックリストデータが検出されました。最新のコードでリストを再生成します。")
+            regenerate_checklists_if_idle()
 
     st.sidebar.title("メニュー")
-    page = st.sidebar.radio("機能選択", ["チェックリストビューア", "データ管理・更新"])
+    page = st.sidebar.radio("機能選択", ["チェックリストビューア", "実施状況", "インシデント検索", "傾向分析", "データ管理・更新"])
 
     if page == "チェックリストビューア":
         page_viewer()
+    elif page == "実施状況":
+        page_compliance()
+    elif page == "インシデント検索":
+        page_search()
+    elif page == "傾向分析":
+        page_analytics()
     elif page == "データ管理・更新":
         page_manager()
 
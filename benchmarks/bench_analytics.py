@@ -0,0 +1,108 @@
+"""傾向分析の集計時間: 列指向スナップショット（メモリマップ）vs 全件を dict で読み込んで集計（変更前の方法）
+
+    python -m benchmarks.bench_analytics --size 1000000 --legacy-size 100000
+
+合成レコード（日付は3年間に散らばらせる）からスナップショットを作り、分析ページと同じ集計を
+条件を変えて計測する。変更前の方法はメモリに収まる --legacy-size 件で、ストアの本文(JSON)を
+読み込む処理から計測する。
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter
+from datetime import date
+
+from benchmarks import corpus
+from incident_record import IncidentRecord, StringPool
+from incident_snapshot import (IncidentSnapshot, filter_snapshot, garbled_ratio, monthly_counts, split_causes,
+                               top_causes)
+
+DISTINCT_RECORDS = 20_000
+DATES = [date(2023 + m // 12, m % 12 + 1, d).isoformat() for m in range(36) for d in (1, 10, 20)]
+
+# (表示名, filter_snapshot の引数)
+CASES = [
+    ("全件", dict()),
+    ("処置で絞り込み", dict(procedures=["輸血", "中心静脈カテーテル"])),
+    ("期間で絞り込み", dict(date_from=date(2025, 1, 1), date_to=date(2025, 6, 30))),
+]
+
+
+def _records(n: int):
+    """合成レコードを取得元・日付を変えながら繰り返して n 件返す"""
+    templates = corpus.make_records(DISTINCT_RECORDS)
+    rng = random.Random(0)
+    for i in range(n):
+        record = dict(templates[i % len(templates)])
+        record["source"] = f"https://www.med-safe.jp/pdf/synthetic_{i:07d}.pdf"
+        record["date"] = rng.choice(DATES)
+        yield record
+
+
+def _legacy(documents):
+    # 変更前: 本文(JSON)を全件 dict にしてから、処置×月・原因・文字化けを数える
+    by_month, causes, garbled = Counter(), Counter(), Counter()
+    for record in map(json.loads, documents):
+        month = record["date"][:7]
+        garbled[month, record["garbled"]] += 1
+        if not record["garbled"]:
+            by_month[month, record["procedure"]] += 1
+            causes.update(split_causes(record["cause"]))
+    return by_month, causes.most_common(15), garbled
+
+
+def _legacy_ms(size: int) -> float:
+    documents = [json.dumps(r, ensure_ascii=False) for r in _records(size)]
+    start = time.perf_counter()
+    _legacy(documents)
+    return (time.perf_counter() - start) * 1000
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _aggregate(table, conditions):
+    filtered = filter_snapshot(table, **conditions)
+    return monthly_counts(filtered), top_causes(filtered, 15), garbled_ratio(filtered)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--legacy-size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    legacy = _legacy_ms(args.legacy_size)
+    print(f"変更前 (dict に読み込んで集計) {args.legacy_size}件: {legacy:8.0f} ms")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = IncidentSnapshot(os.path.join(tmp, "incident_snapshot"))
+        pool = StringPool()
+        start = time.perf_counter()
+        snapshot.rebuild((IncidentRecord.from_dict(r, i + 1, pool) for i, r in enumerate(_records(args.size))), 0)
+        build = time.perf_counter() - start
+        size_mb = sum(os.path.getsize(os.path.join(snapshot.directory, n)) for n in snapshot.manifest()["segments"])
+        print(f"スナップショット作成 {args.size}件: {build:.1f} s / {size_mb / 2**20:.0f} MB")
+
+        open_ms = _median_ms(snapshot.read, args.repeat)
+        table = snapshot.read()
+        print(f"メモリマップで開く: {open_ms:.1f} ms")
+        for label, conditions in CASES:
+            ms = _median_ms(lambda: _aggregate(table, conditions), args.repeat)
+            rows = filter_snapshot(table, **conditions).num_rows
+            print(f"  {label:<10} {rows:>8}件: 集計 {ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""データセット一覧1ページ分の表示時間: 索引による絞り込み・ページ分割 vs 全件読み込み（変更前）
+
+    python -m benchmarks.bench_browse --sizes 10000 100000
+
+変更前のデータ管理ページは最新10件の表示のために全レコードを読み込んでいた。
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import corpus
+from incident_store import IncidentStore
+
+PAGE_SIZE = 20
+
+# (表示名, browse の引数)
+CASES = [
+    ("最新のページ", dict()),
+    ("最後のページ", dict(offset=-1)),
+    ("種別で絞り込み", dict(incident_type="輸血")),
+    ("取得元で絞り込み", dict(source_prefix="https://www.med-safe.jp/pdf/synthetic_00001")),
+    ("日付順・文字化け含む", dict(order="date", include_garbled=True)),
+]
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _load_all_recent(store: IncidentStore):
+    # 変更前: 全件を読み込み、文字化けを除いた最新10件を表示
+    return [r for r in store.load_all() if not r.get("garbled")][-10:]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            store = IncidentStore(os.path.join(tmp, "incident_dataset.sqlite3"))
+            records = corpus.make_records(size)
+            for i in range(0, size, 10_000):
+                store.append(records[i:i + 10_000])
+            del records
+
+            legacy = _median_ms(lambda: _load_all_recent(store), min(args.repeat, 3))
+            counts = _median_ms(store.procedure_counts, args.repeat)
+            print(f"{size:>7}件: 全件読み込み {legacy:8.1f} ms / 処置ごとの件数 {counts:6.1f} ms")
+            for label, kwargs in CASES:
+                kwargs = dict(kwargs)
+                if kwargs.get("offset") == -1:
+                    total, _ = store.browse(limit=0)
+                    kwargs["offset"] = max(total - PAGE_SIZE, 0)
+                total, _ = store.browse(limit=PAGE_SIZE, **kwargs)
+                ms = _median_ms(lambda: store.browse(limit=PAGE_SIZE, **kwargs), args.repeat)
+                print(f"  {label:<14} {total:>7}件中1ページ: {ms:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""チェックリストビューアのコールドスタート時間（新しいプロセスで最初の1画面を描画するまで）
+
+    python -m benchmarks.bench_cold_start --runs 5
+    python -m benchmarks.bench_cold_start --repo /path/to/other/checkout  # 別の版と比較
+
+ビューアの描画に不要な重いライブラリが読み込まれていないかも併せて表示する。
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ["pandas", "numpy", "requests", "bs4", "pdfplumber", "pdfminer"]
+
+# 計測用のチェックリスト・データセットを作る（計測対象とは別プロセス）
+_SETUP = r"""
+import sys
+from benchmarks import corpus
+import core
+core.append_data(corpus.make_records(int(sys.argv[1])))
+core.run_checklist_generation(core.load_data())
+"""
+
+# 1回分の計測: streamlit の読み込みから、ビューア（初期ページ）の描画完了まで
+_CASE = r"""
+import json, sys, time
+start = time.perf_counter()
+from streamlit.testing.v1 import AppTest
+imported = time.perf_counter()
+at = AppTest.from_file(sys.argv[1], default_timeout=120).run()
+rendered = time.perf_counter()
+assert not at.exception, at.exception
+heavy = [m for m in json.loads(sys.argv[2]) if m in sys.modules]
+print(json.dumps({"streamlit_import": imported - start, "first_render": rendered - imported,
+                  "total": rendered - start, "heavy_modules": heavy}))
+"""
+
+
+def _env(repo: str) -> dict:
+    env = dict(os.environ)
+    # core 等は計測対象の版から、benchmarks はこのチェックアウトから読み込む
+    env["PYTHONPATH"] = os.pathsep.join([repo, ROOT, env.get("PYTHONPATH", "")])
+    return env
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repo", default=ROOT, help="計測する app5.py のあるディレクトリ")
+    parser.add_argument("--records", type=int, default=1000, help="チェックリスト生成に使う合成レコード数")
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    repo = os.path.abspath(args.repo)
+    with tempfile.TemporaryDirectory() as workdir:
+        subprocess.run([sys.executable, "-c", _SETUP, str(args.records)], cwd=workdir, env=_env(repo),
+                       check=True, capture_output=True)
+        runs = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, "-c", _CASE, os.path.join(repo, "app5.py"),
+                                  json.dumps(HEAVY_MODULES)],
+                                 cwd=workdir, env=_env(repo), check=True, capture_output=True, text=True).stdout
+            runs.append(json.loads(out.strip().splitlines()[-1]))
+
+    for key, label in [("streamlit_import", "streamlit 読み込み"), ("first_render", "ビューア初回描画"),
+                       ("total", "合計")]:
+        values = [r[key] * 1000 for r in runs]
+        print(f"{label:<16} 中央値 {statistics.median(values):7.1f} ms (最小 {min(values):7.1f} ms)")
+    print("読み込まれた重いライブラリ:", ", ".join(runs[-1]["heavy_modules"]) or "なし")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""チェックリストの実施記録: 操作ごとにコミット vs 書き込み待ちをまとめて書き出し / 集計表 vs ログの再集計
+
+    python -m benchmarks.bench_completion --users 40 --clicks 50 --log-size 1000000
+
+1. --users 人が同時に --clicks 回ずつチェック操作をしたとき、全操作を書き終えるまでの時間と
+   1操作あたりの応答時間（操作ごとにコミットする場合は書き込みの完了まで待つ）
+2. --log-size 件の操作が記録された状態で、実施状況の表示に必要な集計を得る時間
+   （集計表を読む / イベントログ全体を集計し直す）
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+
+from completion_log import CompletionLog
+
+PROCEDURES = ["輸血", "採血", "点滴・薬剤", "手術", "中心静脈カテーテル"]
+ITEMS_PER_PROCEDURE = 12
+
+# イベントログ全体から、利用者ごとの最新の状態を求めて処置・項目ごとに数える（集計表を使わない場合）
+RESCAN_SQL = """
+SELECT procedure, item_id, SUM(checked) FROM (
+    SELECT e.procedure, e.item_id, e.checked FROM completion_events e
+    JOIN (SELECT MAX(id) AS id FROM completion_events GROUP BY procedure, user, item_id) latest ON e.id = latest.id
+) GROUP BY procedure, item_id
+"""
+
+
+def _event(rng: random.Random, user: int):
+    proc = rng.choice(PROCEDURES)
+    return f"nurse{user:03d}", proc, f"{proc}-{rng.randrange(ITEMS_PER_PROCEDURE):02d}", rng.random() < 0.8
+
+
+def _ward(log: CompletionLog, users: int, clicks: int, per_click_commit: bool):
+    latencies = []
+    lock = threading.Lock()
+
+    def nurse(user: int):
+        rng = random.Random(user)
+        for _ in range(clicks):
+            start = time.perf_counter()
+            log.record(*_event(rng, user))
+            if per_click_commit:
+                log.flush()
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=nurse, args=(u,)) for u in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    log.close()
+    return time.perf_counter() - start, latencies
+
+
+def _median_ms(fn, repeat: int = 5) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--clicks", type=int, default=50)
+    parser.add_argument("--log-size", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        total = args.users * args.clicks
+        for label, per_click in [("操作ごとにコミット", True), ("まとめて書き出し", False)]:
+            log = CompletionLog(os.path.join(tmp, f"per_click_{per_click}.sqlite3"))
+            seconds, latencies = _ward(log, args.users, args.clicks, per_click)
+            latencies.sort()
+            print(f"{args.users}人 x {args.clicks}回 {label:<10}: {seconds:6.2f} s ({total / seconds:7.0f} 件/s) "
+                  f"応答 中央値 {latencies[len(latencies) // 2] * 1000:6.2f} ms / "
+                  f"99% {latencies[int(len(latencies) * 0.99)] * 1000:6.2f} ms")
+
+        log = CompletionLog(os.path.join(tmp, "large.sqlite3"), batch_size=50_000)
+        rng = random.Random(0)
+        start = time.perf_counter()
+        for i in range(0, args.log_size, 50_000):
+            log.record_many(_event(rng, rng.randrange(300)) + (time.time(),)
+                            for _ in range(min(50_000, args.log_size - i)))
+            log.flush()
+        print(f"{args.log_size}件の記録を作成: {time.perf_counter() - start:.1f} s")
+
+        def from_totals():
+            return log.procedure_totals(), [log.item_totals(p) for p in PROCEDURES]
+
+        def rescan():
+            with log._connect() as conn:
+                return conn.execute(RESCAN_SQL).fetchall()
+
+        print(f"実施状況の集計 集計表を読む       : {_median_ms(from_totals):8.2f} ms")
+        print(f"実施状況の集計 イベントログを再集計: {_median_ms(rescan, 3):8.2f} ms")
+        log.close()
+
+
+if __name__ == "__main__":
+    main()
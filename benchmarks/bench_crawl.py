@@ -0,0 +1,113 @@
+"""巡回のエンドツーエンド確認: http.server で配信するローカルのミラーを、中断・再開しながら巡回する
+
+    python -m benchmarks.bench_crawl --pages 30 --pdfs-per-page 2 --interval 0.05
+
+ページ送りでつながった索引ページ・robots.txt（/private/ を禁止）・範囲外へのリンクを含むサイトを作り、
+1. --first-run ページで打ち切った後、続きから最後まで巡回する
+2. 索引ページ・PDFがそれぞれ1回ずつしか取得されていないこと、robots.txt・範囲が守られていること、
+   同一ホストへのリクエスト間隔が --interval 以上であることを確認する
+3. 巡回が終わった後の再実行では、索引ページを条件付きGETで再検証するだけになることを確認する
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+
+from benchmarks import corpus
+from benchmarks.local_server import serve_directory
+
+
+def _write(path: str, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content.encode("utf-8") if isinstance(content, str) else content)
+
+
+def build_site(directory: str, pages: int, pdfs_per_page: int) -> int:
+    """ミラーサイトを作り、PDFの数を返す"""
+    _write(os.path.join(directory, "robots.txt"), "User-agent: *\nDisallow: /private/\n")
+    _write(os.path.join(directory, "private", "secret.html"), "<html><body>禁止</body></html>")
+    _write(os.path.join(directory, "report", "index.html"),
+           '<html><body><a href="list_1.html">一覧</a> <a href="#top">先頭</a>'
+           ' <a href="mailto:info@example.com">問い合わせ</a></body></html>')
+    pdfs = corpus.make_fixture_pdfs(pages * pdfs_per_page, garbled_ratio=0, max_extra_pages=0)
+    for i, pdf in enumerate(pdfs):
+        _write(os.path.join(directory, "pdf", f"report_{i:04d}.pdf"), pdf)
+    for page in range(1, pages + 1):
+        links = [f'<a href="../pdf/report_{(page - 1) * pdfs_per_page + j:04d}.pdf">報告書</a>'
+                 for j in range(pdfs_per_page)]
+        links += ['<a href="index.html">トップ</a>', '<a href="/private/secret.html">内部</a>',
+                  '<a href="/private/draft.pdf">草稿</a>', '<a href="https://example.com/other.pdf">外部</a>',
+                  '<a href="logo.png">画像</a>']
+        if page > 1:
+            links.append(f'<a href="list_{page - 1}.html">前へ</a>')
+        if page < pages:
+            links.append(f'<a href="list_{page + 1}.html#results">次へ</a>')
+        _write(os.path.join(directory, "report", f"list_{page}.html"),
+               f"<html><body>{' '.join(links)}</body></html>")
+    return len(pdfs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=30, help="ページ送りでつながった一覧ページの数")
+    parser.add_argument("--pdfs-per-page", type=int, default=2)
+    parser.add_argument("--first-run", type=int, default=10, help="1回目に巡回するページ数（そこで中断する）")
+    parser.add_argument("--interval", type=float, default=0.05, help="同一ホストへのリクエスト間隔（秒）")
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    log = []
+    with tempfile.TemporaryDirectory() as site, tempfile.TemporaryDirectory() as workdir:
+        total_pdfs = build_site(site, args.pages, args.pdfs_per_page)
+        with serve_directory(site, request_log=log) as base_url:
+            os.chdir(workdir)  # データセット・巡回状態・キャッシュはすべて作業ディレクトリに作る
+            import core
+
+            seeds = [base_url + "report/index.html"]
+            options = dict(concurrency=args.concurrency, seeds=seeds, min_interval=args.interval)
+            start = time.perf_counter()
+            core.scrape_and_update_dataset(total_pdfs, max_pages=args.first_run, **options)
+            first = len(log)
+            print(f"1回目 ({args.first_run}ページで中断): リクエスト {first}件 / "
+                  f"データセット {core.get_incident_store().count()}件", file=sys.stderr)
+
+            core.scrape_and_update_dataset(total_pdfs, max_pages=None, **options)
+            elapsed = time.perf_counter() - start
+            print(f"2回目 (続きから最後まで): リクエスト {len(log) - first}件 / "
+                  f"データセット {core.get_incident_store().count()}件 / 合計 {elapsed:.1f}s", file=sys.stderr)
+            crawl_log = list(log)
+
+            rerun_start = len(log)
+            core.scrape_and_update_dataset(total_pdfs, max_pages=None, **options)
+            cache = core.get_http_cache().summary()
+            summary = core.get_crawl_frontier().summary()
+            dataset = core.get_incident_store().count()
+
+    paths = Counter(path for _, path in crawl_log)
+    pages = {p: n for p, n in paths.items() if p.endswith(".html")}
+    pdfs = {p: n for p, n in paths.items() if p.endswith(".pdf")}
+    assert len(pages) == args.pages + 1, f"索引ページの取得漏れ: {len(pages)}/{args.pages + 1}"
+    assert all(n == 1 for n in pages.values()), "中断・再開で索引ページを取り直している"
+    assert len(pdfs) == total_pdfs and all(n == 1 for n in pdfs.values()), "PDFの取得漏れ・重複取得"
+    assert not any(p.startswith("/private/") for p in paths), "robots.txt で禁止されたパスを取得した"
+    assert dataset == total_pdfs, f"データセット {dataset}件 / PDF {total_pdfs}件"
+    assert summary["pdf"].get("done") == total_pdfs, summary
+
+    starts = [t for t, path in crawl_log if path != "/robots.txt"]
+    gaps = [b - a for a, b in zip(starts, starts[1:])]
+    # サーバー側で受けた時刻には数ms のずれが出るため、その分の余裕をみる
+    assert min(gaps) >= args.interval - 0.01, f"リクエスト間隔が短すぎる: {min(gaps):.3f}s"
+
+    rerun = log[rerun_start:]
+    print(f"索引ページ {len(pages)}件・PDF {len(pdfs)}件をそれぞれ1回ずつ取得 / "
+          f"最小リクエスト間隔 {min(gaps) * 1000:.0f} ms / robots.txt で除外 "
+          f"{sum(summary.get(k, {}).get('disallowed', 0) for k in summary)}件")
+    print(f"巡回完了後の再実行: リクエスト {len(rerun)}件 (PDFの取得 "
+          f"{sum(1 for _, p in rerun if p.endswith('.pdf'))}件) / キャッシュヒット {cache['hits']}件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""PDFダウンロードの逐次取得と並行取得の比較
+
+    python -m benchmarks.bench_fetch --files 50 --latency 0.2
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.local_server import serve_directory
+from fetcher import iter_downloads
+
+
+def _write_fixtures(directory: str, count: int, size: int):
+    for i in range(count):
+        with open(os.path.join(directory, f"report_{i:04d}.pdf"), "wb") as f:
+            f.write(b"%PDF-1.4\n" + os.urandom(size))
+
+
+def _run(urls, concurrency: int, per_host_limit: int) -> float:
+    start = time.perf_counter()
+    fetched = sum(1 for _, _, body in iter_downloads(urls, concurrency=concurrency,
+                                                     per_host_limit=per_host_limit) if body)
+    elapsed = time.perf_counter() - start
+    assert fetched == len(urls), f"取得失敗: {len(urls) - fetched} 件"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--files", type=int, default=50)
+    parser.add_argument("--size", type=int, default=200_000)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--per-host", type=int, default=4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _write_fixtures(tmp, args.files, args.size)
+        with serve_directory(tmp, latency=args.latency) as base_url:
+            urls = [f"{base_url}report_{i:04d}.pdf" for i in range(args.files)]
+            sequential = _run(urls, 1, 1)
+            concurrent = _run(urls, args.concurrency, args.per_host)
+
+    print(f"逐次取得: {sequential:.2f}s")
+    print(f"並行取得 (concurrency={args.concurrency}, per_host={args.per_host}): {concurrent:.2f}s")
+    print(f"速度比: x{sequential / concurrent:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""キーワード照合のマイクロベンチマークと、旧実装との分類結果の一致確認
+
+    python -m benchmarks.bench_keywords --docs 2000
+"""
+import argparse
+import random
+import re
+import time
+
+from core import ACTION_KEYWORDS, NOISE_KEYWORDS, PROCEDURES, classify_procedure, extract_action_items
+from keyword_matcher import KeywordMatcher
+
+# 旧実装と同じキーワード（PDF抽出用の NOISE_MATCHER は報告書の見出しを残すため、ここでは全件を使う）
+NOISE_MATCHER = KeywordMatcher([("noise", NOISE_KEYWORDS)])
+FILLER = "患者に対して処置を行った際に看護師が気づいたがそのまま実施した事例である。病棟では夜勤帯で人手が少なく"
+
+
+# --- 変更前の実装（比較用） ---
+def _legacy_classify_procedure(text: str) -> str:
+    if not text:
+        return "その他"
+    for proc, words in PROCEDURES.items():
+        if any(w in text for w in words):
+            return proc
+    return "その他"
+
+
+def _legacy_extract_action_items(prevention_text: str):
+    actions = []
+    for s in re.split(r'[。\n]', prevention_text):
+        s = s.strip()
+        if not s: continue
+        if len(s) < 5 or len(s) > 100: continue
+        if any(noise in s for noise in NOISE_KEYWORDS): continue
+        if any(action in s for action in ACTION_KEYWORDS):
+            cleaned_s = re.sub(r'[、。]$', '', s)
+            cleaned_s = re.sub(r'^[-\d\.\s・]+', '', cleaned_s).strip()
+            actions.append(cleaned_s)
+    return actions
+
+
+def _legacy_remove_noise(text: str) -> str:
+    for noise in NOISE_KEYWORDS:
+        text = text.replace(noise, '')
+    return text
+
+
+def _make_text(rng: random.Random, length: int) -> str:
+    keywords = [w for ws in PROCEDURES.values() for w in ws] + ACTION_KEYWORDS + NOISE_KEYWORDS
+    out = []
+    while sum(map(len, out)) < length:
+        out.append(rng.choice(keywords) if rng.random() < 0.1 else FILLER[rng.randrange(len(FILLER) - 8):][:8])
+        if rng.random() < 0.1:
+            out.append("。")
+    return "".join(out)[:length]
+
+
+def _time_us(fn, texts) -> float:
+    start = time.perf_counter()
+    for t in texts:
+        fn(t)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+
+    # 一致確認: 分類とアクション項目は旧実装と完全に同じ結果になること
+    for length in (200, 300, 3000):
+        texts = [_make_text(rng, length) for _ in range(args.docs)]
+        assert [classify_procedure(t) for t in texts] == [_legacy_classify_procedure(t) for t in texts]
+        assert [extract_action_items(t) for t in texts] == [_legacy_extract_action_items(t) for t in texts]
+        noise_diff = sum(NOISE_MATCHER.remove(t) != _legacy_remove_noise(t) for t in texts)
+
+        print(f"--- {length} 文字 x {args.docs} 件 (分類・アクション抽出: 旧実装と一致)")
+        for name, new, old in [
+            ("classify_procedure", classify_procedure, _legacy_classify_procedure),
+            ("extract_action_items", extract_action_items, _legacy_extract_action_items),
+            ("ノイズ除去", NOISE_MATCHER.remove, _legacy_remove_noise),
+        ]:
+            print(f"{name:<22} 旧 {_time_us(old, texts):8.1f} us / 新 {_time_us(new, texts):8.1f} us")
+        # 旧実装は1語ずつ順に置換するため、「情報提供と位置づけております」から
+        # 「情報提供と位置づけ」だけを消して「おります」を残してしまう（新実装は最長一致で全体を除去）
+        print(f"ノイズ除去の結果が異なる件数: {noise_diff}")
+
+    # キーワード数に対するスケーリング（20,000文字のテキスト1件から全キーワードの出現を検出）
+    print("--- キーワード数に対するスケーリング")
+    chars = FILLER + "".join(ACTION_KEYWORDS)
+    text = "".join(rng.choice(chars) for _ in range(20_000))
+    for n in (100, 1000, 5000):
+        words = sorted({"".join(rng.choice(chars) for _ in range(rng.randint(3, 8))) for _ in range(n)})
+        matcher = KeywordMatcher([("kw", words)])
+        old = _time_us(lambda t: [w for w in words if w in t], [text]) / 1000
+        new = _time_us(matcher.labels, [text]) / 1000
+        print(f"{n:>5} 語: 旧(語ごとに部分文字列検索) {old:7.2f} ms / 新 {new:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""レコードのメモリ使用量: dict のリスト（変更前の load_data）vs IncidentRecord・逐次読み込み
+
+    python -m benchmarks.bench_memory --size 1000000 --store-size 50000
+
+1. --size 件のレコードをメモリに保持したときの増加量（dict のリスト / IncidentRecord のリスト）
+2. --store-size 件のストアからチェックリストを全件再生成するときのピーク
+   （全件を読み込んでから集計 / iter_records で少しずつ読みながら集計）
+計測ごとに新しいプロセスを起動し、最大RSSの増加量を比べる（Linux・macOS）。
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks import corpus
+
+# 合成コーパスは種類が限られるため、この件数の報告書を取得元だけ変えて繰り返す
+DISTINCT_RECORDS = 20_000
+
+
+def _max_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10
+
+
+def _hold_records(size: int, compact: bool):
+    from incident_record import IncidentRecord, StringPool
+
+    # ストアの本文と同じ JSON から読み込む（値の文字列はレコードごとに別のオブジェクトになる）
+    templates = [json.dumps(r, ensure_ascii=False) for r in corpus.make_records(DISTINCT_RECORDS)]
+    pool = StringPool()
+    before = _max_rss_mb()
+    start = time.perf_counter()
+    records = []
+    for i in range(size):
+        record = json.loads(templates[i % len(templates)])
+        record["source"] = f"https://www.med-safe.jp/pdf/synthetic_{i:07d}.pdf"
+        records.append(IncidentRecord.from_dict(record, i + 1, pool) if compact else record)
+    return _max_rss_mb() - before, time.perf_counter() - start
+
+
+def _generate_checklists(workdir: str, streaming: bool):
+    os.chdir(workdir)
+    import core
+
+    store = core.get_incident_store()
+    before = _max_rss_mb()
+    start = time.perf_counter()
+    if streaming:
+        core.run_checklist_generation()
+    else:
+        core.run_checklist_generation(store.load_all())
+    return _max_rss_mb() - before, time.perf_counter() - start
+
+
+def _in_new_process(fn, *args):
+    with multiprocessing.get_context("spawn").Pool(1) as pool:
+        return pool.apply(fn, args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=1_000_000)
+    parser.add_argument("--store-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    for label, compact in [("dict のリスト", False), ("IncidentRecord", True)]:
+        mb, seconds = _in_new_process(_hold_records, args.size, compact)
+        print(f"{args.size}件を保持 {label:<16} {mb:8.0f} MB ({mb * 2**20 / args.size:5.0f} B/件) / {seconds:5.1f} s")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        from incident_store import IncidentStore
+
+        store = IncidentStore(os.path.join(workdir, "incident_dataset.sqlite3"))
+        for i in range(0, args.store_size, 10_000):
+            store.append(corpus.make_records(min(10_000, args.store_size - i), seed=i))
+        for label, streaming in [("全件読み込み", False), ("逐次読み込み", True)]:
+            mb, seconds = _in_new_process(_generate_checklists, workdir, streaming)
+            print(f"{args.store_size}件からチェックリスト生成 {label:<8} ピーク +{mb:6.0f} MB / {seconds:5.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""複数ページPDFの抽出時間とピークRSS: ページごとに解放するストリーミング抽出 vs 全ページ保持
+
+    python -m benchmarks.bench_pages --pages 10 50 100
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.pdf_fixtures import make_pdf
+
+FILLER = "病棟での処置の経過を時系列で記載する。担当看護師は複数の患者を受け持っていた。" * 40
+
+# 各ケースはピークRSSを独立に測るため別プロセスで実行する
+_CASE = r"""
+import json, resource, sys, time, io
+import pdfplumber
+from keyword_matcher import KeywordMatcher
+from pdf_extraction import extract_text
+from report_sections import ReportSegmenter
+
+path, mode = sys.argv[1], sys.argv[2]
+pdf_bytes = open(path, "rb").read()
+matcher = KeywordMatcher([("noise", ["平成"])])
+sections = ReportSegmenter({"description": (["概要"], 200), "cause": (["原因"], 200),
+                            "prevention": (["対策", "再発防止"], 300)})
+start = time.perf_counter()
+if mode == "naive":
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        text = " ".join(p.extract_text() or "" for p in pdf.pages)
+elif mode == "stream":
+    text = extract_text(pdf_bytes, matcher, max_pages=None)
+else:
+    text = extract_text(pdf_bytes, matcher, max_pages=None, sections=sections)
+elapsed = time.perf_counter() - start
+print(json.dumps({"seconds": elapsed, "maxrss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+                  "chars": len(text)}))
+"""
+
+
+def _run_case(path: str, mode: str) -> dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    out = subprocess.run([sys.executable, "-c", _CASE, path, mode], cwd=root,
+                         capture_output=True, text=True, check=True).stdout
+    return json.loads(out)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 100])
+    args = parser.parse_args()
+
+    report = "概要 輸血実施時に患者確認を省略しそうになった。" * 10 + "原因 確認が形式的だった。" * 20 + "対策 二重確認を徹底する。" * 30
+    with tempfile.TemporaryDirectory() as tmp:
+        for pages in args.pages:
+            path = os.path.join(tmp, f"report_{pages}.pdf")
+            with open(path, "wb") as f:
+                # 見出しは1ページ目にあり、残りは経過記録などの長い本文
+                f.write(make_pdf([report] + [FILLER] * (pages - 1)))
+            for mode, label in [("naive", "全ページ保持"), ("stream", "ページ毎に解放"), ("early", "見出しで打ち切り")]:
+                r = _run_case(path, mode)
+                print(f"{pages:>4} ページ {label:<10} {r['seconds']:7.2f}s  ピークRSS {r['maxrss_mb']:7.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
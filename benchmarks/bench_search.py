@@ -0,0 +1,76 @@
+"""全文検索のレイテンシ: 2-gram転置インデックス vs 全件読み込み＋部分一致（変更前の探し方）
+
+    python -m benchmarks.bench_search --size 100000
+
+合成コーパスをストアに追記し（インデックスは追記と同時に構築）、代表的な検索語の中央値を計測する。
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from benchmarks import corpus
+from incident_store import IncidentStore
+from search_index import parse_query
+
+# (表示名, 検索語, 種別)
+QUERIES = [
+    ("2文字", "輸血", None),
+    ("複数語 (AND)", "看護師 省略", None),
+    ("語句", '"手順を省略"', None),
+    ("長い語句", '"申し送りが不十分であった"', None),
+    ("種別で絞り込み", "シリンジポンプ", "患者確認・指導"),
+    ("1文字", "薬", None),
+    ("該当なし", "存在しない語句", None),
+]
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _scan(store: IncidentStore, query: str, incident_type):
+    # 全件を読み込み、概要・原因・再発防止策に各語が含まれるかを調べる
+    terms = parse_query(query)
+    return [r for r in store.load_all()
+            if (incident_type is None or r.get("incident_type") == incident_type)
+            and all(any(t in r.get(f, "").lower() for f in ("description", "cause", "prevention")) for t in terms)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--batch", type=int, default=1000, help="1回の追記の件数（取り込み処理の単位）")
+    args = parser.parse_args()
+
+    records = corpus.make_records(args.size)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "incident_dataset.sqlite3")
+        store = IncidentStore(path)
+        start = time.perf_counter()
+        for i in range(0, len(records), args.batch):
+            store.append(records[i:i + args.batch])
+        build = time.perf_counter() - start
+        print(f"{args.size}件を追記（インデックス込み）: {build:.1f} s / DB {os.path.getsize(path) / 2**20:.0f} MB")
+
+        one = corpus.make_records(args.repeat, seed=1)
+        append_ms = _median_ms(lambda: store.append([one.pop()]), args.repeat)
+        print(f"1件追記: {append_ms:.1f} ms")
+
+        for label, query, incident_type in QUERIES:
+            total, _ = store.search(query, incident_type)
+            indexed = _median_ms(lambda: store.search(query, incident_type), args.repeat)
+            scanned = _median_ms(lambda: _scan(store, query, incident_type), 1)
+            print(f"{label:<12} {query:<28} {total:>7}件: インデックス {indexed:7.1f} ms / "
+                  f"全件走査 {scanned:8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
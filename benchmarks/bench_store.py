@@ -0,0 +1,68 @@
+"""インシデント1件追記のレイテンシ比較: 旧JSON全件書き換え vs SQLite(WAL)ストア
+
+    python -m benchmarks.bench_store --sizes 10000 100000
+"""
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+
+from incident_store import IncidentStore
+
+
+def _record(i: int) -> dict:
+    return {
+        "source": f"https://www.med-safe.jp/pdf/report_{i:06d}.pdf",
+        "date": "2025-12-01",
+        "department": "PDF解析",
+        "incident_type": "輸血",
+        "description": f"事例{i}: 輸血実施時に患者確認を省略しそうになった。" * 3,
+        "cause": "ダブルチェックが形式的になっていた",
+        "prevention": "指差し呼称による二重確認を徹底する。",
+        "impact": "不明",
+    }
+
+
+def _append_legacy_json(path: str, record: dict):
+    # 変更前の load_data → append → save_data と同じ処理
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    data.append(record)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+
+
+def _median_ms(fn, repeat: int) -> float:
+    samples = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for size in args.sizes:
+        records = [_record(i) for i in range(size)]
+        with tempfile.TemporaryDirectory() as tmp:
+            json_path = os.path.join(tmp, "incident_dataset.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(records, f, ensure_ascii=False, indent=2)
+            store = IncidentStore(os.path.join(tmp, "incident_dataset.sqlite3"))
+            store.append(records)
+
+            legacy = _median_ms(lambda i: _append_legacy_json(json_path, _record(size + i)), args.repeat)
+            sqlite = _median_ms(lambda i: store.append([_record(size + i)]), args.repeat)
+
+        print(f"{size:>7} 件: JSON全件書き換え {legacy:9.1f} ms / SQLite追記 {sqlite:7.2f} ms (x{legacy / sqlite:.0f})")
+
+
+if __name__ == "__main__":
+    main()
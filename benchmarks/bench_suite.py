@@ -0,0 +1,164 @@
+"""データ件数ごとの処理時間・ピークメモリを計測し、JSONで出力するベンチマークスイート
+
+    python -m benchmarks.bench_suite --sizes 1000 10000 100000 --output bench.json
+    python -m benchmarks.bench_suite --sizes 1000 10000 --baseline bench.json  # 前回との比較
+
+各ステージ・件数の組ごとに別プロセスで計測する（コーパス生成後のRSSを基準に、ステージ実行中の増分を記録）。
+PDF抽出は1件あたりが重いため、--max-pdfs 件までに抑えて計測する（長い報告書の解析はその10倍まで）。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+STAGES = ["extract_text_from_pdf", "is_likely_garbled", "parse_report_text", "parse_report_text_long",
+          "extract_action_items", "run_checklist_generation"]
+# parse_report_text_long で使う報告書テキストのページ数
+LONG_TEXT_PAGES = 20
+
+# 1ステージ分を計測する子プロセス
+_CASE = r"""
+import json, os, resource, sys, tempfile, time
+
+from benchmarks import corpus
+import core
+
+stage, size, seed, max_pdfs = sys.argv[1], int(sys.argv[2]), int(sys.argv[3]), int(sys.argv[4])
+
+if stage == "extract_text_from_pdf":
+    inputs = corpus.make_fixture_pdfs(min(size, max_pdfs), seed)
+    run = lambda: [core.extract_text_from_pdf(pdf) for pdf in inputs]
+elif stage == "parse_report_text":
+    inputs = corpus.make_texts(size, seed)
+    run = lambda: [core.parse_report_text(text, "bench") for text in inputs]
+elif stage == "parse_report_text_long":
+    # 複数ページの長い報告書。件数が多いとコーパスがメモリに収まらないため max_pdfs の10倍までに抑える
+    inputs = corpus.make_long_texts(min(size, max_pdfs * 10), int(sys.argv[5]), seed)
+    run = lambda: [core.parse_report_text(text, "bench") for text in inputs]
+else:
+    records = corpus.make_records(size, seed)
+    if stage == "is_likely_garbled":
+        inputs = [r["description"] for r in records]
+        run = lambda: [core.is_likely_garbled(text) for text in inputs]
+    elif stage == "extract_action_items":
+        inputs = [r["prevention"] for r in records]
+        run = lambda: [core.extract_action_items(text) for text in inputs]
+    else:
+        inputs = records
+        os.chdir(tempfile.mkdtemp())  # チェックリスト・集計ファイルの書き込み先
+        run = lambda: core.run_checklist_generation(inputs)
+
+rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+start = time.perf_counter()
+run()
+seconds = time.perf_counter() - start
+rss_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({"items": len(inputs), "seconds": seconds,
+                  "peak_rss_mb": rss_after / 1024, "peak_rss_delta_mb": (rss_after - rss_before) / 1024}))
+"""
+
+
+def run_case(stage: str, size: int, seed: int, max_pdfs: int) -> Dict:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    args = [stage, str(size), str(seed), str(max_pdfs), str(LONG_TEXT_PAGES)]
+    # 子プロセスは作業ディレクトリを移すため、sys.path の '' ではなく PYTHONPATH でリポジトリを見つける
+    # （core が関数の中で読み込むモジュールも、移った後に読み込まれる）
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([root, os.environ.get("PYTHONPATH", "")])}
+    out = subprocess.run([sys.executable, "-c", _CASE] + args,
+                         cwd=root, env=env, capture_output=True, text=True, check=True).stdout
+    result = json.loads(out)
+    result.update(stage=stage, size=size, per_item_us=result["seconds"] / max(result["items"], 1) * 1e6)
+    return result
+
+
+def check_report_sections():
+    """PDF抽出から解析までを通して、報告書の見出しが本文の区切りとして働くことを確かめる
+
+    見出しの多くは定型文 (NOISE_KEYWORDS) にも含まれるため、抽出時に除去されると区切りにならない。
+    """
+    import core
+    from benchmarks.pdf_fixtures import make_pdf
+
+    pdf = make_pdf(["概要 夜勤帯に輸血の患者確認を省略しそうになった。 原因 ダブルチェックが形式的だった。 "
+                    "背景要因 夜勤帯の人員が不足していた。 対策 2名で照合を徹底する。",
+                    "経過と結末 患者への影響はなかった。"])
+    text = core.extract_text_from_pdf(pdf)
+    headings = [heading for heading, _, _, _ in core.REPORT_SEGMENTER.segment(text)]
+    record = core.parse_report_text(text, "bench")
+    assert headings == ["概要", "原因", "背景要因", "対策", "経過と結末"], headings
+    assert record["cause"] == "ダブルチェックが形式的だった。", record["cause"]
+    assert record["prevention"] == "2名で照合を徹底する。", record["prevention"]
+
+
+def _git_revision() -> str:
+    try:
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results: List[Dict], baseline: Dict) -> List[str]:
+    """前回の結果と同じステージ・件数のものについて、1件あたりの時間の比を返す"""
+    previous = {(r["stage"], r["size"]): r for r in baseline["results"]}
+    lines = []
+    for r in results:
+        old = previous.get((r["stage"], r["size"]))
+        if old:
+            ratio = r["per_item_us"] / old["per_item_us"]
+            lines.append(f"{r['stage']:<26} {r['size']:>7}件: x{ratio:5.2f} "
+                         f"({old['per_item_us']:.1f} -> {r['per_item_us']:.1f} us/件)")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--seed", type=int, default=20251201)
+    parser.add_argument("--max-pdfs", type=int, default=200, help="PDF抽出を計測する最大件数")
+    parser.add_argument("--output", help="結果のJSONを書き出すファイル（省略時は標準出力）")
+    parser.add_argument("--baseline", help="比較対象とする以前の結果JSON")
+    args = parser.parse_args()
+
+    check_report_sections()
+    results = []
+    for size in args.sizes:
+        for stage in args.stages:
+            r = run_case(stage, size, args.seed, args.max_pdfs)
+            results.append(r)
+            print(f"{stage:<26} {size:>7}件 (計測 {r['items']}件): {r['seconds']:8.2f} s "
+                  f"{r['per_item_us']:10.1f} us/件  ピークRSS {r['peak_rss_mb']:7.1f} MB "
+                  f"(+{r['peak_rss_delta_mb']:.1f})", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(payload)
+    else:
+        print(payload)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            for line in compare(results, json.load(f)):
+                print(line, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""PDFの一括アップロード: 1件ずつ取り込み・チェックリスト更新 vs まとめて取り込み・更新1回
+
+    python -m benchmarks.bench_upload --files 200
+
+1件ずつの場合はファイルごとにワーカープロセスの起動・追記・チェックリスト更新を繰り返す。
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+import zipfile
+
+from benchmarks import corpus
+
+
+def _run(files, batch: bool) -> float:
+    import core
+
+    start = time.perf_counter()
+    if batch:
+        records, _ = core.ingest_uploaded_files(files)
+        core.update_checklists(records, core.get_incident_store().count())
+    else:
+        for f in files:
+            records, _ = core.ingest_uploaded_files([f], workers=1)
+            core.update_checklists(records, core.get_incident_store().count())
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=200)
+    args = parser.parse_args()
+
+    pdfs = corpus.make_fixture_pdfs(args.files, garbled_ratio=0)
+    files = [(f"report_{i:04d}.pdf", pdf) for i, pdf in enumerate(pdfs)]
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as z:
+        for name, pdf in files:
+            z.writestr(name, pdf)
+
+    root = os.getcwd()
+    results = {}
+    for label, batch, payload in [("1件ずつ", False, files), ("まとめて (PDF)", True, files),
+                                  ("まとめて (ZIP)", True, [("reports.zip", archive.getvalue())])]:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)  # データセット・チェックリストは作業ディレクトリに作る
+            try:
+                results[label] = _run(payload, batch)
+            finally:
+                os.chdir(root)
+        print(f"{label:<14} {args.files}件: {results[label]:6.1f} s")
+    print(f"速度比: x{results['1件ずつ'] / results['まとめて (PDF)']:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import random
+from typing import Dict, List
+
+from benchmarks.pdf_fixtures import make_pdf
+from core import ACTION_KEYWORDS, NOISE_KEYWORDS, PROCEDURES, REPORT_BOUNDARY_HEADINGS, parse_report_text
+
+# ==========================================
+# ベンチマーク用の合成インシデントコーパス
+# ==========================================
+# 実際の報告書に近づけるため、処置キーワード・アクションを含む文・定型文（ノイズ）・
+# 文字化けした報告書を混ぜる。同じ seed からは同じコーパスが生成される。
+DEFAULT_SEED = 20251201
+DEFAULT_GARBLED_RATIO = 0.1
+
+_SCENES = ["夜勤帯", "日勤帯", "休日", "緊急入院時", "転棟直後", "検査出棟前", "手術室入室時", "申し送り中"]
+_STAFF = ["看護師", "研修医", "担当医", "薬剤師", "臨床工学技士", "新人看護師"]
+_EVENTS = ["を取り違えそうになった", "の実施を失念した", "の指示内容を誤って解釈した",
+           "の手順を省略した", "の確認が遅れた", "の設定を誤った"]
+_CAUSES = ["多忙のため確認が形式的になっていた", "指示書の記載が曖昧であった", "申し送りが不十分であった",
+           "手順書が現場の運用と合っていなかった", "同姓の患者が同じ病棟に入院していた",
+           "機器の表示が分かりにくかった", "経験の浅いスタッフが一人で対応していた"]
+_ACTION_TEMPLATES = ["{kw}を徹底する", "実施前に{kw}を2名で行う", "{kw}の手順をマニュアルに追記する",
+                     "{kw}した内容を記録に残す", "必ず{kw}してから次の操作に移る", "{kw}の結果を上長に報告する"]
+_FILLER = "患者の状態は安定しており、経過観察を継続した。"
+# 複数ページの報告書の続きのページ（経過記録など。本文中にも「原因」「対策」が現れる）
+_PAGE_SENTENCES = [_FILLER, "担当看護師は複数の患者を受け持っていた。", "原因の調査のため関係者に聞き取りを行った。",
+                   "当日の対策会議で手順の見直しを検討した。", "家族に経過を説明し、了承を得た。"]
+
+
+def _sentence(rng: random.Random) -> str:
+    proc = rng.choice(list(PROCEDURES))
+    keyword = rng.choice(PROCEDURES[proc])
+    return f"{rng.choice(_SCENES)}に{rng.choice(_STAFF)}が{keyword}{rng.choice(_EVENTS)}。"
+
+
+def _garble(text: str) -> str:
+    # UTF-8 のバイト列を Latin-1 として読んだ典型的な文字化け
+    return text.encode("utf-8").decode("latin-1")
+
+
+def make_report_text(rng: random.Random, garbled: bool = False) -> str:
+    """報告書1件分のテキスト（PDFから抽出した直後の形）を生成する"""
+    noise = " ".join(rng.sample(NOISE_KEYWORDS, 3))
+    description = "".join(_sentence(rng) for _ in range(rng.randint(2, 4)))
+    cause = "。".join(rng.sample(_CAUSES, 2)) + "。"
+    actions = [rng.choice(_ACTION_TEMPLATES).format(kw=kw) for kw in rng.sample(ACTION_KEYWORDS, rng.randint(2, 4))]
+    # 定型文だけの文・短すぎる文も混ぜ、抽出から除外される経路も通るようにする
+    actions.append(f"今後も{rng.choice(NOISE_KEYWORDS)}")
+    actions.append("以上")
+    text = (f"{noise} 概要 {description}{_FILLER * rng.randint(0, 3)} 原因 {cause} "
+            f"対策 {'。'.join(actions)}。 {noise}")
+    return _garble(text) if garbled else text
+
+
+def make_texts(n: int, seed: int = DEFAULT_SEED, garbled_ratio: float = DEFAULT_GARBLED_RATIO) -> List[str]:
+    """報告書テキストを n 件生成する（garbled_ratio の割合で文字化けしたものを含む）"""
+    rng = random.Random(seed)
+    return [make_report_text(rng, rng.random() < garbled_ratio) for _ in range(n)]
+
+
+def make_long_texts(n: int, pages: int = 20, seed: int = DEFAULT_SEED,
+                    garbled_ratio: float = DEFAULT_GARBLED_RATIO) -> List[str]:
+    """複数ページ（1ページ目に報告書本文、続けて見出し付きの経過記録など）の報告書テキストを n 件生成する"""
+    rng = random.Random(seed)
+    texts = []
+    for text in make_texts(n, seed, garbled_ratio):
+        rest = [f"{rng.choice(REPORT_BOUNDARY_HEADINGS)} "
+                + "".join(rng.choice(_PAGE_SENTENCES) for _ in range(60)) for _ in range(pages - 1)]
+        texts.append(" ".join([text] + rest))
+    return texts
+
+
+def make_records(n: int, seed: int = DEFAULT_SEED, garbled_ratio: float = DEFAULT_GARBLED_RATIO) -> List[Dict]:
+    """parse_report_text を通したインシデントレコードを n 件生成する"""
+    return [parse_report_text(text, f"https://www.med-safe.jp/pdf/synthetic_{i:07d}.pdf")
+            for i, text in enumerate(make_texts(n, seed, garbled_ratio))]
+
+
+def make_fixture_pdfs(n: int, seed: int = DEFAULT_SEED, garbled_ratio: float = DEFAULT_GARBLED_RATIO,
+                      max_extra_pages: int = 2) -> List[bytes]:
+    """報告書PDFを n 件生成する（1ページ目に報告書本文、続けて経過記録のページ）"""
+    rng = random.Random(seed)
+    texts = make_texts(n, seed, garbled_ratio)
+    return [make_pdf([text] + [_FILLER * 40] * rng.randint(0, max_extra_pages)) for text in texts]
@@ -0,0 +1,42 @@
+import threading
+import time
+from contextlib import contextmanager
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+
+# ==========================================
+# ベンチマーク・検証用のローカルHTTPサーバー
+# ==========================================
+class _LatencyHandler(SimpleHTTPRequestHandler):
+    """指定ディレクトリを配信し、各レスポンスに人工的な遅延を加える"""
+    latency = 0.0
+    request_log: Optional[List[Tuple[float, str]]] = None
+
+    def do_GET(self):
+        if self.request_log is not None:
+            self.request_log.append((time.monotonic(), self.path))
+        if self.latency:
+            time.sleep(self.latency)
+        super().do_GET()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def serve_directory(directory: str, latency: float = 0.0, request_log: Optional[List[Tuple[float, str]]] = None):
+    """directory を http://127.0.0.1:<port>/ で配信し、ベースURLを返す
+
+    request_log を渡すと、受けたリクエストの (時刻, パス) を追記する。
+    """
+    handler = type("Handler", (_LatencyHandler,), {"latency": latency, "request_log": request_log})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), partial(handler, directory=directory))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,81 @@
+from typing import List
+
+# ==========================================
+# ベンチマーク用の日本語PDF生成（外部ライブラリ不要）
+# ==========================================
+# 埋め込みなしの CID フォント (HeiseiKakuGo-W5 / UniJIS-UCS2-H) を使い、
+# 本文を UTF-16BE のまま書き込む。pdfplumber で日本語テキストとして抽出できる。
+LINE_CHARS = 40
+LINES_PER_PAGE = 50
+
+
+def _wrap(text: str) -> List[str]:
+    lines = []
+    for paragraph in text.split("\n"):
+        while len(paragraph) > LINE_CHARS:
+            lines.append(paragraph[:LINE_CHARS])
+            paragraph = paragraph[LINE_CHARS:]
+        lines.append(paragraph)
+    return lines
+
+
+def _content_stream(lines: List[str]) -> bytes:
+    ops = ["BT", "/F1 10 Tf", "14 TL", "40 800 Td"]
+    for line in lines:
+        # UCS2 の範囲外の文字は捨てる
+        encoded = "".join(ch for ch in line if ord(ch) <= 0xFFFF).encode("utf-16-be").hex().upper()
+        ops.append(f"<{encoded}> Tj T*")
+    ops.append("ET")
+    return "\n".join(ops).encode("ascii")
+
+
+def make_pdf(pages: List[str]) -> bytes:
+    """ページごとのテキストから PDF を生成する（長いページは自動で改ページ）"""
+    page_lines: List[List[str]] = []
+    for text in pages or [""]:
+        lines = _wrap(text)
+        for start in range(0, max(len(lines), 1), LINES_PER_PAGE):
+            page_lines.append(lines[start:start + LINES_PER_PAGE])
+
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # Pages の番号が決まってから埋める
+    pages_obj = add(b"")
+    font_descriptor = add(
+        b"<< /Type /FontDescriptor /FontName /HeiseiKakuGo-W5 /Flags 4 /FontBBox [-92 -250 1010 922]"
+        b" /ItalicAngle 0 /Ascent 752 /Descent -221 /CapHeight 737 /StemV 58 >>")
+    cid_font = add(
+        b"<< /Type /Font /Subtype /CIDFontType0 /BaseFont /HeiseiKakuGo-W5"
+        b" /CIDSystemInfo << /Registry (Adobe) /Ordering (Japan1) /Supplement 2 >>"
+        b" /FontDescriptor %d 0 R /DW 1000 >>" % font_descriptor)
+    font = add(
+        b"<< /Type /Font /Subtype /Type0 /BaseFont /HeiseiKakuGo-W5 /Encoding /UniJIS-UCS2-H"
+        b" /DescendantFonts [%d 0 R] >>" % cid_font)
+
+    page_ids = []
+    for lines in page_lines:
+        stream = _content_stream(lines)
+        content = add(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842]"
+            b" /Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_obj, font, content)))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    kids = b" ".join(b"%d 0 R" % p for p in page_ids)
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref)
+    return bytes(out)
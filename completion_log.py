@@ -0,0 +1,208 @@
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# ==========================================
+# チェックリストの実施記録 (追記のみのイベントログ + 集計表 / SQLite WALモード)
+# ==========================================
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS completion_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user TEXT NOT NULL,
+    procedure TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    checked INTEGER NOT NULL,
+    at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS item_states (
+    user TEXT NOT NULL,
+    procedure TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    checked INTEGER NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (procedure, user, item_id)
+);
+CREATE TABLE IF NOT EXISTS item_totals (
+    procedure TEXT NOT NULL,
+    item_id TEXT NOT NULL,
+    checked_users INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (procedure, item_id)
+);
+CREATE TABLE IF NOT EXISTS procedure_totals (
+    procedure TEXT PRIMARY KEY,
+    users INTEGER NOT NULL DEFAULT 0,
+    events INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+);
+"""
+
+logger = logging.getLogger(__name__)
+
+# 書き込み待ちのイベントをまとめて書き出す間隔（秒）と、間隔を待たずに書き出す件数
+FLUSH_INTERVAL_SEC = 0.5
+FLUSH_BATCH_SIZE = 500
+
+# 実施イベント: (利用者, 処置, 項目ID, チェックしたか, 時刻)
+CompletionEvent = Tuple[str, str, str, bool, float]
+
+
+class CompletionLog:
+    """チェック・チェック解除の操作を利用者ごとに記録するログ
+
+    操作はメモリ上の待ち行列に積み、別スレッドが FLUSH_INTERVAL_SEC ごと（または FLUSH_BATCH_SIZE 件
+    たまった時点）に1トランザクションで書き出す。同じトランザクションで利用者ごとの現在の状態と、
+    処置・項目ごとの集計表も更新するため、実施率の表示でイベントログ全体を読み直すことはない。
+    コミットは synchronous=FULL で行い、書き出したイベントは電源断でも失われない
+    （プロセスが異常終了した場合に失われるのは、書き出し前の最大 FLUSH_INTERVAL_SEC 秒分）。
+    """
+
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL_SEC,
+                 batch_size: int = FLUSH_BATCH_SIZE):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self._pending: List[CompletionEvent] = []
+        self._lock = threading.Lock()
+        # 書き出しを同時に1つだけにする（イベントの順序を保つため）
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # 操作ごとに接続を開く（スレッド・プロセス間で安全に共有するため）
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # 監査に使う記録のため、コミットごとに同期する（まとめて書くためコミットの回数は少ない）
+            conn.execute("PRAGMA synchronous=FULL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def record(self, user: str, procedure: str, item_id: str, checked: bool, at: Optional[float] = None):
+        """操作を書き込み待ちに積む（書き出しは別スレッドで行う）"""
+        self.record_many([(user, procedure, item_id, checked, time.time() if at is None else at)])
+
+    def record_many(self, events: Iterable[CompletionEvent]):
+        events = list(events)
+        if not events:
+            return
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("CompletionLog is closed")
+            self._pending.extend(events)
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None:
+                atexit.register(self.close)
+            # 初回のほか、書き出し用のスレッドが何らかの理由で止まっていた場合も起動し直す
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._flush_loop, name="completion-log", daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            with self._lock:
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception:
+                # 書き出せなかったイベントは待ち行列に戻してあるため、記録だけして次の周期で再試行する
+                logger.exception("チェックリストの実施記録を書き出せませんでした")
+            if closed:
+                return
+
+    def flush(self) -> int:
+        """書き込み待ちのイベントを書き出し、書き出した件数を返す"""
+        with self._flush_lock:
+            with self._lock:
+                events, self._pending = self._pending, []
+            if not events:
+                return 0
+            try:
+                with self._connect() as conn:
+                    self._apply(conn, events)
+            except BaseException:
+                with self._lock:
+                    self._pending[:0] = events
+                raise
+            return len(events)
+
+    @staticmethod
+    def _apply(conn: sqlite3.Connection, events: List[CompletionEvent]):
+        conn.executemany("INSERT INTO completion_events (user, procedure, item_id, checked, at) VALUES (?, ?, ?, ?, ?)",
+                         [(u, p, i, int(c), at) for u, p, i, c, at in events])
+        # 集計表は状態が変わった分だけ増減させる（同じ状態への操作は件数だけ数える）
+        for user, procedure, item_id, checked, at in events:
+            row = conn.execute("SELECT checked FROM item_states WHERE procedure = ? AND user = ? AND item_id = ?",
+                               (procedure, user, item_id)).fetchone()
+            previous = bool(row[0]) if row else False
+            delta = int(checked) - int(previous)
+            # 利用者がこの処置で初めて操作した場合は、処置の利用者数に加える
+            new_user = row is None and conn.execute(
+                "SELECT 1 FROM item_states WHERE procedure = ? AND user = ? LIMIT 1", (procedure, user)).fetchone() is None
+            conn.execute("INSERT OR REPLACE INTO item_states (user, procedure, item_id, checked, updated_at) "
+                         "VALUES (?, ?, ?, ?, ?)", (user, procedure, item_id, int(checked), at))
+            conn.execute("INSERT INTO item_totals (procedure, item_id, checked_users, events, updated_at) "
+                         "VALUES (?, ?, ?, 1, ?) ON CONFLICT (procedure, item_id) DO UPDATE SET "
+                         "checked_users = checked_users + excluded.checked_users, events = events + 1, "
+                         "updated_at = MAX(updated_at, excluded.updated_at)",
+                         (procedure, item_id, delta, at))
+            conn.execute("INSERT INTO procedure_totals (procedure, users, events, updated_at) "
+                         "VALUES (?, ?, 1, ?) ON CONFLICT (procedure) DO UPDATE SET "
+                         "users = users + excluded.users, events = events + 1, "
+                         "updated_at = MAX(updated_at, excluded.updated_at)",
+                         (procedure, int(new_user), at))
+
+    def close(self):
+        """残りのイベントを書き出して書き出し用のスレッドを止める"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        self._wakeup.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        self.flush()
+
+    def checked_items(self, user: str, procedure: str) -> Set[str]:
+        """利用者が現在チェックしている項目ID（書き込み待ちの操作も反映する）"""
+        # 書き出し中（待ち行列から取り出し、まだコミットしていない）のイベントを見落とさないよう、書き出しの合間に読む
+        with self._flush_lock:
+            with self._connect() as conn:
+                states = {item_id: bool(checked) for item_id, checked in conn.execute(
+                    "SELECT item_id, checked FROM item_states WHERE procedure = ? AND user = ?", (procedure, user))}
+            with self._lock:
+                pending = list(self._pending)
+        for u, p, item_id, checked, _ in pending:
+            if u == user and p == procedure:
+                states[item_id] = checked
+        return {item_id for item_id, checked in states.items() if checked}
+
+    def procedure_totals(self) -> Dict[str, Tuple[int, int, float]]:
+        """処置 -> (記録した利用者数, 操作回数, 最終更新時刻)（書き出し済みの分）"""
+        with self._connect() as conn:
+            return {p: (users, events, updated_at) for p, users, events, updated_at in conn.execute(
+                "SELECT procedure, users, events, updated_at FROM procedure_totals")}
+
+    def item_totals(self, procedure: str) -> Dict[str, Tuple[int, int, float]]:
+        """項目ID -> (チェック済みの利用者数, 操作回数, 最終更新時刻)（書き出し済みの分）"""
+        with self._connect() as conn:
+            return {i: (users, events, updated_at) for i, users, events, updated_at in conn.execute(
+                "SELECT item_id, checked_users, events, updated_at FROM item_totals WHERE procedure = ?",
+                (procedure,))}
@@ -0,0 +1,1005 @@
+import hashlib
+import io
+import json
+import re
+import os
+from collections import Counter
+from functools import lru_cache
+from typing import TYPE_CHECKING, List, Dict, Any, Callable, Iterable, Optional, Tuple
+from datetime import datetime
+from urllib.parse import urlsplit
+
+from completion_log import CompletionLog
+from file_utils import FileLock, atomic_write_bytes, remove_sqlite_database, replace_sqlite_database
+from incident_snapshot import IncidentSnapshot
+from incident_store import IncidentStore
+from jobs import JobRunner
+from keyword_matcher import KeywordMatcher, RankedKeywordMatcher
+from metrics import Metrics, save_snapshot
+from pdf_extraction import PdfExtractionPool, extract_text
+from report_sections import ReportSegmenter
+from search_index import INDEX_VERSION as SEARCH_INDEX_VERSION
+
+# チェックリストの閲覧だけなら不要な requests / BeautifulSoup / numpy は、
+# 取得・生成の処理の中で読み込む（閲覧画面の起動を軽くするため）
+if TYPE_CHECKING:
+    import requests
+    from crawler import CrawlFrontier
+    from fetcher import HostLimiter
+    from http_cache import HttpCache
+
+# ==========================================
+# 1. 設定・定数定義
+# ==========================================
+# ローカル実行時はファイルが作成されますが、Streamlit Cloudではセッションが切れると削除されます。
+DATASET_PATH = "incident_dataset.json"  # 旧形式（初回起動時に INCIDENT_DB_PATH へ移行）
+INCIDENT_DB_PATH = "incident_dataset.sqlite3"
+CHECKLISTS_PATH = "generated_checklists.json"
+# 分析ページ用の列指向スナップショット（Arrow IPC）を置くディレクトリ
+SNAPSHOT_DIR = "incident_snapshot"
+# チェックリストファイルの形式のバージョン。生成内容・形式を変えたら上げる（古いファイルは起動時に再生成）
+# ファイルは {"schema_version": N, "generation": G, "checklists": {...}} の順で書き出し、先頭だけ読めば判定できるようにする
+# generation は書き込みのたびに1つ進む世代番号（閲覧側のキャッシュの無効化に使う）
+CHECKLISTS_SCHEMA_VERSION = 2
+CHECKLISTS_HEADER_REGEX = re.compile(rb'^\{\s*"schema_version":\s*(\d+)(?:,\s*"generation":\s*(\d+))?')
+CHECKLISTS_HEADER_BYTES = 128
+# 処置ごとの集計（アクション項目・原因・件数）。追加時の差分更新に使う
+AGGREGATES_PATH = "checklist_aggregates.json"
+# 索引ページ・PDFのHTTPキャッシュ（リセットしても消さず、条件付きGETで再利用する）
+HTTP_CACHE_DIR = ".http_cache"
+HTTP_CACHE_MAX_BYTES = 500 * 1024 * 1024
+# データセット・チェックリストを書き換える処理（画面操作・CLI）の排他ロック
+INGEST_LOCK_PATH = ".ingest.lock"
+# バックグラウンドジョブの状態・ロックを置くディレクトリ
+JOBS_DIR = ".jobs"
+JOB_REBUILD = "rebuild"
+# 再構築中の新しいデータセット・巡回状態は、このサフィックスを付けた別ファイルに作る
+REBUILD_SUFFIX = ".rebuild"
+# 取得・抽出・解析・生成の各ステージの所要時間（管理画面で表示し、Prometheus形式でも書き出す）
+METRICS_PATH = "ingest_metrics.json"
+METRICS_PROMETHEUS_PATH = "ingest_metrics.prom"
+# チェックリストの実施記録（利用者ごとのチェック操作のログと実施率の集計）。データセットの再構築では消さない
+COMPLETION_LOG_PATH = "checklist_completions.sqlite3"
+
+# ★★★★★ ここがスクレイピングのターゲットURLです ★★★★★
+# 巡回の起点。ここから同じホスト（www.med-safe.jp）内の索引ページをたどってPDFを集める
+TARGET_URLS = [
+    "https://www.med-safe.jp/report/index.html",  # 医療安全情報（主にPDFリンク集）
+    "https://www.med-safe.jp/medical_safety/index.html",  # 医療事故情報収集等事業
+]
+# 巡回の状態（見つけたURLと取得状況）。中断しても次回は続きから巡回する
+CRAWL_FRONTIER_PATH = "crawl_frontier.sqlite3"
+# 1回の実行で取得する索引ページ数の上限 / 同一ホストへのリクエスト間隔（秒）
+CRAWL_MAX_PAGES = 50
+CRAWL_MIN_INTERVAL_SEC = 1.0
+
+# PDFダウンロードの同時実行数（全体 / 1ホストあたり）
+DOWNLOAD_CONCURRENCY = 8
+PER_HOST_CONCURRENCY = 4
+
+# PDFテキスト抽出ワーカー（プロセス数 / 1文書あたりの制限時間 / メモリ上限 / 作り直すまでの処理件数）
+PDF_WORKERS = os.cpu_count() or 2
+PDF_TIMEOUT_SEC = 60
+PDF_MEMORY_LIMIT_MB = 2048
+PDF_WORKER_MAX_DOCS = 25
+# 1文書あたりに読む最大ページ数（必要な見出しが揃えばそれより前に打ち切る）
+PDF_MAX_PAGES = 20
+
+# parse_report_text が切り出す見出しと、本文の最大文字数
+# (見出し候補は先に書いたものを優先。本文は次の見出しの手前で終わる)
+REPORT_SECTIONS = {
+    "description": (["概要"], 200),
+    "cause": (["原因"], 200),
+    "prevention": (["対策", "再発防止"], 300),
+}
+# 項目としては切り出さず、本文の区切りとしてだけ扱う報告書の見出し
+# (NOISE_KEYWORDS のうち報告書の見出しにあたるもの。長い見出しが優先されるため「原因分析」は「原因」にならない)
+REPORT_BOUNDARY_HEADINGS = [
+    "事例の概要", "発生場面", "経過と結末", "背景要因", "発生要因", "原因分析",
+    "対応と対策", "再発防止策", "検討結果", "実施した医療行為の目的",
+]
+
+# 進捗通知コールバック: (完了数, 総数, 処理中のURL)
+ProgressCallback = Callable[[int, int, str], None]
+
+# 文書ごとの取り込み結果（抽出に失敗したものは pdf_extraction の ERROR_* がそのまま入る）
+OUTCOME_ACCEPTED = "accepted"
+OUTCOME_DUPLICATE = "duplicate"
+OUTCOME_TOO_SHORT = "too_short"
+OUTCOME_GARBLED = "garbled"
+OUTCOME_NOT_PDF = "not_pdf"
+OUTCOME_TOO_LARGE = "too_large"
+OUTCOME_BAD_ZIP = "bad_zip"
+# 取り込むテキストの最低文字数（Web取得分 / アップロード分）
+MIN_TEXT_CHARS = 50
+MIN_UPLOAD_TEXT_CHARS = 100
+# ZIPから展開する1ファイルあたりの上限（展開後のサイズ）
+UPLOAD_MAX_FILE_BYTES = 100 * 1024 * 1024
+
+# 修正1: 脳神経外科特有の処置と管理項目を追加
+PROCEDURES = {
+    "患者確認・指導": ["患者", "確認", "指導", "説明", "同意", "アレルギー"],
+    "採血": ["採血", "血液", "静脈", "血管", "穿刺"],
+    "輸血": ["輸血", "血液製剤", "血液型", "ポンピング"],
+    "点滴・薬剤": ["点滴", "輸液", "IV", "薬剤投与", "シリンジポンプ", "輸液ポンプ", "抗凝固薬", "抗てんかん薬"],
+    "手術": ["手術", "オペ", "術中", "麻酔", "執刀", "ガーゼカウント"],
+    "内視鏡": ["内視鏡", "胃カメラ", "大腸", "スコープ", "CF", "GF"],
+    "気管挿管": ["挿管", "気道", "換気", "チューブ", "抜管"],
+    "中心静脈カテーテル": ["CVC", "中心静脈", "カテーテル", "CV", "ガイドワイヤー"],
+    "ドレナージ管理": ["ドレナージ", "脳室", "腰椎", "シャント", "髄液"],
+    "脳神経外科管理": ["意識レベル", "瞳孔", "麻痺", "頭蓋内圧", "クッシング"],
+}
+
+# チェックリスト項目抽出用キーワード
+ACTION_KEYWORDS = [
+    "確認", "照合", "二重", "固定", "緩める", "実施", "記録", "徹底", "維持", "変更",
+    "抜針", "駆血帯", "止血", "部位", "選択", "アセスメント", "把握", "指示", "遵守",
+    "識別", "注意", "カウント", "測定", "比較", "観察"
+]
+
+# ノイズ除去キーワード (変更なし)
+NOISE_KEYWORDS = [
+    "再発防止に努める", "ご理解いただければ幸い", "情報提供と位置づけ", "施行されている",
+    "再発防止に向けて取り組んでいる姿を", "再発防止に資する", "情報提供と位置づけております",
+    "ヒヤリ・ハット事例収集事業", "資料３", "全般コード化情報", "製造（輸入販売）業者名",
+    "定点医療機関一覧", "平成", "月日現在", "定点医療機関とは", "事故の内容医療",
+    "発生場面", "事例の概要", "全般コード化", "原因分析", "再発防止策", "実施した医療行為の目的",
+    "検討結果", "病院名", "部門名", "職種", "性別", "年齢", "購入年月", "1517", "16",
+    "発生要因", "対応と対策", "経過と結末", "背景要因", "別紙", "参照"
+]
+
+# チェックリストのセクション: 種別 -> (見出し, 見出しレベル, チェック項目か, Markdownの行頭記号)
+# 各処置のチェックリストは {"sections": [...], "markdown": 表示用Markdown} として保存する
+CHECKLIST_SECTIONS = {
+    "standard": ("【標準安全手順（{proc}）】", 3, True, "- ✅ "),
+    "cases": ("【過去の事例に学ぶ追加チェック】", 3, True, "- □ "),
+    "causes": ("(参考) 過去の主な原因", 4, False, "- "),
+}
+
+# 「過去の事例に学ぶ追加チェック」で同じ項目とみなす類似度（文字2-gramのJaccard係数）
+ACTION_SIMILARITY_THRESHOLD = 0.6
+# 集計に使う本文の項目（データセット全件から集計するときは、判定フラグの列とこれだけを読み込む）
+AGGREGATE_FIELDS = ("cause", "prevention")
+
+# アクション抽出・ノイズ判定のキーワードを1回の走査で照合する
+# ラベルは (種別, None) のタプル
+KEYWORD_MATCHER = KeywordMatcher([(("action", None), ACTION_KEYWORDS), (("noise", None), NOISE_KEYWORDS)])
+# 処置分類: 複数の処置に該当する場合は PROCEDURES の定義順で先に来るものを採用する
+PROCEDURE_MATCHER = RankedKeywordMatcher(PROCEDURES.items())
+# PDFテキストから除去する定型文（報告書の見出しは本文の区切りに使うため、抽出したテキストに残す）
+PDF_NOISE_KEYWORDS = [k for k in NOISE_KEYWORDS if k not in REPORT_BOUNDARY_HEADINGS]
+# PDFテキストからの定型文除去用
+NOISE_MATCHER = KeywordMatcher([(("noise", None), PDF_NOISE_KEYWORDS)])
+# 報告書の見出しを1回の走査で見つけ、項目ごとの本文を切り出す
+REPORT_SEGMENTER = ReportSegmenter(REPORT_SECTIONS, REPORT_BOUNDARY_HEADINGS)
+# 取り込み時にレコードへ保存する判定結果（文字化けか・処置分類）のバージョン。
+# PROCEDURES や is_likely_garbled の判定を変えたら上げる（既存レコードは次回起動時に再計算される）
+FLAGS_VERSION = 1
+
+# 文字化け判定用
+VALID_CHARS_REGEX = re.compile(r'[\u4E00-\u9FFF\u3040-\u309F\u30A0-\u30FF\u0020-\u007E\uff00-\uffef]')
+URL_REGEX = re.compile(r'https?://|[a-zA-Z]{3,4}://')
+
+# 修正2: 脳神経外科病棟向けのチェックリスト項目を追加・拡充
+STANDARD_CHECKLIST_ITEMS: Dict[str, List[str]] = {
+    # 既存の項目 (例: 輸血) は維持
+    "輸血": [
+        "【準備】同意書の確認および患者への説明を行いましたか？",
+        "【準備】交差適合試験の結果と血液製剤、指示書の内容（患者氏名、血液型、放射線照射有無）が一致しているか確認しましたか？",
+        "【実施前】患者氏名、ID、血液型、製剤の有効期限、外観（凝集・変色・破損）を医師・看護師の2名で声出し確認しましたか？",
+        "【実施中】投与開始直前および開始後5分、15分にバイタルサインを測定・観察しましたか？",
+        "【実施後】副作用の有無を確認し、空バッグを所定の方法で保管・廃棄しましたか？"
+    ],
+    
+    # 脳神経外科で特に重要な項目を個別に追加
+    "患者確認・指導": [
+        "【確認】患者の氏名とIDをリストバンドと照合し、本人に名乗ってもらい確認しましたか？",
+        "【確認】アレルギー歴（特に造影剤アレルギー）を再確認し、記録しましたか？",
+        "【指導】処置・検査前に、体動リスクを評価し、体動しないよう具体的かつ簡潔に説明しましたか？",
+        "【説明】患者または家族に対し、これから行う処置や治療内容を説明し、同意を得ましたか？",
+    ],
+
+    "点滴・薬剤": [
+        "【FIVE-RIGHTs】医師・薬剤師の指示書に基づき、正しい薬剤、量、時間、経路であることをダブルチェックしましたか？",
+        "【抗凝固薬】手術や侵襲的処置の前に、休薬指示と最終投与時間を確認しましたか？",
+        "【高浸透圧薬】Mannitolなどの高浸透圧薬に結晶化や沈殿物がないか確認し、投与速度は指示通りですか？",
+        "【抗てんかん薬】処方開始・変更時に、適切な血中濃度採血オーダーがされているか確認しましたか？",
+        "【持続点滴】ポンプ設定（薬剤名、単位、設定量）を2名のスタッフで声出し確認しましたか？",
+        "【管理】麻薬・向精神薬は投与前後の残薬確認、記録、施錠保管を複数人で行いましたか？",
+    ],
+    
+    "中心静脈カテーテル": [
+        "【準備】エコーガイド下穿刺の準備（プローブカバー等）はできていますか？",
+        "【実施中】ガイドワイヤー挿入時、抵抗がないことを確認しましたか？（無理な挿入は禁止）",
+        "【実施中】動脈穿刺の除外（短軸・長軸像での確認、圧波形など）を行いましたか？",
+        "【実施後】ガイドワイヤーが体内に残存していないことを本数確認しましたか？",
+        "【実施後】カテーテル先端位置確認のためのX線撮影オーダーを行いましたか？",
+        "【観察】刺入部の感染兆候（発赤・腫脹）の有無を毎日チェックしましたか？",
+    ],
+    
+    "ドレナージ管理": [
+        "【指示確認】ドレナージバッグの**高さ（cmH2O）**、クランプ・開放指示が明確ですか？",
+        "【操作確認】体位変換や移送前後で、指示されたドレナージラインのクランプ操作を確実に実施しましたか？",
+        "【排液観察】排液の**量（時間毎）**、色、混濁を記録し、急激な変化や異常な量はありませんか？",
+        "【閉塞確認】ラインの屈曲、閉塞がないか確認しましたか？ ",
+        "【刺入部】刺入部に感染兆候がないか確認し、無菌操作でドレッシング材を交換しましたか？",
+    ],
+
+    "脳神経外科管理": [
+        "【意識レベル】JCSまたはGCSに基づき、正確かつ経時的に意識レベルを評価・記録しましたか？",
+        "【瞳孔所見】瞳孔径と対光反射を左右で比較し、急激な**左右差の出現**や**散瞳**がないか確認しましたか？",
+        "【麻痺評価】運動麻痺や感覚麻痺の有無、および昨日からの**進行・悪化**がないか詳細に評価しましたか？",
+        "【バイタル】**クッシング現象**（徐脈、血圧上昇）などの頭蓋内圧亢進症状のサインがないか確認しましたか？",
+        "【緊急体制】意識障害や呼吸状態の急変時、どの医師に**何分以内**に連絡するか確認されていますか？",
+    ],
+
+    # 既存の項目（採血、手術、気管挿管、内視鏡）は変更なしで維持
+    "採血": [
+        "【準備】検査指示書と採血管のラベル（氏名、ID、検査項目）を照合しましたか？",
+        "【実施前】患者本人に氏名を名乗ってもらい、リストバンドと照合しましたか？",
+        "【実施中】神経損傷予防のため、穿刺時の激痛やしびれの有無を患者に確認しましたか？",
+        "【実施中】駆血帯は1分以内に解除しましたか？（特に抜針前の解除忘れに注意）",
+        "【実施後】止血確認を行い、採血管の転倒混和を適切に行いましたか？"
+    ],
+    "手術": [
+        "【Sign In】患者確認、手術部位、術式の確認、麻酔器・モニターのチェックは完了しましたか？",
+        "【Time Out】執刀直前に全スタッフの手が止まり、患者名・術式・部位・予想される危険操作を全員で共有しましたか？",
+        "【Time Out】予防的抗菌薬の投与は執刀60分以内に行われましたか？",
+        "【Sign Out】ガーゼ・器械・縫合針のカウント数は一致しましたか？",
+        "【Sign Out】摘出標本のラベル（患者名・検体名）は正しいですか？"
+    ],
+    "気管挿管": [
+        "【準備】喉頭鏡のライト点灯、カフの破損がないか確認しましたか？",
+        "【準備】困難気道が予想される場合、ビデオ喉頭鏡やブジーなどの代替器具を準備しましたか？",
+        "【実施中】挿管後、聴診（5点聴診）およびカプノメータで二酸化炭素の波形を確認しましたか？",
+        "【実施後】チューブの固定位置（歯列のcm）を記録し、確実に固定しましたか？",
+        "【実施後】胸部X線でチューブ先端位置を確認しましたか？"
+    ],
+    "内視鏡": [
+        "【準備】内視鏡洗浄消毒履歴を確認し、使用機器の動作確認を行いましたか？",
+        "【実施前】抗血栓薬の休薬状況、アレルギー歴、既往歴を確認しましたか？",
+        "【実施前】鎮静を行う場合、同意書の確認と蘇生用具（酸素、アンビュー等）の準備はできていますか？",
+        "【実施中】患者のSpO2、呼吸状態、血圧のモニタリングを継続していますか？",
+        "【実施後】覚醒状態を確認し、飲水・食事開始の指示を明確にしましたか？"
+    ]
+}
+
+
+# ==========================================
+# 2. ロジック関数群
+# ==========================================
+
+def get_incident_store(path: str = INCIDENT_DB_PATH) -> IncidentStore:
+    """インシデントストアを開く（旧JSONファイルがあれば初回のみ取り込む）"""
+    store = IncidentStore(path)
+    migrated = path == INCIDENT_DB_PATH and store.migrate_legacy_json(DATASET_PATH)
+    if migrated or store.flags_version() != FLAGS_VERSION:
+        backfill_flags(store)
+    if store.search_index_version() != SEARCH_INDEX_VERSION:
+        store.rebuild_search_index()
+    return store
+
+
+def load_data() -> List[Dict]:
+    """インシデントデータセットを読み込む"""
+    return get_incident_store().load_all()
+
+
+def save_data(data: List[Dict]):
+    """インシデントデータセットを保存する（全件置き換え）"""
+    get_incident_store().replace_all([annotate_flags(r) for r in data])
+
+
+def append_data(records: List[Dict]) -> int:
+    """インシデントを追記し、追記後の総件数を返す"""
+    return get_incident_store().append([annotate_flags(r) for r in records])
+
+
+def clear_data():
+    """インシデントデータセットを空にする"""
+    get_incident_store().clear()
+    if os.path.exists(DATASET_PATH): os.remove(DATASET_PATH)
+
+
+def get_crawl_frontier(path: str = CRAWL_FRONTIER_PATH) -> "CrawlFrontier":
+    """巡回の状態を保存するフロンティアを開く"""
+    from crawler import CrawlFrontier
+    return CrawlFrontier(path)
+
+
+@lru_cache(maxsize=None)
+def get_http_cache() -> "HttpCache":
+    """プロセス内で共有するHTTPキャッシュ"""
+    from http_cache import HttpCache
+    return HttpCache(HTTP_CACHE_DIR, HTTP_CACHE_MAX_BYTES)
+
+
+@lru_cache(maxsize=None)
+def get_metrics() -> Metrics:
+    """プロセス内で共有する処理時間の計測値"""
+    return Metrics()
+
+
+def get_incident_snapshot() -> IncidentSnapshot:
+    """分析ページ用の列指向スナップショットを開く"""
+    return IncidentSnapshot(SNAPSHOT_DIR)
+
+
+def refresh_snapshot() -> int:
+    """スナップショットをデータセットに合わせて更新する（データセットを変更した処理の最後に呼ぶ）"""
+    with get_metrics().span("snapshot"):
+        return get_incident_snapshot().update(get_incident_store())
+
+
+@lru_cache(maxsize=None)
+def get_completion_log() -> CompletionLog:
+    """プロセス内で共有するチェックリストの実施記録（書き込み待ちの操作をセッション間でまとめて書き出す）"""
+    return CompletionLog(COMPLETION_LOG_PATH)
+
+
+@lru_cache(maxsize=None)
+def get_job_runner() -> JobRunner:
+    """プロセス内で共有するバックグラウンドジョブの実行器"""
+    return JobRunner(JOBS_DIR)
+
+
+def export_metrics():
+    """計測値をファイルに書き出す（管理画面・外部の監視から参照する。ほかのプロセスの分はそのまま残す）"""
+    save_snapshot(get_metrics().snapshot(), METRICS_PATH, METRICS_PROMETHEUS_PATH)
+
+
+def ingest_lock(timeout: Optional[float] = None) -> FileLock:
+    """データセット・チェックリストを書き換える処理の入口で取得するプロセス間ロック"""
+    return FileLock(INGEST_LOCK_PATH, timeout)
+
+
+def read_checklists_header() -> Optional[Tuple[int, int]]:
+    """チェックリストファイルの先頭だけを読み、(形式のバージョン, 世代) を返す（無い・旧形式なら None）
+
+    置き換えで書き込むため、内容と世代は必ず対応する。世代の無いファイルは 0 とみなす。
+    """
+    try:
+        with open(CHECKLISTS_PATH, "rb") as f:
+            m = CHECKLISTS_HEADER_REGEX.match(f.read(CHECKLISTS_HEADER_BYTES))
+    except OSError:
+        return None
+    return (int(m.group(1)), int(m.group(2) or 0)) if m else None
+
+
+def read_checklists_version() -> Optional[int]:
+    """チェックリストファイルの先頭だけを読み、形式のバージョンを返す（無い・旧形式なら None）"""
+    header = read_checklists_header()
+    return header[0] if header else None
+
+
+def read_checklists() -> Dict[str, Dict[str, Any]]:
+    """チェックリストデータを読み込む（現在の形式でなければ空）"""
+    try:
+        if not os.path.exists(CHECKLISTS_PATH):
+            return {}
+            
+        with open(CHECKLISTS_PATH, "r", encoding="utf-8", errors='ignore') as f:
+            data = json.load(f)
+        if data.get("schema_version") != CHECKLISTS_SCHEMA_VERSION:
+            return {}
+        return data["checklists"]
+    except Exception:
+        return {}
+
+
+def classify_procedure(text: str) -> str:
+    """テキストから処置・手術の種類を分類する"""
+    if not text:
+        return "その他"
+    return PROCEDURE_MATCHER.first_label(text) or "その他"
+
+
+def is_likely_garbled(text: str) -> bool:
+    """テキストが文字化けしている可能性が高いか判定する。"""
+    if not text or len(text) < 5:
+        return True
+
+    total_len = len(text)
+    valid_chars_count = len(VALID_CHARS_REGEX.findall(text))
+    valid_ratio = valid_chars_count / total_len
+
+    if valid_ratio < 0.1:
+        return True
+    if URL_REGEX.search(text):
+        return True
+
+    return False
+
+
+def annotate_flags(record: Dict, procedure: Optional[str] = None) -> Dict:
+    """概要から文字化け判定と処置分類を行い、レコードに保存する（レコード自体を更新して返す）
+
+    procedure には、同じ概要を分類済みであればその結果を渡す（分類をやり直さない）。
+    """
+    description = record.get("description", "")
+    record["garbled"] = is_likely_garbled(description)
+    record["procedure"] = classify_procedure(description) if procedure is None else procedure
+    record["flags_version"] = FLAGS_VERSION
+    return record
+
+
+def record_flags(record: Dict) -> Tuple[bool, str]:
+    """レコードの (文字化けか, 処置分類)。保存済みの判定が古い場合はその場で計算する"""
+    if record.get("flags_version") != FLAGS_VERSION:
+        annotate_flags(record)
+    return record["garbled"], record["procedure"]
+
+
+def backfill_flags(store: IncidentStore) -> int:
+    """判定フラグが古い・無いレコードを再計算して保存し、更新件数を返す"""
+    updated = 0
+    for batch in store.iter_stale_flags(FLAGS_VERSION):
+        store.update_flags([(i, annotate_flags(record)) for i, record in batch])
+        updated += len(batch)
+    store.set_flags_version(FLAGS_VERSION)
+    return updated
+
+
+def extract_action_items(prevention_text: str) -> List[str]:
+    """具体的アクションに基づいてチェックリスト項目を抽出する"""
+    actions = []
+    sentences = re.split(r'[。\n]', prevention_text)
+
+    for s in sentences:
+        s = s.strip()
+        if not s: continue
+        if len(s) < 5 or len(s) > 100: continue
+
+        categories = {category for category, _ in KEYWORD_MATCHER.labels(s)}
+        if "noise" in categories: continue
+
+        if "action" in categories:
+            cleaned_s = re.sub(r'[、。]$', '', s)
+            cleaned_s = re.sub(r'^[-\d\.\s・]+', '', cleaned_s).strip()
+            actions.append(cleaned_s)
+    return actions
+
+
+def extract_text_from_pdf(pdf_bytes: bytes) -> str:
+    """PDFからテキストを抽出し、強力な文字化け除去を行う（呼び出し元のプロセスで実行）"""
+    return extract_text(pdf_bytes, NOISE_MATCHER, PDF_MAX_PAGES, REPORT_SEGMENTER)
+
+
+def create_extraction_pool(workers: int = PDF_WORKERS) -> PdfExtractionPool:
+    """PDFテキスト抽出用のワーカープロセスプールを作成する"""
+    return PdfExtractionPool(PDF_NOISE_KEYWORDS, workers=workers, timeout=PDF_TIMEOUT_SEC,
+                             memory_limit_mb=PDF_MEMORY_LIMIT_MB,
+                             max_docs_per_worker=PDF_WORKER_MAX_DOCS,
+                             max_pages=PDF_MAX_PAGES, sections=REPORT_SEGMENTER,
+                             metrics=get_metrics())
+
+
+def parse_report_text(text: str, source_url: str) -> Dict[str, str]:
+    """テキストから原因と対策を切り出す（簡易版）"""
+    fields = {"description": "抽出不可", "cause": "", "prevention": ""}
+    fields.update(REPORT_SEGMENTER.extract(text))
+
+    description, cause, prevention = fields["description"], fields["cause"], fields["prevention"]
+
+    if len(description) < 10:
+        description = text[:200]
+    description = description.replace('\n', ' ').strip()
+
+    # 種別と判定フラグの処置分類は、保存する概要に対して1回だけ行う
+    with get_metrics().span("classify"):
+        incident_type = classify_procedure(description)
+
+    return annotate_flags({
+        "source": source_url,
+        "date": datetime.now().strftime("2025-12-01"),
+        "department": "PDF解析",
+        "incident_type": incident_type,
+        "description": description,
+        "cause": cause.replace('\n', ' ').strip(),
+        "prevention": prevention.replace('\n', ' ').strip(),
+        "impact": "不明"
+    }, procedure=incident_type)
+
+
+def content_hash(text: str) -> str:
+    """正規化済みテキストの内容ハッシュ（重複排除用）"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def ingest_documents(documents: Iterable[Tuple[int, str, Optional[bytes]]], total: int,
+                     on_progress: Optional[ProgressCallback] = None,
+                     workers: int = PDF_WORKERS,
+                     min_chars: int = MIN_TEXT_CHARS,
+                     reject_garbled: bool = False,
+                     store: Optional[IncidentStore] = None) -> Tuple[List[Dict], List[Tuple[str, str, bool]], Dict[int, str]]:
+    """(順番, 取得元, PDFバイト列) を受け取った順にワーカープロセスでテキスト抽出・解析する
+
+    (解析したレコード, 読み込んだ文書の (取得元, 内容ハッシュ, 追加したか), 順番ごとの取り込み結果 OUTCOME_*) を返す。
+    reject_garbled なら文字化けした文書はレコードにしない（しなければ garbled フラグ付きで残す）。
+    内容の重複は追加した文書どうしでのみ判定するため、短すぎる・文字化けで除外した文書は
+    もう一度取り込んでも重複ではなく同じ理由で除外される。
+    """
+    store = store or get_incident_store()
+    metrics = get_metrics()
+    records: Dict[int, Dict] = {}
+    documents_seen: List[Tuple[int, str, str]] = []
+    outcomes: Dict[int, str] = {}
+    hashes: Dict[str, int] = {}
+    done = 0
+
+    def _collect(results):
+        nonlocal done
+        for (i, source), (raw_text, error) in results:
+            done += 1
+            if on_progress:
+                on_progress(done, total, source)
+            if error:
+                outcomes[i] = error
+                continue
+            digest = content_hash(raw_text)
+            documents_seen.append((i, source, digest))
+            if len(raw_text) <= min_chars:
+                outcomes[i] = OUTCOME_TOO_SHORT
+            elif reject_garbled and is_likely_garbled(raw_text):
+                outcomes[i] = OUTCOME_GARBLED
+            elif digest in hashes:
+                outcomes[i] = OUTCOME_DUPLICATE
+            else:
+                hashes[digest] = i
+                with metrics.span("parse", len(raw_text.encode("utf-8"))):
+                    records[i] = parse_report_text(raw_text, source)
+                outcomes[i] = OUTCOME_ACCEPTED
+
+    with create_extraction_pool(min(workers, max(1, total))) as pool:
+        # 投入して未回収の文書（PDFバイト列をメモリに持つもの）はワーカー数の2倍までにする。
+        # それを超えたら最も古いものの結果を待ってから、次の文書を読み込む
+        max_in_flight = 2 * pool.workers
+        for i, source, pdf_bytes in documents:
+            pool.submit((i, source), pdf_bytes)
+            _collect(pool.iter_ready())
+            _collect(pool.iter_results(leave=max_in_flight - 1))
+        _collect(pool.iter_results())
+
+    # 別の取得元でも内容が同じ文書（既存データ・今回取得分の両方）は重複として扱う
+    for digest in store.known_hashes(hashes):
+        i = hashes[digest]
+        records.pop(i, None)
+        outcomes[i] = OUTCOME_DUPLICATE
+    metrics.inc("duplicates", sum(1 for o in outcomes.values() if o == OUTCOME_DUPLICATE))
+    export_metrics()
+
+    documents = [(source, digest, outcomes[i] == OUTCOME_ACCEPTED) for i, source, digest in documents_seen]
+    # 完了順ではなく元の順番に並べ直して結果を決定的にする
+    return [records[i] for i in sorted(records)], documents, outcomes
+
+
+def _count_duplicates(outcomes: Dict[int, str]) -> int:
+    return sum(1 for outcome in outcomes.values() if outcome == OUTCOME_DUPLICATE)
+
+
+def ingest_pdf_urls(pdf_urls: List[str],
+                    concurrency: int = DOWNLOAD_CONCURRENCY,
+                    per_host_limit: int = PER_HOST_CONCURRENCY,
+                    on_progress: Optional[ProgressCallback] = None,
+                    session: Optional["requests.Session"] = None,
+                    cache: Optional["HttpCache"] = None,
+                    workers: int = PDF_WORKERS,
+                    limiter: Optional["HostLimiter"] = None,
+                    store: Optional[IncidentStore] = None) -> Tuple[List[Dict], int]:
+    """PDFを並行ダウンロードしながら、取得済みのものからワーカープロセスでテキスト抽出・解析し、
+    データセット（既定は INCIDENT_DB_PATH）に追記する。(追記したレコード, 重複としてスキップした件数) を返す"""
+    from fetcher import iter_downloads
+
+    store = store or get_incident_store()
+
+    # 取り込み済みのURLはダウンロード・抽出の前に除外する
+    known = store.known_sources(pdf_urls)
+    target_urls = [u for u in pdf_urls if u not in known]
+
+    # ダウンロードはスレッドプール、抽出はプロセスプールで並行実行する
+    downloads = iter_downloads(target_urls, session=session, concurrency=concurrency,
+                               per_host_limit=per_host_limit, cache=cache, metrics=get_metrics(),
+                               limiter=limiter)
+    records, documents, outcomes = ingest_documents(downloads, len(target_urls), on_progress, workers, store=store)
+    duplicates = _count_duplicates(outcomes) + len(pdf_urls) - len(target_urls)
+    store.append(records, documents=documents, duplicates=duplicates)
+    return records, duplicates
+
+
+def ingest_pdf_files(paths: List[str], on_progress: Optional[ProgressCallback] = None,
+                     workers: int = PDF_WORKERS) -> Tuple[List[Dict], int]:
+    """ローカルのPDFファイルを解析してデータセットに追記する。(追記したレコード, 重複件数) を返す"""
+    store = get_incident_store()
+    sources = [os.path.abspath(p) for p in paths]
+    known = store.known_sources(sources)
+    target_paths = [p for p in sources if p not in known]
+
+    def _read_files():
+        for i, path in enumerate(target_paths):
+            try:
+                with open(path, "rb") as f:
+                    yield i, path, f.read()
+            except OSError:
+                yield i, path, None
+
+    records, documents, outcomes = ingest_documents(_read_files(), len(target_paths), on_progress, workers)
+    duplicates = _count_duplicates(outcomes) + len(sources) - len(target_paths)
+    store.append(records, documents=documents, duplicates=duplicates)
+    return records, duplicates
+
+
+# ZIPの中のPDFを展開するときに一度に読む大きさ
+ZIP_READ_CHUNK_BYTES = 1024 * 1024
+
+
+class _EntryTooLarge(Exception):
+    """ZIPの中のファイルを展開した大きさが UPLOAD_MAX_FILE_BYTES を超えた"""
+
+
+def _read_zip_entry(archive, info) -> bytes:
+    # ZIPのヘッダーにある大きさは偽れるため、実際に展開した量で上限を確かめる
+    chunks = []
+    size = 0
+    with archive.open(info) as f:
+        while True:
+            chunk = f.read(ZIP_READ_CHUNK_BYTES)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > UPLOAD_MAX_FILE_BYTES:
+                raise _EntryTooLarge(info.filename)
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def expand_uploads(files: List[Tuple[str, bytes]]) -> List[Tuple[str, Optional[Callable[[], bytes]], Optional[str]]]:
+    """アップロードされたPDF・ZIPを (ファイル名, PDFバイト列を読む関数, 受け付けない理由) に展開する
+
+    ZIPの中のPDFは「ZIP名/中のパス」の名前で返す。展開（読み込み）は関数を呼んだときに行い、
+    展開した大きさが上限を超えた時点で _EntryTooLarge を送出する。
+    """
+    import zipfile
+
+    entries: List[Tuple[str, Optional[Callable[[], bytes]], Optional[str]]] = []
+    for name, data in files:
+        if name.lower().endswith(".pdf"):
+            entries.append((name, lambda data=data: data, None))
+            continue
+        if not name.lower().endswith(".zip"):
+            entries.append((name, None, OUTCOME_NOT_PDF))
+            continue
+        try:
+            archive = zipfile.ZipFile(io.BytesIO(data))
+        except zipfile.BadZipFile:
+            entries.append((name, None, OUTCOME_BAD_ZIP))
+            continue
+        for info in archive.infolist():
+            entry = f"{name}/{info.filename}"
+            # ディレクトリと macOS のZIPに付くメタデータ（__MACOSX/）は結果にも出さない
+            if info.is_dir() or info.filename.startswith("__MACOSX/"):
+                continue
+            if not info.filename.lower().endswith(".pdf"):
+                entries.append((entry, None, OUTCOME_NOT_PDF))
+            elif info.file_size > UPLOAD_MAX_FILE_BYTES:
+                entries.append((entry, None, OUTCOME_TOO_LARGE))
+            else:
+                entries.append((entry, lambda archive=archive, info=info: _read_zip_entry(archive, info), None))
+    return entries
+
+
+def ingest_uploaded_files(files: List[Tuple[str, bytes]], on_progress: Optional[ProgressCallback] = None,
+                          workers: int = PDF_WORKERS) -> Tuple[List[Dict], List[Tuple[str, str]]]:
+    """アップロードされた複数のPDF・ZIPを並行して解析し、受け付けたレコードを1回の書き込みで追記する
+
+    (追記したレコード, [(ファイル名, 取り込み結果 OUTCOME_* / ERROR_*)]) を返す。
+    チェックリストの更新は呼び出し側で最後に1回だけ行う。
+    """
+    import zipfile
+    import zlib
+
+    entries = expand_uploads(files)
+    rejected = {i: reason for i, (_, _, reason) in enumerate(entries) if reason}
+
+    def _documents():
+        # ZIPの中身はワーカーに渡す直前に1件ずつ展開する（全件を同時にメモリに置かない）
+        for i, (name, read, _) in enumerate(entries):
+            if i in rejected:
+                continue
+            try:
+                pdf_bytes = read()
+            except _EntryTooLarge:
+                rejected[i] = OUTCOME_TOO_LARGE
+                continue
+            except (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError):
+                # 壊れた・途中で切れた・暗号化された・未対応の圧縮形式のエントリ（そのエントリだけを除外する）
+                rejected[i] = OUTCOME_BAD_ZIP
+                continue
+            yield i, f"アップロードファイル: {name}", pdf_bytes
+
+    total = len(entries) - len(rejected)
+    records, documents, outcomes = ingest_documents(_documents(), total, on_progress, workers,
+                                                    min_chars=MIN_UPLOAD_TEXT_CHARS, reject_garbled=True)
+    outcomes.update(rejected)
+    get_incident_store().append(records, documents=documents, duplicates=_count_duplicates(outcomes))
+    return records, [(name, outcomes[i]) for i, (name, _, _) in enumerate(entries)]
+
+
+def scrape_and_update_dataset(limit_pdfs: int = 5,
+                              concurrency: int = DOWNLOAD_CONCURRENCY,
+                              per_host_limit: int = PER_HOST_CONCURRENCY,
+                              on_progress: Optional[ProgressCallback] = None,
+                              max_pages: Optional[int] = CRAWL_MAX_PAGES,
+                              seeds: Optional[List[str]] = None,
+                              min_interval: float = CRAWL_MIN_INTERVAL_SEC,
+                              on_crawl_progress: Optional[ProgressCallback] = None,
+                              store: Optional[IncidentStore] = None,
+                              frontier: Optional["CrawlFrontier"] = None) -> Tuple[List[Dict], int, int]:
+    """索引ページを巡回してPDFを集め、未取り込みのものを最大 limit_pdfs 件取得してデータセットを更新する。
+    (追加したレコード, 更新後のデータセットの件数, 重複件数) を返す（データセット全件は読み込まない）
+
+    巡回は起点（既定は TARGET_URLS）と同じホスト内に限り、robots.txt とホストごとの間隔を守る。
+    巡回状態は保存されるため、max_pages で打ち切っても次回は続きのページから巡回する。
+    store・frontier を渡せば、既定のデータセット・巡回状態の代わりにそれらを更新する。
+    """
+    from crawler import KIND_PDF, Crawler
+    from fetcher import create_session
+
+    seeds = seeds or TARGET_URLS
+    allowed_hosts = {urlsplit(url).netloc for url in seeds}
+    store = store or get_incident_store()
+    frontier = frontier or get_crawl_frontier()
+    # 索引ページとPDFで同じ接続プール・ホストごとの制限を使い回す
+    session = create_session(concurrency)
+    cache = get_http_cache()
+    crawler = Crawler(frontier, session, allowed_hosts, cache, get_metrics(), concurrency=concurrency,
+                      per_host_limit=per_host_limit, min_interval=min_interval)
+    try:
+        crawler.start(seeds)
+        crawler.run(max_pages, on_progress=on_crawl_progress)
+        pdf_urls = [url for url, _ in frontier.pending(KIND_PDF, limit_pdfs)]
+        records, duplicates = ingest_pdf_urls(pdf_urls, concurrency, per_host_limit, on_progress=on_progress,
+                                              session=session, cache=cache, limiter=crawler.limiter, store=store)
+    finally:
+        session.close()
+
+    # 取り込めた（重複を含む）PDFは済みにし、取得・抽出に失敗したものは次回また試す
+    ingested = store.known_sources(pdf_urls)
+    frontier.mark_done(ingested)
+    frontier.mark_failed([url for url in pdf_urls if url not in ingested], "ingest failed")
+    export_metrics()
+    return records, store.count(), duplicates
+
+
+def _new_aggregate() -> Dict[str, Any]:
+    # actions はアクション項目ごとの出現回数
+    return {"actions": Counter(), "causes": set(), "count": 0}
+
+
+def update_aggregates(aggregates: Dict[str, Dict[str, Any]], incidents: Iterable[Dict]) -> Tuple[set, int]:
+    """レコードを処置ごとの集計に加え、(影響を受けた処置名, 集計したレコード数) を返す"""
+    affected = set()
+    checked = 0
+    for item in incidents:
+        checked += 1
+        is_garbled, proc = record_flags(item)
+        if is_garbled:
+            continue
+        agg = aggregates.setdefault(proc, _new_aggregate())
+        cause = item.get("cause", "")
+        prevention = item.get("prevention", "")
+        if cause: agg["causes"].add(cause.strip())
+        if prevention:
+            agg["actions"].update(extract_action_items(prevention))
+        agg["count"] += 1
+        affected.add(proc)
+    return affected, checked
+
+
+def _count_garbled(incidents: Iterable[Dict]):
+    """新しく取り込んだレコードの文字化け判定を計測値に加える（全件の再集計では数え直さない）"""
+    checked = garbled = 0
+    for item in incidents:
+        checked += 1
+        garbled += record_flags(item)[0]
+    metrics = get_metrics()
+    metrics.inc("garbled_checked", checked)
+    metrics.inc("garbled_rejected", garbled)
+
+
+def load_aggregates() -> Optional[Dict[str, Any]]:
+    """保存済みの集計を読み込む。存在しない・壊れている場合は None"""
+    try:
+        with open(AGGREGATES_PATH, "r", encoding="utf-8") as f:
+            raw = json.load(f)
+        procedures = {
+            proc: {"actions": Counter(v["actions"]), "causes": set(v["causes"]), "count": v["count"]}
+            for proc, v in raw["procedures"].items()
+        }
+        return {"record_count": raw["record_count"], "procedures": procedures}
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        return None
+
+
+def save_aggregates(aggregates: Dict[str, Any]):
+    """集計を保存する（集合はソート済みリストとして保存）"""
+    raw = {
+        "record_count": aggregates["record_count"],
+        "procedures": {
+            proc: {"actions": dict(sorted(v["actions"].items())), "causes": sorted(v["causes"]), "count": v["count"]}
+            for proc, v in aggregates["procedures"].items()
+        },
+    }
+    atomic_write_bytes(AGGREGATES_PATH, json.dumps(raw, ensure_ascii=False).encode("utf-8"))
+
+
+def checklist_item_id(proc: str, kind: str, text: str) -> str:
+    """項目の内容から決まるID（再生成で並び順が変わってもチェック状態が別の項目に移らない）"""
+    return hashlib.sha1(f"{proc}\x1f{kind}\x1f{text}".encode("utf-8")).hexdigest()[:12]
+
+
+def checklist_item_label(item: Dict[str, Any]) -> str:
+    """表示用の項目テキスト（複数の事例に該当した項目は件数を添える）"""
+    support = item.get("support", 1)
+    return f"{item['text']}（{support}件）" if support > 1 else item["text"]
+
+
+def _section(proc: str, kind: str, texts: Iterable[Tuple[str, int]]) -> Dict[str, Any]:
+    title, level, checkable, _ = CHECKLIST_SECTIONS[kind]
+    return {
+        "kind": kind,
+        "title": title.format(proc=proc),
+        "level": level,
+        "checkable": checkable,
+        "items": [{"id": checklist_item_id(proc, kind, t), "text": t, "support": n} for t, n in texts],
+    }
+
+
+def checklist_markdown(sections: List[Dict[str, Any]]) -> str:
+    """構造化したチェックリストからMarkdown表示を組み立てる"""
+    checklist: List[str] = []
+    for section in sections:
+        if checklist: checklist.append("")
+        checklist.append(f"{'#' * section['level']} {section['title']}")
+        # 確実な箇条書きのためのMarkdownリスト記号を追加
+        bullet = CHECKLIST_SECTIONS[section["kind"]][3]
+        for item in section["items"]: checklist.append(f"{bullet}{checklist_item_label(item)}")
+    return "\n".join(checklist)
+
+
+def render_checklist(proc: str, aggregate: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """1つの処置について、標準項目と集計からチェックリスト（セクション・項目とMarkdown表示）を組み立てる"""
+    aggregate = aggregate or _new_aggregate()
+    sections: List[Dict[str, Any]] = []
+
+    # 1. 標準チェック項目 (★必ず表示★)
+    standard_items = STANDARD_CHECKLIST_ITEMS.get(proc, [])
+    if standard_items:
+        sections.append(_section(proc, "standard", [(p, 1) for p in standard_items]))
+
+    # 2. 事例からの追加項目（言い回しが違うだけの項目は1つにまとめ、該当した事例数を添える）
+    candidate_actions = {a: n for a, n in aggregate["actions"].items() if a not in standard_items}
+    if candidate_actions:
+        # numpy を使うため、チェックリストを閲覧するだけのプロセスでは読み込まない。
+        # 初めて読み込まれるのが作業ディレクトリを移した後になることがあるため、
+        # sys.path の '' に頼るスクリプト（python -c 等）はリポジトリを PYTHONPATH に含めて起動すること
+        from near_duplicates import merge_near_duplicates
+        sections.append(_section(proc, "cases", merge_near_duplicates(candidate_actions, ACTION_SIMILARITY_THRESHOLD)))
+
+    # 3. 原因
+    unique_causes = sorted(aggregate["causes"])
+    if unique_causes:
+        sections.append(_section(proc, "causes", [(c, 1) for c in unique_causes]))
+
+    return {"sections": sections, "markdown": checklist_markdown(sections)}
+
+
+def save_checklists(checklists: Dict[str, Dict[str, Any]]):
+    """チェックリストを保存する（閲覧中のプロセスが書きかけのファイルを読まないよう置き換えで書き込む）
+
+    世代を1つ進めて書くため、同じファイルを読む他のプロセス・レプリカもそれぞれ次の読み込みで切り替わる。
+    書き込みは ingest_lock の中で行う（世代の採番が重ならないように）。
+    """
+    header = read_checklists_header()
+    generation = header[1] + 1 if header else 1
+    payload = {"schema_version": CHECKLISTS_SCHEMA_VERSION, "generation": generation, "checklists": checklists}
+    atomic_write_bytes(CHECKLISTS_PATH, json.dumps(payload, ensure_ascii=False, indent=2).encode("utf-8"))
+
+
+def run_checklist_generation(incidents: Optional[Iterable[Dict]] = None):
+    """インシデントデータと標準項目からチェックリストを生成（全件から再集計）
+
+    incidents を省略するとデータセットを登録順に少しずつ読みながら集計する（全件をメモリに置かない）。
+    """
+    if incidents is None:
+        incidents = get_incident_store().iter_records(AGGREGATE_FIELDS)
+    with get_metrics().span("generate"):
+        procedures: Dict[str, Dict[str, Any]] = {}
+        _, record_count = update_aggregates(procedures, incidents)
+        save_aggregates({"record_count": record_count, "procedures": procedures})
+
+        checklists: Dict[str, str] = {}
+
+        # PROCEDURESのキーを全て取得し、ソートしてループする
+        all_procedures = sorted(list(STANDARD_CHECKLIST_ITEMS.keys()) + ["その他"])
+
+        for proc in all_procedures:
+            content = render_checklist(proc, procedures.get(proc))
+            if content["sections"]:
+                checklists[proc] = content
+
+        save_checklists(checklists)
+    refresh_snapshot()
+    export_metrics()
+
+
+def update_checklists(new_incidents: List[Dict], dataset_size: int):
+    """追加されたレコードだけを集計に反映し、影響を受けた処置のチェックリストのみ再生成する"""
+    _count_garbled(new_incidents)
+    aggregates = load_aggregates()
+    # 集計が無い・データセットと件数が合わない・チェックリストが旧形式の場合は全件から作り直す
+    if (aggregates is None or aggregates["record_count"] + len(new_incidents) != dataset_size
+            or read_checklists_version() != CHECKLISTS_SCHEMA_VERSION):
+        run_checklist_generation()
+        return
+
+    with get_metrics().span("generate"):
+        affected, _ = update_aggregates(aggregates["procedures"], new_incidents)
+        aggregates["record_count"] = dataset_size
+        save_aggregates(aggregates)
+
+        checklists = read_checklists()
+        for proc in affected:
+            content = render_checklist(proc, aggregates["procedures"].get(proc))
+            if content["sections"]:
+                checklists[proc] = content
+        save_checklists(checklists)
+    refresh_snapshot()
+    export_metrics()
+
+
+def reset_system(limit_pdfs: int, concurrency: int = DOWNLOAD_CONCURRENCY,
+                 on_progress: Optional[ProgressCallback] = None,
+                 max_pages: Optional[int] = CRAWL_MAX_PAGES,
+                 seeds: Optional[List[str]] = None,
+                 min_interval: float = CRAWL_MIN_INTERVAL_SEC,
+                 on_crawl_progress: Optional[ProgressCallback] = None) -> Tuple[List[Dict], int, int]:
+    """システムをリセットし再構築する（巡回も最初からやり直す）。(取り込んだレコード, 件数, 重複件数) を返す
+
+    新しいデータセット・巡回状態は別のファイルに作り、取得が終わってから一度に置き換える。
+    それまで（途中で失敗・中断した場合も）画面には以前のデータセット・チェックリストが表示される。
+    """
+    staging_db = INCIDENT_DB_PATH + REBUILD_SUFFIX
+    staging_frontier = CRAWL_FRONTIER_PATH + REBUILD_SUFFIX
+    try:
+        # 前回中断した再構築の残りは捨てて最初から作る
+        remove_sqlite_database(staging_db)
+        remove_sqlite_database(staging_frontier)
+        records, total, duplicates = scrape_and_update_dataset(
+            limit_pdfs, concurrency, on_progress=on_progress, max_pages=max_pages, seeds=seeds,
+            min_interval=min_interval, on_crawl_progress=on_crawl_progress,
+            store=get_incident_store(staging_db), frontier=get_crawl_frontier(staging_frontier))
+        # 取得元に届かない等で1件も取れなかった場合に、既存のデータセットを空で置き換えない
+        if not total:
+            raise RuntimeError("PDFを1件も取り込めなかったため、以前のデータセットを残しました")
+
+        get_incident_store().replace_with(staging_db)
+        replace_sqlite_database(staging_frontier, CRAWL_FRONTIER_PATH)
+        if os.path.exists(DATASET_PATH): os.remove(DATASET_PATH)
+        _count_garbled(records)
+        run_checklist_generation()
+    finally:
+        remove_sqlite_database(staging_db)
+        remove_sqlite_database(staging_frontier)
+    return records, total, duplicates
+
+
+def rebuild_dataset_job(progress: Callable[[str], ProgressCallback], limit_pdfs: int,
+                        concurrency: int = DOWNLOAD_CONCURRENCY) -> Dict[str, int]:
+    """JobRunner で実行する再構築（CLIなど他の更新が終わるのを待ってから始める）"""
+    progress("wait")(0, 1, "他の更新処理の完了を待っています")
+    with ingest_lock():
+        _, total, duplicates = reset_system(limit_pdfs, concurrency, on_progress=progress("ingest"),
+                                            on_crawl_progress=progress("crawl"))
+    # 有効件数は処置ごとの件数（インデックスから集計）から求め、データセット全件は読み込まない
+    clean = sum(counts[2] for counts in get_incident_store().procedure_counts())
+    return {"incidents": total, "clean": clean, "duplicates": duplicates}
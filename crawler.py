@@ -0,0 +1,286 @@
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib import robotparser
+from urllib.parse import urldefrag, urljoin, urlsplit, urlunsplit
+
+import requests
+from bs4 import BeautifulSoup
+
+from fetcher import DEFAULT_TIMEOUT, USER_AGENT, HostLimiter, fetch_bytes
+from http_cache import HttpCache
+from metrics import Metrics
+
+# ==========================================
+# サイト巡回（永続化したURLフロンティア・robots.txt・ホストごとの間隔制御）
+# ==========================================
+# 索引ページのリンクを幅優先でたどり、対象ホスト内のページとPDFのURLを集める。
+# 巡回状態は1ページごとにSQLiteへ記録するため、中断しても次回は未取得のページから再開する。
+KIND_PAGE = "page"
+KIND_PDF = "pdf"
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"  # MAX_ATTEMPTS 回失敗したもの
+DISALLOWED = "disallowed"  # robots.txt で禁止されているもの
+MAX_ATTEMPTS = 3
+DEFAULT_MIN_INTERVAL = 1.0  # 同一ホストへのリクエスト間隔（秒）。Crawl-delay が長ければそちらに従う
+# 起点からたどるリンクの段数の上限（ページ送りの一覧は1ページごとに1段深くなるため、既定は無制限）
+DEFAULT_MAX_DEPTH: Optional[int] = None
+# 索引ページとしてたどる拡張子（画像・Office文書などは取得しない）
+PAGE_EXTENSIONS = ("", ".html", ".htm", ".php", ".asp", ".aspx", ".jsp")
+
+FRONTIER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS frontier (
+    url TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    depth INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_frontier_status ON frontier (kind, status, depth);
+"""
+
+ProgressCallback = Callable[[int, int, str], None]
+
+
+def normalize_url(base: str, href: str) -> Optional[str]:
+    """リンクを絶対URLにし、フラグメント・既定のポートを除いて正規化する。http(s) 以外は None"""
+    url, _ = urldefrag(urljoin(base, href.strip()))
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        return None
+    netloc = parts.hostname
+    if parts.port and (parts.scheme, parts.port) not in (("http", 80), ("https", 443)):
+        netloc = f"{netloc}:{parts.port}"
+    return urlunsplit((parts.scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def link_kind(url: str) -> Optional[str]:
+    """URLがPDFか索引ページか（どちらでもなければ None）"""
+    path = urlsplit(url).path.lower()
+    if path.endswith(".pdf"):
+        return KIND_PDF
+    last = path.rsplit("/", 1)[-1]
+    extension = last[last.rfind("."):] if "." in last else ""
+    return KIND_PAGE if extension in PAGE_EXTENSIONS else None
+
+
+class CrawlFrontier:
+    """巡回対象のURLと取得状況を保存する（1操作1トランザクション）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(FRONTIER_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def add(self, entries: Iterable[Tuple[str, str, int, str]]) -> int:
+        """(URL, 種類, 深さ, 状態) を追加し、新しく追加した件数を返す（既知のURLはそのまま）"""
+        now = time.time()
+        with self._connect() as conn:
+            before = conn.total_changes
+            conn.executemany("INSERT OR IGNORE INTO frontier (url, kind, depth, status, updated_at)"
+                             " VALUES (?, ?, ?, ?, ?)", [(*e, now) for e in entries])
+            return conn.total_changes - before
+
+    def pending(self, kind: str, limit: int) -> List[Tuple[str, int]]:
+        """未取得のURLを浅い順・見つけた順に (URL, 深さ) で返す"""
+        with self._connect() as conn:
+            return conn.execute("SELECT url, depth FROM frontier WHERE kind = ? AND status = ?"
+                                " ORDER BY depth, rowid LIMIT ?", (kind, PENDING, limit)).fetchall()
+
+    def mark_done(self, urls: Iterable[str]):
+        with self._connect() as conn:
+            conn.executemany("UPDATE frontier SET status = ?, error = NULL, updated_at = ? WHERE url = ?",
+                             [(DONE, time.time(), url) for url in urls])
+
+    def mark_disallowed(self, urls: Iterable[str]):
+        with self._connect() as conn:
+            conn.executemany("UPDATE frontier SET status = ?, updated_at = ? WHERE url = ?",
+                             [(DISALLOWED, time.time(), url) for url in urls])
+
+    def mark_failed(self, urls: Iterable[str], error: str):
+        """失敗を記録する。MAX_ATTEMPTS 回に満たなければ次回また取得する"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE frontier SET attempts = attempts + 1, error = ?, updated_at = ?,"
+                " status = CASE WHEN attempts + 1 >= ? THEN ? ELSE ? END WHERE url = ?",
+                [(error, time.time(), MAX_ATTEMPTS, FAILED, PENDING, url) for url in urls])
+
+    def requeue_pages(self):
+        """巡回を最初からやり直す（索引ページだけを未取得に戻し、取り込み済みのPDFはそのまま）"""
+        with self._connect() as conn:
+            conn.execute("UPDATE frontier SET status = ?, attempts = 0, error = NULL WHERE kind = ?",
+                         (PENDING, KIND_PAGE))
+
+    def summary(self) -> Dict[str, Dict[str, int]]:
+        """種類ごと・状態ごとの件数"""
+        counts: Dict[str, Dict[str, int]] = {}
+        with self._connect() as conn:
+            for kind, status, n in conn.execute("SELECT kind, status, COUNT(*) FROM frontier GROUP BY kind, status"):
+                counts.setdefault(kind, {})[status] = n
+        return counts
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM frontier")
+
+
+class RobotsPolicy:
+    """ホストごとに robots.txt を一度だけ取得し、取得可否と Crawl-delay を判定する"""
+
+    def __init__(self, session: requests.Session, user_agent: str = USER_AGENT, timeout: float = DEFAULT_TIMEOUT):
+        self.session = session
+        self.user_agent = user_agent
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._parsers: Dict[str, robotparser.RobotFileParser] = {}
+        self._unavailable = set()
+
+    def _parser(self, url: str) -> robotparser.RobotFileParser:
+        parts = urlsplit(url)
+        origin = f"{parts.scheme}://{parts.netloc}"
+        with self._lock:
+            if origin in self._parsers:
+                return self._parsers[origin]
+            parser = robotparser.RobotFileParser(origin + "/robots.txt")
+            try:
+                response = self.session.get(origin + "/robots.txt", timeout=self.timeout)
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+            # urllib.robotparser と同じ扱い: 401/403 は全て禁止、それ以外の4xxは制限なし。
+            # 接続できない・5xx の間はそのホストを巡回しない（取得失敗として次回また試す）
+            if status is None or status >= 500:
+                parser.disallow_all = True
+                self._unavailable.add(origin)
+            elif status in (401, 403):
+                parser.disallow_all = True
+            elif status >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+            self._parsers[origin] = parser
+            return parser
+
+    def available(self, url: str) -> bool:
+        """robots.txt を確認できたか"""
+        self._parser(url)
+        parts = urlsplit(url)
+        return f"{parts.scheme}://{parts.netloc}" not in self._unavailable
+
+    def allowed(self, url: str) -> bool:
+        return self._parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> Optional[float]:
+        delay = self._parser(url).crawl_delay(self.user_agent)
+        return float(delay) if delay is not None else None
+
+
+class Crawler:
+    """対象ホスト内の索引ページを幅優先でたどり、PDFのURLをフロンティアに集める"""
+
+    def __init__(self, frontier: CrawlFrontier, session: requests.Session, allowed_hosts: Iterable[str],
+                 cache: Optional[HttpCache] = None, metrics: Optional[Metrics] = None,
+                 concurrency: int = 4, per_host_limit: int = 2, min_interval: float = DEFAULT_MIN_INTERVAL,
+                 max_depth: Optional[int] = DEFAULT_MAX_DEPTH, timeout: float = DEFAULT_TIMEOUT):
+        self.frontier = frontier
+        self.session = session
+        self.allowed_hosts = {h.lower() for h in allowed_hosts}
+        self.cache = cache
+        self.metrics = metrics
+        self.concurrency = max(1, concurrency)
+        self.max_depth = max_depth
+        self.timeout = timeout
+        # PDFのダウンロードにも同じ制限を使えるよう公開しておく
+        self.limiter = HostLimiter(per_host_limit, min_interval)
+        self.robots = RobotsPolicy(session, timeout=timeout)
+        self._delay_hosts = set()
+
+    def in_scope(self, url: str) -> bool:
+        return urlsplit(url).netloc.lower() in self.allowed_hosts
+
+    def _status(self, url: str) -> str:
+        return PENDING if self.robots.allowed(url) else DISALLOWED
+
+    def start(self, seeds: Iterable[str]):
+        """起点のURLを登録する。前回の巡回が最後まで終わっていれば、索引ページを巡回し直す"""
+        seeds = [u for u in (normalize_url(s, "") for s in seeds) if u and self.in_scope(u)]
+        if not self.frontier.pending(KIND_PAGE, 1):
+            self.frontier.requeue_pages()
+        # robots.txt による判定は取得時に行う
+        self.frontier.add((url, KIND_PAGE, 0, PENDING) for url in seeds)
+
+    def _visit(self, url: str) -> Tuple[str, Optional[bytes]]:
+        """ページを取得して (状態, 本文) を返す。robots.txt で禁止されていれば取得しない"""
+        if not self.robots.available(url):
+            return FAILED, None
+        if not self.robots.allowed(url):
+            return DISALLOWED, None
+        host = urlsplit(url).netloc.lower()
+        if host not in self._delay_hosts:
+            self._delay_hosts.add(host)
+            delay = self.robots.crawl_delay(url)
+            if delay:
+                self.limiter.set_min_interval(url, delay)
+        with self.limiter.slot(url):
+            body = fetch_bytes(self.session, url, self.timeout, self.cache, self.metrics)
+        return (DONE, body) if body is not None else (FAILED, None)
+
+    def _links(self, url: str, depth: int, body: bytes) -> List[Tuple[str, str, int, str]]:
+        entries = {}
+        for link in BeautifulSoup(body, "html.parser").find_all("a", href=True):
+            target = normalize_url(url, link["href"])
+            if target is None or target in entries or not self.in_scope(target):
+                continue
+            kind = link_kind(target)
+            if kind == KIND_PAGE and self.max_depth is not None and depth + 1 > self.max_depth:
+                continue
+            if kind is not None:
+                entries[target] = (target, kind, depth + 1, self._status(target))
+        return list(entries.values())
+
+    def run(self, max_pages: Optional[int] = None, on_progress: Optional[ProgressCallback] = None) -> int:
+        """未取得の索引ページを最大 max_pages 件取得し、取得した件数を返す
+
+        1ページごとに結果をフロンティアに書き込むため、途中で止めても取得済みのページは取り直さない。
+        """
+        fetched = 0
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while max_pages is None or fetched < max_pages:
+                size = self.concurrency if max_pages is None else min(self.concurrency, max_pages - fetched)
+                batch = self.frontier.pending(KIND_PAGE, size)
+                if not batch:
+                    break
+                results = executor.map(lambda entry: self._visit(entry[0]), batch)
+                for (url, depth), (status, body) in zip(batch, results):
+                    fetched += 1
+                    if status == DISALLOWED:
+                        self.frontier.mark_disallowed([url])
+                    elif status == FAILED:
+                        self.frontier.mark_failed([url], "fetch failed")
+                        if self.metrics is not None:
+                            self.metrics.inc("crawl_failed")
+                    else:
+                        self.frontier.add(self._links(url, depth, body))
+                        self.frontier.mark_done([url])
+                    if self.metrics is not None:
+                        self.metrics.inc("crawl_pages")
+                    if on_progress:
+                        on_progress(fetched, max_pages or fetched, url)
+        return fetched
@@ -0,0 +1,131 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import HttpCache
+from metrics import Metrics
+
+# ==========================================
+# HTTP取得（接続プール・同時実行数制御）
+# ==========================================
+DEFAULT_CONCURRENCY = 8  # 全体の同時ダウンロード数
+DEFAULT_PER_HOST_LIMIT = 4  # 1ホストあたりの同時接続数
+DEFAULT_TIMEOUT = 30
+# 巡回先に名乗る User-Agent（robots.txt の判定にも使う）
+USER_AGENT = "MedicalRiskManagementBot/1.0"
+
+
+def create_session(pool_size: int = DEFAULT_CONCURRENCY) -> requests.Session:
+    """接続を再利用する requests.Session を作成する"""
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+class HostLimiter:
+    """ホストごとの同時接続数と、リクエストを開始する最小間隔（秒）を制限する"""
+
+    def __init__(self, per_host_limit: int = DEFAULT_PER_HOST_LIMIT, min_interval: float = 0.0):
+        self.per_host_limit = max(1, per_host_limit)
+        self.min_interval = max(0.0, min_interval)
+        self._lock = threading.Lock()
+        self._semaphores: Dict[str, threading.BoundedSemaphore] = {}
+        self._intervals: Dict[str, float] = {}
+        self._next_start: Dict[str, float] = {}
+
+    def _semaphore(self, host: str) -> threading.BoundedSemaphore:
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host_limit)
+            return self._semaphores[host]
+
+    def set_min_interval(self, url: str, seconds: float):
+        """url のホストだけ間隔を広げる（robots.txt の Crawl-delay など）"""
+        with self._lock:
+            self._intervals[urlsplit(url).netloc.lower()] = max(self.min_interval, seconds)
+
+    def _wait_turn(self, host: str):
+        # 開始予定時刻を先に確保してから待つため、待っている間に他のスレッドが割り込まない
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_start.get(host, 0.0))
+            self._next_start[host] = start + self._intervals.get(host, self.min_interval)
+        if start > now:
+            time.sleep(start - now)
+
+    @contextmanager
+    def slot(self, url: str):
+        host = urlsplit(url).netloc.lower()
+        with self._semaphore(host):
+            self._wait_turn(host)
+            yield
+
+
+def _get(session: requests.Session, url: str, timeout: float, cache: Optional[HttpCache]) -> bytes:
+    if cache is not None:
+        return cache.fetch(session, url, timeout)
+    response = session.get(url, timeout=timeout)
+    response.raise_for_status()
+    return response.content
+
+
+def fetch_bytes(session: requests.Session, url: str, timeout: float = DEFAULT_TIMEOUT,
+                cache: Optional[HttpCache] = None, metrics: Optional[Metrics] = None) -> Optional[bytes]:
+    """URLの本文を取得する（cache があれば条件付きGETで再検証）。失敗時は None"""
+    start = time.perf_counter()
+    try:
+        body = _get(session, url, timeout, cache)
+    except (requests.RequestException, OSError):
+        if metrics is not None:
+            metrics.inc("fetch_failed")
+        return None
+    if metrics is not None:
+        metrics.observe("fetch", time.perf_counter() - start, len(body))
+    return body
+
+
+def iter_downloads(
+    urls: List[str],
+    session: Optional[requests.Session] = None,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    per_host_limit: int = DEFAULT_PER_HOST_LIMIT,
+    timeout: float = DEFAULT_TIMEOUT,
+    cache: Optional[HttpCache] = None,
+    metrics: Optional[Metrics] = None,
+    limiter: Optional[HostLimiter] = None,
+) -> Iterator[Tuple[int, str, Optional[bytes]]]:
+    """URLを並行ダウンロードし、完了した順に (元の順番, URL, 本文) を返す
+
+    limiter を渡すと、巡回と同じホストごとの同時接続数・間隔の制限を共有する。
+    """
+    if not urls:
+        return
+    concurrency = max(1, concurrency)
+    own_session = session is None
+    if own_session:
+        session = create_session(concurrency)
+    if limiter is None:
+        limiter = HostLimiter(per_host_limit)
+
+    def _download(url: str) -> Optional[bytes]:
+        with limiter.slot(url):
+            return fetch_bytes(session, url, timeout, cache, metrics)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = {executor.submit(_download, url): (i, url) for i, url in enumerate(urls)}
+            for future in as_completed(futures):
+                i, url = futures[future]
+                yield i, url, future.result()
+    finally:
+        if own_session:
+            session.close()
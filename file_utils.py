@@ -0,0 +1,110 @@
+import os
+import sqlite3
+import tempfile
+import time
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# ==========================================
+# ファイル操作ユーティリティ（原子的な書き込み・DBの置き換え・プロセス間ロック）
+# ==========================================
+
+
+def atomic_write_bytes(path: str, data: bytes):
+    """一時ファイルに書いてから置き換え、途中で落ちても壊れたファイルを残さない"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def replace_sqlite_database(source_path: str, target_path: str):
+    """SQLiteデータベースの中身を別のデータベースで丸ごと置き換える
+
+    バックアップAPIで1トランザクションとして書き写すため、target を開いている読み手は
+    完了まで以前の内容を見る（WALファイルが残っていても壊れない）。
+    """
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+
+
+def remove_sqlite_database(path: str):
+    """SQLiteデータベースを WAL・共有メモリのファイルごと削除する"""
+    for p in (path, path + "-wal", path + "-shm"):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+class LockBusy(Exception):
+    """他のプロセスがロックを保持している"""
+
+
+class FileLock:
+    """ロックファイルによるプロセス間の排他ロック
+
+    timeout=None なら取得できるまで待ち、0 なら待たずに LockBusy を送出する。
+    同じプロセス内で入れ子に取得するとデッドロックするため、処理の入口でのみ使う。
+    """
+
+    def __init__(self, path: str, timeout: Optional[float] = None, poll_interval: float = 0.2):
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd: Optional[int] = None
+
+    def _try_lock(self, fd: int) -> bool:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock(fd):
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                raise LockBusy(self.path)
+            time.sleep(self.poll_interval)
+        self._fd = fd
+
+    def release(self):
+        if self._fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+            else:
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
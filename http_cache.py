@@ -0,0 +1,215 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+import requests
+
+from file_utils import atomic_write_bytes
+
+# ==========================================
+# HTTPキャッシュ（条件付きGET・LRU削除）
+# ==========================================
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+INDEX_DB = "index.sqlite3"
+LEGACY_INDEX_FILE = "index.json"  # 旧形式（初回起動時に INDEX_DB へ移行）
+# 目録にない本文ファイルのうち、この秒数より新しいものは削除しない（別プロセスが目録に登録する前の可能性がある）
+ORPHAN_GRACE_SEC = 300
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    url TEXT PRIMARY KEY,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_access ON entries (last_access);
+CREATE INDEX IF NOT EXISTS idx_entries_digest ON entries (digest);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) VALUES ('hits', 0), ('misses', 0), ('evictions', 0);
+"""
+
+
+class HttpCache:
+    """レスポンス本文を内容ハッシュで保存し、ETag/Last-Modified で再検証するキャッシュ
+
+    目録は SQLite に置き、1件の取得ごとにその行だけを更新する。CLI と画面のサーバーなど、
+    複数のプロセスが同じキャッシュを使っても互いの登録を上書きしない。
+    """
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "bodies"), exist_ok=True)
+        self._index_path = os.path.join(directory, INDEX_DB)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+        self._migrate_legacy_index()
+        # 以前のプロセスが残した、目録にない本文ファイルを片付ける
+        self._evict()
+
+    @contextmanager
+    def _connect(self):
+        # 操作ごとに接続を開く（スレッド・プロセス間で安全に共有するため）
+        conn = sqlite3.connect(self._index_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WALモードではNORMALでもクラッシュ時にDBが壊れることはない
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def _migrate_legacy_index(self):
+        legacy_path = os.path.join(self.directory, LEGACY_INDEX_FILE)
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", {})
+        except FileNotFoundError:
+            return
+        except (ValueError, AttributeError):
+            entries = {}
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO entries (url, digest, size, etag, last_modified, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(url, e["digest"], e["size"], e.get("etag"), e.get("last_modified"), e.get("last_access", 0.0))
+                 for url, e in entries.items() if os.path.exists(self._body_path(e["digest"]))])
+        os.remove(legacy_path)
+
+    def _body_path(self, digest: str) -> str:
+        return os.path.join(self.directory, "bodies", digest[:2], digest)
+
+    def _read_body(self, digest: str) -> Optional[bytes]:
+        try:
+            with open(self._body_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _inc(conn: sqlite3.Connection, name: str, delta: int = 1):
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    # --- 容量管理 ---
+    @staticmethod
+    def _total_bytes(conn: sqlite3.Connection) -> int:
+        # 同じ本文を参照するURLが複数あっても、実体は1つとして数える
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM "
+                            "(SELECT MAX(size) AS size FROM entries GROUP BY digest)").fetchone()[0]
+
+    def total_bytes(self) -> int:
+        with self._connect() as conn:
+            return self._total_bytes(conn)
+
+    def _evict(self):
+        """容量上限を超えた分を最終アクセスが古い順に削除し、目録にない本文ファイルも削除する"""
+        removed = set()
+        with self._connect() as conn:
+            total = self._total_bytes(conn)
+            if total > self.max_bytes:
+                evicted = 0
+                for url, digest, size in conn.execute(
+                        "SELECT url, digest, size FROM entries ORDER BY last_access").fetchall():
+                    if total <= self.max_bytes:
+                        break
+                    conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+                    evicted += 1
+                    # 同じ本文を参照している別のURLがなければ実体も削除
+                    if conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+                        total -= size
+                        removed.add(digest)
+                self._inc(conn, "evictions", evicted)
+            known = {digest for digest, in conn.execute("SELECT DISTINCT digest FROM entries")}
+
+        # 目録から外れた本文（削除したもの・目録への登録前に中断したもの）を消す
+        cutoff = time.time() - ORPHAN_GRACE_SEC
+        bodies = os.path.join(self.directory, "bodies")
+        for prefix in os.listdir(bodies):
+            for name in os.listdir(os.path.join(bodies, prefix)):
+                path = os.path.join(bodies, prefix, name)
+                try:
+                    if name in removed or (name not in known and os.path.getmtime(path) < cutoff):
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def _store(self, url: str, response: requests.Response) -> bytes:
+        body = response.content
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._body_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            atomic_write_bytes(path, body)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO entries (url, digest, size, etag, last_modified, last_access) "
+                         "VALUES (?, ?, ?, ?, ?, ?)",
+                         (url, digest, len(body), response.headers.get("ETag"),
+                          response.headers.get("Last-Modified"), time.time()))
+            self._inc(conn, "misses")
+            over = self._total_bytes(conn) > self.max_bytes
+        if over:
+            self._evict()
+        return body
+
+    # --- 取得 ---
+    def fetch(self, session, url: str, timeout: float = 30) -> bytes:
+        """キャッシュがあれば条件付きGETで再検証し、304なら保存済みの本文を返す"""
+        with self._connect() as conn:
+            entry = conn.execute("SELECT digest, etag, last_modified FROM entries WHERE url = ?", (url,)).fetchone()
+        cached_body = self._read_body(entry[0]) if entry else None
+        if entry is not None and cached_body is None:
+            # 本文ファイルが失われた行は捨てる（再検証できても返す本文が無いため、条件付きGETにしない）
+            with self._connect() as conn:
+                conn.execute("DELETE FROM entries WHERE url = ? AND digest = ?", (url, entry[0]))
+
+        headers = {}
+        if cached_body is not None:
+            _, etag, last_modified = entry
+            if etag:
+                headers["If-None-Match"] = etag
+            if last_modified:
+                headers["If-Modified-Since"] = last_modified
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304:
+            if cached_body is not None:
+                with self._connect() as conn:
+                    conn.execute("UPDATE entries SET last_access = ? WHERE url = ?", (time.time(), url))
+                    self._inc(conn, "hits")
+                return cached_body
+            # 条件を付けていないのに304が返った（途中のキャッシュなど）。本文が無いため条件なしで取り直す
+            response = session.get(url, headers={"Cache-Control": "no-cache"}, timeout=timeout)
+            if response.status_code == 304:
+                # 空の本文をキャッシュしない
+                raise requests.HTTPError(f"304 Not Modified without a cached body: {url}", response=response)
+
+        response.raise_for_status()
+        return self._store(url, response)
+
+    def clear(self):
+        """キャッシュを全削除する"""
+        with self._connect() as conn:
+            digests = {digest for digest, in conn.execute("SELECT DISTINCT digest FROM entries")}
+            conn.execute("DELETE FROM entries")
+            conn.execute("UPDATE counters SET value = 0")
+        for digest in digests:
+            try:
+                os.remove(self._body_path(digest))
+            except FileNotFoundError:
+                pass
+
+    def summary(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            stats = dict(conn.execute("SELECT name, value FROM counters"))
+            entries = conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {**stats, "entries": entries, "bytes": self._total_bytes(conn)}
@@ -0,0 +1,72 @@
+from typing import Any, Dict, Optional
+
+# ==========================================
+# インシデントレコードのコンパクトな表現（大量のレコードを順に処理・保持する用）
+# ==========================================
+# レコード本体(JSON)の項目。これ以外の項目は IncidentRecord には残らない
+RECORD_FIELDS = ("source", "date", "department", "incident_type", "impact",
+                 "description", "cause", "prevention", "garbled", "procedure", "flags_version")
+# 値の種類が少ない・繰り返し現れる項目（同じ内容の文字列は1つのオブジェクトを共有する）
+SHARED_FIELDS = ("source", "date", "department", "incident_type", "impact", "procedure")
+
+_KEYS = frozenset(("id",) + RECORD_FIELDS)
+
+
+class StringPool:
+    """同じ内容の文字列を1つのオブジェクトにまとめる文字列表
+
+    sys.intern と違い、表を参照するレコードがなくなれば文字列ごと解放される。
+    """
+
+    __slots__ = ("_strings",)
+
+    def __init__(self):
+        self._strings: Dict[str, str] = {}
+
+    def __call__(self, value: Any) -> Any:
+        if not isinstance(value, str):
+            return value
+        return self._strings.setdefault(value, value)
+
+    def __len__(self) -> int:
+        return len(self._strings)
+
+
+class IncidentRecord:
+    """インシデント1件。__slots__ で項目名をレコードごとに持たない分 dict より小さい
+
+    dict と同じく get / [] で読み書きできるため、レコードを受け取る関数にそのまま渡せる。
+    """
+
+    __slots__ = ("id",) + RECORD_FIELDS
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any], id: Optional[int] = None,
+                  pool: Optional[StringPool] = None) -> "IncidentRecord":
+        self = cls.__new__(cls)
+        self.id = id
+        for field in RECORD_FIELDS:
+            value = record.get(field)
+            setattr(self, field, pool(value) if pool is not None and field in SHARED_FIELDS else value)
+        return self
+
+    def get(self, key: str, default: Any = None) -> Any:
+        value = getattr(self, key) if key in _KEYS else None
+        return default if value is None else value
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _KEYS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __setitem__(self, key: str, value: Any):
+        if key not in _KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """値のある項目だけの dict（id は含めない）"""
+        return {f: getattr(self, f) for f in RECORD_FIELDS if getattr(self, f) is not None}
+
+    def __repr__(self) -> str:
+        return f"IncidentRecord(id={self.id!r}, {self.to_dict()!r})"
@@ -0,0 +1,278 @@
+import json
+import os
+import tempfile
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from file_utils import atomic_write_bytes
+from incident_record import IncidentRecord
+
+# pyarrow / pandas はスナップショットの更新・分析ページの中でだけ読み込む（閲覧画面の起動を軽くするため）
+if TYPE_CHECKING:
+    import pandas as pd
+    import pyarrow as pa
+    from incident_store import IncidentStore
+
+# ==========================================
+# インシデントの列指向スナップショット (Arrow IPC ファイル + 目録)
+# ==========================================
+# 形式を変えたら上げる（異なる版のスナップショットは作り直す）
+SNAPSHOT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+# 追記のたびに1つ増えるセグメントファイルがこの数を超えたら、先頭以外を1つにまとめる
+MAX_SEGMENTS = 16
+# ストアから読み込んでレコードバッチにする件数
+BATCH_ROWS = 50_000
+# スナップショットに必要な本文の項目（それ以外はストアの列から読む）
+SNAPSHOT_FIELDS = ("cause",)
+
+
+def snapshot_schema() -> "pa.Schema":
+    """スナップショットの列（種別・処置・原因は辞書エンコード、日付は date32）"""
+    import pyarrow as pa
+
+    category = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ("id", pa.int64()),
+        ("date", pa.date32()),
+        ("incident_type", category),
+        ("procedure", category),
+        ("source", pa.string()),
+        ("garbled", pa.bool_()),
+        ("causes", pa.list_(category)),
+    ])
+
+
+def split_causes(cause: Optional[str]) -> List[str]:
+    """原因の文章を文単位に分ける（報告書をまたいで同じ原因を数えるため）"""
+    if not cause:
+        return []
+    return [s.strip() for s in cause.split("。") if s.strip()]
+
+
+def _record_batch(records: List[IncidentRecord]) -> "pa.RecordBatch":
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    def _strings(field: str) -> "pa.Array":
+        return pa.array([v if isinstance(v, str) else None for v in (getattr(r, field) for r in records)],
+                        pa.string())
+
+    # 日付の形式が違う（読めない）レコードは null にする
+    dates = pc.strptime(_strings("date"), format="%Y-%m-%d", unit="s", error_is_null=True).cast(pa.date32())
+    # 原因は同じ文が繰り返し現れるため、文の一覧を辞書エンコードして件数を番号で数えられるようにする
+    # （文字化けしたレコードの原因は集計に使わないため空にしておく）
+    causes = [[] if r.garbled else split_causes(r.cause) for r in records]
+    offsets = [0]
+    for sentences in causes:
+        offsets.append(offsets[-1] + len(sentences))
+    sentences = pa.array([s for sentences in causes for s in sentences], pa.string()).dictionary_encode()
+    return pa.RecordBatch.from_arrays([
+        pa.array([r.id for r in records], pa.int64()),
+        dates,
+        _strings("incident_type").dictionary_encode(),
+        _strings("procedure").dictionary_encode(),
+        _strings("source"),
+        pa.array([bool(r.garbled) for r in records], pa.bool_()),
+        pa.ListArray.from_arrays(pa.array(offsets, pa.int32()), sentences),
+    ], schema=snapshot_schema())
+
+
+def _batches(records: Iterable[IncidentRecord]) -> Iterator["pa.RecordBatch"]:
+    chunk: List[IncidentRecord] = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= BATCH_ROWS:
+            yield _record_batch(chunk)
+            chunk = []
+    if chunk:
+        yield _record_batch(chunk)
+
+
+class IncidentSnapshot:
+    """データセットの列指向スナップショット（ディレクトリ内の Arrow IPC ファイルと目録）
+
+    追記されたレコードはセグメントファイルを足して反映し、追記以外の変更（置き換え・判定フラグの
+    再計算）があれば作り直す。目録は置き換えで書くため、読み手は常に揃ったセグメントの組を読む。
+    書き込みは ingest_lock の中で行う。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def manifest(self) -> Optional[Dict[str, Any]]:
+        """目録 (版, 世代, セグメント, 件数, 反映済みの最後のID)。無い・形式が違えば None"""
+        try:
+            with open(os.path.join(self.directory, MANIFEST_NAME), "rb") as f:
+                manifest = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        return manifest if manifest.get("version") == SNAPSHOT_VERSION else None
+
+    def update(self, store: "IncidentStore") -> int:
+        """ストアの内容に合わせて更新し、書き込んだ行数を返す"""
+        manifest = self.manifest()
+        rewrites = store.rewrites()
+        if manifest is None or manifest["rewrites"] != rewrites:
+            return self.rebuild(store.iter_records(SNAPSHOT_FIELDS), rewrites)
+
+        segment = self._write_segment(_batches(store.iter_records(SNAPSHOT_FIELDS, after_id=manifest["last_id"])),
+                                      manifest["generation"] + 1)
+        if segment is None:
+            return 0
+        name, rows, last_id = segment
+        segments = manifest["segments"] + [name]
+        if len(segments) > MAX_SEGMENTS:
+            # 作り直し時の大きな先頭のセグメントはそのままにし、後から足した小さいものだけをまとめる
+            segments = [segments[0], self._compact(segments[1:], manifest["generation"] + 1)]
+        self._commit(manifest, segments, manifest["rows"] + rows, last_id, rewrites)
+        return rows
+
+    def rebuild(self, records: Iterable[IncidentRecord], rewrites: int) -> int:
+        """records（ID順）だけからスナップショットを作り直し、行数を返す"""
+        manifest = self.manifest()
+        generation = manifest["generation"] + 1 if manifest else 1
+        segment = self._write_segment(_batches(records), generation)
+        name, rows, last_id = segment if segment else (None, 0, 0)
+        self._commit(manifest, [name] if name else [], rows, last_id, rewrites)
+        return rows
+
+    def read(self) -> "pa.Table":
+        """スナップショット全体をメモリマップで読み込む（ファイルの内容はコピーしない）"""
+        import pyarrow as pa
+
+        # 読んでいる間に別のプロセスがまとめ直してセグメントを消した場合は、目録から読み直す
+        for _ in range(3):
+            manifest = self.manifest()
+            if manifest is None:
+                break
+            try:
+                tables = [pa.ipc.open_file(pa.memory_map(os.path.join(self.directory, name))).read_all()
+                          for name in manifest["segments"]]
+            except FileNotFoundError:
+                continue
+            if tables:
+                # セグメントごとに異なる辞書を揃え、グループ化できるようにする
+                return pa.concat_tables(tables).unify_dictionaries()
+            break
+        return snapshot_schema().empty_table()
+
+    def _write_segment(self, batches: Iterable["pa.RecordBatch"], generation: int) -> Optional[Tuple[str, int, int]]:
+        import pyarrow as pa
+
+        batches = list(batches)
+        if not batches:
+            return None
+        table = pa.Table.from_batches(batches, schema=snapshot_schema())
+        name = f"segment-{generation:08d}-{table['id'][0].as_py():010d}.arrow"
+        self._write_table(name, table)
+        return name, table.num_rows, table["id"][-1].as_py()
+
+    def _compact(self, segments: List[str], generation: int) -> str:
+        import pyarrow as pa
+
+        tables = [pa.ipc.open_file(pa.memory_map(os.path.join(self.directory, name))).read_all()
+                  for name in segments]
+        name = f"segment-{generation:08d}-compact.arrow"
+        self._write_table(name, pa.concat_tables(tables))
+        return name
+
+    def _write_table(self, name: str, table: "pa.Table"):
+        import pyarrow as pa
+
+        # IPCファイル形式はバッチごとに辞書を変えられないため、表全体で辞書を揃えて書く
+        options = pa.ipc.IpcWriteOptions(unify_dictionaries=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=".tmp-")
+        os.close(fd)
+        try:
+            with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema, options=options) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, os.path.join(self.directory, name))
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _commit(self, previous: Optional[Dict[str, Any]], segments: List[str], rows: int, last_id: int,
+                rewrites: int):
+        manifest = {
+            "version": SNAPSHOT_VERSION,
+            "generation": previous["generation"] + 1 if previous else 1,
+            "rewrites": rewrites,
+            "segments": segments,
+            "rows": rows,
+            "last_id": last_id,
+            "updated_at": time.time(),
+        }
+        atomic_write_bytes(os.path.join(self.directory, MANIFEST_NAME), json.dumps(manifest).encode("utf-8"))
+        # 目録から外れたセグメント（と書きかけの一時ファイル）を消す
+        for name in os.listdir(self.directory):
+            if name != MANIFEST_NAME and name not in segments:
+                os.remove(os.path.join(self.directory, name))
+
+
+# ==========================================
+# スナップショットの集計（列ごとのベクトル演算）
+# ==========================================
+
+def filter_snapshot(table: "pa.Table", procedures: Optional[Iterable[str]] = None,
+                    date_from=None, date_to=None) -> "pa.Table":
+    """処置・期間で絞り込む（日付の無いレコードは期間を指定すると除かれる）"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    conditions = []
+    if procedures:
+        conditions.append(pc.is_in(table["procedure"].cast(pa.string()),
+                                   value_set=pa.array(list(procedures), pa.string())))
+    if date_from is not None:
+        conditions.append(pc.greater_equal(table["date"], pa.scalar(date_from, pa.date32())))
+    if date_to is not None:
+        conditions.append(pc.less_equal(table["date"], pa.scalar(date_to, pa.date32())))
+    if not conditions:
+        return table
+    mask = conditions[0]
+    for condition in conditions[1:]:
+        mask = pc.and_(mask, condition)
+    return table.filter(mask)
+
+
+def monthly_counts(table: "pa.Table") -> "pd.DataFrame":
+    """文字化けを除いたレコードの、月（行）× 処置（列）の件数"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # 使う列だけを絞り込み、辞書エンコードのままグループ化する（文字列の比較・コピーをしない）
+    clean = table.select(["date", "procedure"]).filter(pc.invert(table["garbled"]))
+    grouped = pa.table({
+        "month": pc.floor_temporal(clean["date"], unit="month"),
+        "procedure": clean["procedure"],
+    }).group_by(["month", "procedure"]).aggregate([([], "count_all")])
+    grouped = grouped.set_column(1, "procedure", grouped["procedure"].cast(pa.string()))
+    return grouped.to_pandas().pivot_table(index="month", columns="procedure", values="count_all",
+                                           fill_value=0, aggfunc="sum")
+
+
+def top_causes(table: "pa.Table", limit: int = 10) -> "pd.DataFrame":
+    """文字化けを除いたレコードの原因（文単位）を件数の多い順に limit 件"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    # 文字化けしたレコードの原因はスナップショットの時点で空になっている
+    counts = pc.value_counts(pc.list_flatten(table["causes"]))
+    ranked = pa.table({"原因": counts.field("values").cast(pa.string()), "件数": counts.field("counts")})
+    return ranked.sort_by([("件数", "descending")]).slice(0, limit).to_pandas()
+
+
+def garbled_ratio(table: "pa.Table") -> Tuple[float, "pd.DataFrame"]:
+    """(全体の文字化けの割合, 月ごとの件数・文字化け件数・割合)"""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    overall = pc.sum(table["garbled"]).as_py() / table.num_rows if table.num_rows else 0.0
+    grouped = pa.table({"month": pc.floor_temporal(table["date"], unit="month"), "garbled": table["garbled"]}) \
+        .group_by(["month"]).aggregate([([], "count_all"), ("garbled", "sum")])
+    df = grouped.to_pandas().sort_values("month").set_index("month")
+    df["ratio"] = df["garbled_sum"] / df["count_all"]
+    return overall, df
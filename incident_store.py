@@ -0,0 +1,414 @@
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import search_index
+from file_utils import replace_sqlite_database
+from incident_record import RECORD_FIELDS, IncidentRecord, StringPool
+
+# ==========================================
+# インシデントデータストア (SQLite / WALモード)
+# ==========================================
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS incidents (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    source TEXT,
+    date TEXT,
+    incident_type TEXT,
+    data TEXT NOT NULL,
+    garbled INTEGER,
+    procedure TEXT,
+    flags_version INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO counters (name, value) SELECT 'incidents', COUNT(*) FROM incidents;
+INSERT OR IGNORE INTO counters (name, value) VALUES ('duplicates', 0);
+-- 全レコードの判定フラグがこのバージョンで計算済みであることを示す
+INSERT OR IGNORE INTO counters (name, value) VALUES ('flags_version', 0);
+-- 全文検索インデックスを作成したバージョン（search_index.INDEX_VERSION と異なれば作り直す）
+INSERT OR IGNORE INTO counters (name, value) VALUES ('search_index_version', 0);
+-- レコードを変更するたびに増える版数（集計結果のキャッシュキー。clear でも戻さない）
+INSERT OR IGNORE INTO counters (name, value) VALUES ('revision', 0);
+-- 追記以外で既存のレコードを変更・削除するたびに増える版数（追記分だけの差分更新ができるかの判定。clear でも戻さない）
+INSERT OR IGNORE INTO counters (name, value) VALUES ('rewrites', 0);
+-- 取り込み済み文書の重複排除インデックス（取得元URLと正規化テキストのハッシュ）
+-- accepted: レコードとして追加したか（短すぎる・文字化け等で除外した文書は内容の重複判定に使わない）
+CREATE TABLE IF NOT EXISTS ingested_documents (
+    source TEXT PRIMARY KEY,
+    content_hash TEXT NOT NULL,
+    accepted INTEGER NOT NULL DEFAULT 1
+);
+CREATE INDEX IF NOT EXISTS idx_ingested_documents_hash ON ingested_documents (content_hash);
+"""
+# SQLiteのバインド変数の上限より十分小さい単位で IN 句を分割する
+_IN_CHUNK = 500
+# 判定フラグの再計算を1トランザクションで更新する件数
+_BACKFILL_BATCH = 1000
+# 全文検索インデックスを作り直す際に一度に読み込む件数
+_REINDEX_BATCH = 20000
+# iter_records で一度に読み込む件数
+_ITER_BATCH = 5000
+# 列としても持つ項目（iter_records で本文(JSON)を読まずに埋める）
+_COLUMN_FIELDS = ("source", "date", "incident_type", "garbled", "procedure", "flags_version")
+# 既存のデータベースに後から追加した列
+_ADDED_COLUMNS = {
+    "garbled": "INTEGER",
+    "procedure": "TEXT",
+    "flags_version": "INTEGER NOT NULL DEFAULT 0",
+}
+# ingested_documents に後から追加した列（以前の行は追加した文書として扱う）
+_ADDED_DOCUMENT_COLUMNS = {
+    "accepted": "INTEGER NOT NULL DEFAULT 1",
+}
+# 一覧の絞り込み・並べ替え・件数の集計を本文(JSON)を読まずに索引だけで行うための索引
+# （garbled・procedure は後から追加した列で本文より後ろにあり、表から読むと本文のページまで読むことになる）
+_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_incidents_garbled ON incidents (garbled, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_type ON incidents (garbled, incident_type, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_date ON incidents (garbled, date, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_source ON incidents (garbled, source, id);
+CREATE INDEX IF NOT EXISTS idx_incidents_procedure ON incidents (garbled, procedure);
+"""
+# 一覧の並び順（キー: 列の組。同じ値の中では登録順）
+BROWSE_ORDERS = {
+    "id": ("id",),
+    "date": ("date", "id"),
+    "incident_type": ("incident_type", "id"),
+}
+INSERT_SQL = ("INSERT INTO incidents (source, date, incident_type, data, garbled, procedure, flags_version)"
+              " VALUES (?, ?, ?, ?, ?, ?, ?)")
+UPDATE_FLAGS_SQL = "UPDATE incidents SET data = ?, garbled = ?, procedure = ?, flags_version = ? WHERE id = ?"
+
+
+def _flag_values(record: Dict) -> tuple:
+    # 判定フラグはレコード本体(JSON)にも含め、絞り込み用に列としても持つ
+    garbled = record.get("garbled")
+    return (
+        None if garbled is None else int(garbled),
+        record.get("procedure"),
+        record.get("flags_version", 0),
+    )
+
+
+def _row_values(record: Dict) -> tuple:
+    return (
+        record.get("source"),
+        record.get("date"),
+        record.get("incident_type"),
+        json.dumps(record, ensure_ascii=False),
+    ) + _flag_values(record)
+
+
+class IncidentStore:
+    """インシデントを1行1レコードで保存するストア。追記は1トランザクションで完結する"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            conn.executescript(search_index.SCHEMA)
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(incidents)")}
+            for column, definition in _ADDED_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE incidents ADD COLUMN {column} {definition}")
+            existing = {row[1] for row in conn.execute("PRAGMA table_info(ingested_documents)")}
+            for column, definition in _ADDED_DOCUMENT_COLUMNS.items():
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE ingested_documents ADD COLUMN {column} {definition}")
+            conn.executescript(_INDEXES)
+
+    @contextmanager
+    def _connect(self):
+        # 操作ごとに接続を開く（スレッド・プロセス間で安全に共有するため）
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            # WALモードではNORMALでもクラッシュ時にDBが壊れることはない
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _add_count(conn: sqlite3.Connection, delta: int, name: str = "incidents") -> int:
+        # COUNT(*) は全件走査になるため、件数は同じトランザクション内でカウンタとして管理する
+        conn.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+        return IncidentStore._count(conn, name)
+
+    @staticmethod
+    def _count(conn: sqlite3.Connection, name: str = "incidents") -> int:
+        return conn.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()[0]
+
+    def append(self, records: Iterable[Dict], documents: Iterable[Tuple[str, str, bool]] = (),
+               duplicates: int = 0) -> int:
+        """レコードを追記し、追記後の総件数を返す
+
+        documents には読み込んだ文書の (取得元, 内容ハッシュ, レコードとして追加したか) を、duplicates には
+        重複としてスキップした件数を渡す。レコードと同じトランザクションで記録する。
+        """
+        records = list(records)
+        rows = [_row_values(r) for r in records]
+        with self._connect() as conn:
+            self._insert(conn, records, rows)
+            conn.executemany("INSERT OR REPLACE INTO ingested_documents (source, content_hash, accepted) "
+                             "VALUES (?, ?, ?)", [(source, digest, int(accepted)) for source, digest, accepted in documents])
+            if duplicates:
+                self._add_count(conn, duplicates, "duplicates")
+            if rows:
+                self._add_count(conn, 1, "revision")
+            return self._add_count(conn, len(rows))
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, records: List[Dict], rows: List[tuple]):
+        """レコードを挿入し、同じトランザクションで全文検索インデックスにも追加する"""
+        conn.executemany(INSERT_SQL, rows)
+        if not rows:
+            return
+        # 1トランザクション内の連続挿入なので、IDは直前の最大値から連番になる
+        last_id = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'incidents'").fetchone()[0]
+        first_id = last_id - len(rows) + 1
+        search_index.add_documents(conn, ((first_id + i, r.get("incident_type"), r) for i, r in enumerate(records)))
+
+    def _known(self, column: str, values: Iterable[str], condition: str = "1") -> Set[str]:
+        values = list(dict.fromkeys(values))
+        found: Set[str] = set()
+        with self._connect() as conn:
+            for start in range(0, len(values), _IN_CHUNK):
+                chunk = values[start:start + _IN_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT {column} FROM ingested_documents WHERE {column} IN ({placeholders}) AND {condition}",
+                    chunk))
+        return found
+
+    def known_sources(self, sources: Iterable[str]) -> Set[str]:
+        """取り込み済みの取得元を返す"""
+        return self._known("source", sources)
+
+    def known_hashes(self, hashes: Iterable[str]) -> Set[str]:
+        """レコードとして追加済みの内容ハッシュを返す（除外した文書の内容は含めない）"""
+        return self._known("content_hash", hashes, "accepted = 1")
+
+    def duplicates_skipped(self) -> int:
+        """重複としてスキップした文書数の累計"""
+        with self._connect() as conn:
+            return self._count(conn, "duplicates")
+
+    def replace_all(self, records: Iterable[Dict]):
+        """全レコードを置き換える（1トランザクションで原子的に実行）"""
+        records = list(records)
+        rows = [_row_values(r) for r in records]
+        with self._connect() as conn:
+            conn.execute("DELETE FROM incidents")
+            search_index.clear(conn)
+            self._insert(conn, records, rows)
+            conn.execute("UPDATE counters SET value = ? WHERE name = 'incidents'", (len(rows),))
+            self._add_count(conn, 1, "revision")
+            self._add_count(conn, 1, "rewrites")
+
+    def load_all(self) -> List[Dict]:
+        with self._connect() as conn:
+            return [json.loads(row[0]) for row in conn.execute("SELECT data FROM incidents ORDER BY id")]
+
+    def iter_records(self, fields: Optional[Iterable[str]] = None, include_garbled: bool = True,
+                     pool: Optional[StringPool] = None, after_id: int = 0) -> Iterator[IncidentRecord]:
+        """ID が after_id より後のレコードを登録順に1件ずつ返す（_ITER_BATCH 件ずつ読み込み、全件をメモリに置かない）
+
+        fields を指定すると本文(JSON)からはその項目だけを取り出し、残りの本文の項目は None になる
+        （列として持つ取得元・日付・種別・判定フラグは常に入る）。開始時点までのレコードだけを返す。
+        """
+        pool = pool or StringPool()
+        extra = [f for f in RECORD_FIELDS if f not in _COLUMN_FIELDS and (fields is None or f in fields)]
+        if fields is None:
+            body = "data"
+        else:
+            body = ", ".join(f"json_extract(data, '$.{f}')" for f in extra) or "NULL"
+        where = "" if include_garbled else " AND garbled = 0"
+        with self._connect() as conn:
+            last_id, max_id = after_id, conn.execute("SELECT MAX(id) FROM incidents").fetchone()[0]
+        while max_id is not None and last_id < max_id:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT id, {', '.join(_COLUMN_FIELDS)}, {body} FROM incidents"
+                    f" WHERE id > ? AND id <= ?{where} ORDER BY id LIMIT ?",
+                    (last_id, max_id, _ITER_BATCH)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            for row in rows:
+                values = json.loads(row[-1]) if fields is None else dict(zip(extra, row[len(_COLUMN_FIELDS) + 1:]))
+                values.update(zip(_COLUMN_FIELDS, row[1:len(_COLUMN_FIELDS) + 1]))
+                if values["garbled"] is not None:
+                    values["garbled"] = bool(values["garbled"])
+                yield IncidentRecord.from_dict(values, row[0], pool)
+
+    def load_by_ids(self, ids: Iterable[int]) -> List[Dict]:
+        """指定したIDのレコードを ids の順に返す"""
+        ids = list(ids)
+        found: Dict[int, Dict] = {}
+        with self._connect() as conn:
+            for start in range(0, len(ids), _IN_CHUNK):
+                chunk = ids[start:start + _IN_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                found.update((row[0], json.loads(row[1])) for row in conn.execute(
+                    f"SELECT id, data FROM incidents WHERE id IN ({placeholders})", chunk))
+        return [found[i] for i in ids if i in found]
+
+    def browse(self, incident_type: Optional[str] = None, source_prefix: Optional[str] = None,
+               date_from: Optional[str] = None, date_to: Optional[str] = None, include_garbled: bool = False,
+               order: str = "id", descending: bool = True, limit: int = 20,
+               offset: int = 0) -> Tuple[int, List[Tuple[int, Dict]]]:
+        """条件に合うレコードを並べ替えて1ページ分返す: (該当件数, [(ID, レコード), ...])
+
+        該当件数と表示する行のIDは索引から求め、本文は表示する行の分だけ読み込む。
+        """
+        conditions, params = [], []
+        if not include_garbled:
+            conditions.append("garbled = 0")
+        if incident_type is not None:
+            conditions.append("incident_type = ?")
+            params.append(incident_type)
+        if source_prefix:
+            # 前方一致を範囲条件にして索引を使えるようにする
+            conditions.append("source >= ? AND source < ?")
+            params += [source_prefix, source_prefix + "\U0010ffff"]
+        if date_from:
+            conditions.append("date >= ?")
+            params.append(date_from)
+        if date_to:
+            conditions.append("date <= ?")
+            params.append(date_to)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending else "ASC"
+        order_by = ", ".join(f"{column} {direction}" for column in BROWSE_ORDERS[order])
+
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM incidents {where}", params).fetchone()[0]
+            ids = [row[0] for row in conn.execute(
+                f"SELECT id FROM incidents {where} ORDER BY {order_by} LIMIT ? OFFSET ?", [*params, limit, offset])]
+            if not ids:
+                return total, []
+            placeholders = ",".join("?" * len(ids))
+            found = dict(conn.execute(f"SELECT id, data FROM incidents WHERE id IN ({placeholders})", ids))
+        return total, [(i, json.loads(found[i])) for i in ids]
+
+    def procedure_counts(self) -> List[Tuple[Optional[str], int, int]]:
+        """判定した処置ごとの (処置, 件数, 文字化けを除いた件数) を件数の多い順に返す"""
+        counts: Dict[Optional[str], List[int]] = {}
+        with self._connect() as conn:
+            for garbled, procedure, n in conn.execute(
+                    "SELECT garbled, procedure, COUNT(*) FROM incidents GROUP BY garbled, procedure"):
+                entry = counts.setdefault(procedure, [0, 0])
+                entry[0] += n
+                if not garbled:
+                    entry[1] += n
+        return sorted(((p, total, clean) for p, (total, clean) in counts.items()), key=lambda c: -c[1])
+
+    def revision(self) -> int:
+        """レコードを変更するたびに増える版数"""
+        with self._connect() as conn:
+            return self._count(conn, "revision")
+
+    def rewrites(self) -> int:
+        """追記以外で既存のレコードを変更・削除するたびに増える版数"""
+        with self._connect() as conn:
+            return self._count(conn, "rewrites")
+
+    def flags_version(self) -> int:
+        """全レコードの判定フラグを計算済みのバージョン"""
+        with self._connect() as conn:
+            return self._count(conn, "flags_version")
+
+    def iter_stale_flags(self, version: int) -> Iterator[List[Tuple[int, Dict]]]:
+        """判定フラグが version より古いレコードを (id, レコード) のリスト単位で返す"""
+        last_id = 0
+        while True:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    "SELECT id, data FROM incidents WHERE flags_version < ? AND id > ? ORDER BY id LIMIT ?",
+                    (version, last_id, _BACKFILL_BATCH)).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [(row[0], json.loads(row[1])) for row in rows]
+
+    def update_flags(self, records: Iterable[Tuple[int, Dict]]):
+        """判定フラグを計算し直したレコードを書き戻す"""
+        rows = [(json.dumps(r, ensure_ascii=False),) + _flag_values(r) + (i,) for i, r in records]
+        with self._connect() as conn:
+            conn.executemany(UPDATE_FLAGS_SQL, rows)
+            self._add_count(conn, 1, "revision")
+            self._add_count(conn, 1, "rewrites")
+
+    def set_flags_version(self, version: int):
+        with self._connect() as conn:
+            conn.execute("UPDATE counters SET value = ? WHERE name = 'flags_version'", (version,))
+
+    def search(self, query: str, incident_type: Optional[str] = None,
+               limit: int = 20, offset: int = 0) -> Tuple[int, List[Tuple[int, float]]]:
+        """全文検索: (該当件数, [(ID, スコア), ...]) を関連度順に返す"""
+        with self._connect() as conn:
+            return search_index.search(conn, query, incident_type, limit, offset)
+
+    def search_index_version(self) -> int:
+        with self._connect() as conn:
+            return self._count(conn, "search_index_version")
+
+    def rebuild_search_index(self):
+        """全文検索インデックスを全レコードから作り直す"""
+        with self._connect() as conn:
+            search_index.clear(conn)
+            last_id = 0
+            while True:
+                rows = conn.execute("SELECT id, incident_type, data FROM incidents WHERE id > ? ORDER BY id LIMIT ?",
+                                    (last_id, _REINDEX_BATCH)).fetchall()
+                if not rows:
+                    break
+                last_id = rows[-1][0]
+                search_index.add_documents(conn, ((i, t, json.loads(data)) for i, t, data in rows))
+            conn.execute("UPDATE counters SET value = ? WHERE name = 'search_index_version'",
+                         (search_index.INDEX_VERSION,))
+
+    def count(self) -> int:
+        with self._connect() as conn:
+            return self._count(conn)
+
+    def clear(self):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM incidents")
+            conn.execute("DELETE FROM ingested_documents")
+            search_index.clear(conn)
+            conn.execute("UPDATE counters SET value = 0 WHERE name NOT IN ('revision', 'rewrites')")
+            self._add_count(conn, 1, "revision")
+            self._add_count(conn, 1, "rewrites")
+
+    def replace_with(self, path: str):
+        """path のストアの内容で丸ごと置き換える（読み手は置き換えが終わるまで以前の内容を見る）"""
+        with self._connect() as conn:
+            versions = {name: self._count(conn, name) + 1 for name in ("revision", "rewrites")}
+        source = IncidentStore(path)
+        with source._connect() as conn:
+            # 版ごとのキャッシュ・差分更新が以前の内容を前提にしないよう、版は置き換え前より必ず進める
+            conn.executemany("UPDATE counters SET value = ? WHERE name = ?", [(v, n) for n, v in versions.items()])
+        replace_sqlite_database(path, self.path)
+
+    def migrate_legacy_json(self, json_path: str) -> bool:
+        """旧形式のJSONファイルを一度だけ取り込み、取り込み済みのファイルは .migrated に改名する"""
+        if not os.path.exists(json_path) or self.count() > 0:
+            return False
+        try:
+            with open(json_path, "r", encoding="utf-8", errors="ignore") as f:
+                records = json.load(f)
+        except json.JSONDecodeError:
+            # 壊れたファイルは削除せず退避しておく
+            os.replace(json_path, json_path + ".corrupt")
+            return False
+        self.replace_all(records)
+        os.replace(json_path, json_path + ".migrated")
+        return True
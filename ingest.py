@@ -0,0 +1,136 @@
+"""Streamlitを起動せずにデータ取得・チェックリスト生成を行うCLI
+
+    python -m ingest crawl --limit 20          # Webから報告書PDFを取得して追加
+    python -m ingest crawl --limit 20 --reset  # データセットを作り直す
+    python -m ingest crawl --max-pages 500     # 索引ページを多めに巡回する（中断しても次回は続きから）
+    python -m ingest crawl --seed http://127.0.0.1:8000/index.html --min-interval 0  # ローカルのミラーを巡回
+    python -m ingest ingest-dir ./reports      # ローカルのPDFを追加
+    python -m ingest regenerate                # チェックリストを全件から再生成
+    python -m ingest stats                     # データセット・キャッシュの状況
+
+データセットを書き換えるコマンドは画面操作と同じロックを取得し、他の更新が終わるまで待つ。
+チェックリストは置き換えで書き込むため、実行中も画面には最後に生成されたものが表示される。
+"""
+import argparse
+import os
+import sys
+from typing import List
+
+from core import (CRAWL_MAX_PAGES, CRAWL_MIN_INTERVAL_SEC, DOWNLOAD_CONCURRENCY, PER_HOST_CONCURRENCY,
+                  get_crawl_frontier, get_http_cache, get_incident_store, ingest_lock, ingest_pdf_files, read_checklists,
+                  reset_system, run_checklist_generation, scrape_and_update_dataset,
+                  update_checklists)
+
+
+def _report(done: int, total: int, source: str):
+    print(f"[{done}/{total}] {source}", file=sys.stderr, flush=True)
+
+
+def _pdf_paths(directory: str) -> List[str]:
+    paths = []
+    for root, _, files in os.walk(directory):
+        paths.extend(os.path.join(root, f) for f in files if f.lower().endswith(".pdf"))
+    return sorted(paths)
+
+
+def _print_summary(duplicates: int):
+    store = get_incident_store()
+    clean = sum(counts[2] for counts in store.procedure_counts())
+    print(f"データセット: {store.count()}件 (有効 {clean}件) / 重複スキップ: {duplicates}件")
+
+
+def _print_frontier():
+    summary = get_crawl_frontier().summary()
+    for kind, label in [("page", "索引ページ"), ("pdf", "PDF")]:
+        counts = summary.get(kind, {})
+        print(f"{label}: 取得済み {counts.get('done', 0)} / 未取得 {counts.get('pending', 0)} / "
+              f"失敗 {counts.get('failed', 0)} / robots.txtで除外 {counts.get('disallowed', 0)}")
+
+
+def cmd_crawl(args) -> int:
+    with ingest_lock():
+        if args.reset:
+            try:
+                _, _, duplicates = reset_system(args.limit, args.concurrency, on_progress=_report,
+                                                max_pages=args.max_pages, seeds=args.seed,
+                                                min_interval=args.min_interval)
+            except RuntimeError as e:
+                print(e, file=sys.stderr)
+                return 1
+        else:
+            records, total, duplicates = scrape_and_update_dataset(args.limit, args.concurrency, args.per_host,
+                                                                   on_progress=_report, max_pages=args.max_pages,
+                                                                   seeds=args.seed, min_interval=args.min_interval)
+            update_checklists(records, total)
+    _print_summary(duplicates)
+    _print_frontier()
+    return 0
+
+
+def cmd_ingest_dir(args) -> int:
+    if not os.path.isdir(args.directory):
+        print(f"ディレクトリが見つかりません: {args.directory}", file=sys.stderr)
+        return 1
+    paths = _pdf_paths(args.directory)
+    with ingest_lock():
+        records, duplicates = ingest_pdf_files(paths, on_progress=_report)
+        update_checklists(records, get_incident_store().count())
+    print(f"PDF {len(paths)}件中 {len(records)}件を追加しました。")
+    _print_summary(duplicates)
+    return 0
+
+
+def cmd_regenerate(args) -> int:
+    with ingest_lock():
+        run_checklist_generation()
+    print(f"{get_incident_store().count()}件のデータからチェックリストを再生成しました。")
+    return 0
+
+
+def cmd_stats(args) -> int:
+    store = get_incident_store()
+    cache = get_http_cache().summary()
+    print(f"データセット: {store.count()}件 / 重複スキップ (累計): {store.duplicates_skipped()}件")
+    print(f"HTTPキャッシュ: ヒット {cache['hits']} / ミス {cache['misses']} / "
+          f"{cache['bytes'] / (1024 * 1024):.1f} MB ({cache['entries']}件)")
+    _print_frontier()
+    for proc, content in sorted(read_checklists().items()):
+        items = sum(len(section["items"]) for section in content["sections"] if section["checkable"])
+        print(f"  {proc}: チェック項目 {items}件")
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m ingest", description=__doc__.split("\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    crawl = sub.add_parser("crawl", help="Webから報告書PDFを取得してデータセットに追加する")
+    crawl.add_argument("--limit", type=int, default=5, help="解析するPDF数")
+    crawl.add_argument("--concurrency", type=int, default=DOWNLOAD_CONCURRENCY, help="同時ダウンロード数")
+    crawl.add_argument("--per-host", type=int, default=PER_HOST_CONCURRENCY, help="同一ホストへの同時接続数")
+    crawl.add_argument("--reset", action="store_true", help="既存のデータセットを削除してから取得する")
+    crawl.add_argument("--max-pages", type=int, default=CRAWL_MAX_PAGES, help="今回巡回する索引ページ数の上限")
+    crawl.add_argument("--seed", action="append", help="巡回の起点URL（複数指定可。同じホスト内だけを巡回する）")
+    crawl.add_argument("--min-interval", type=float, default=CRAWL_MIN_INTERVAL_SEC,
+                       help="同一ホストへのリクエスト間隔（秒）")
+    crawl.set_defaults(func=cmd_crawl)
+
+    ingest_dir = sub.add_parser("ingest-dir", help="ディレクトリ内のPDFをデータセットに追加する")
+    ingest_dir.add_argument("directory")
+    ingest_dir.set_defaults(func=cmd_ingest_dir)
+
+    regenerate = sub.add_parser("regenerate", help="チェックリストを全件から再生成する")
+    regenerate.set_defaults(func=cmd_regenerate)
+
+    stats = sub.add_parser("stats", help="データセット・キャッシュ・チェックリストの状況を表示する")
+    stats.set_defaults(func=cmd_stats)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+import json
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from file_utils import FileLock, LockBusy, atomic_write_bytes
+
+# ==========================================
+# バックグラウンドジョブ（画面の再実行・再読み込みと切り離して長い処理を実行する）
+# ==========================================
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_INTERRUPTED = "interrupted"  # 実行中のままプロセスが終了した
+
+# 進捗を状態ファイルに書き出す最小間隔（秒）
+PROGRESS_WRITE_INTERVAL_SEC = 0.5
+
+ProgressCallback = Callable[[int, int, str], None]
+
+
+class JobRunner:
+    """ジョブを種類ごとに同時に1件だけ別スレッドで実行し、状態と進捗をファイルに保存する
+
+    実行中はジョブの種類ごとのロックファイルを保持するため、別のプロセス（別のサーバー・CLI）からも
+    二重に開始できない。状態ファイルはどのプロセス・セッションからでも読める。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, job_type: str, suffix: str) -> str:
+        return os.path.join(self.directory, f"{job_type}{suffix}")
+
+    def _save(self, job: Dict[str, Any]):
+        data = json.dumps(job, ensure_ascii=False).encode("utf-8")
+        atomic_write_bytes(self._path(job["type"], ".json"), data)
+
+    def is_running(self, job_type: str) -> bool:
+        try:
+            with FileLock(self._path(job_type, ".lock"), timeout=0):
+                return False
+        except LockBusy:
+            return True
+
+    def status(self, job_type: str) -> Optional[Dict[str, Any]]:
+        """最後に開始したジョブの状態。一度も実行していなければ None"""
+        try:
+            with open(self._path(job_type, ".json"), "rb") as f:
+                job = json.loads(f.read())
+        except (OSError, ValueError):
+            return None
+        # 状態を書き換える前にプロセスが終了した場合は、ロックが外れていることで判別する
+        if job["state"] == JOB_RUNNING and not self.is_running(job_type):
+            job["state"] = JOB_INTERRUPTED
+        return job
+
+    def start(self, job_type: str, target: Callable[..., Any], **params) -> Dict[str, Any]:
+        """target(progress=..., **params) を別スレッドで開始する。同じ種類のジョブが実行中なら LockBusy
+
+        progress(stage) は段階名ごとの進捗コールバック (done, total, message) を返す。
+        target の戻り値（JSONにできる値）が結果として保存される。
+        """
+        lock = FileLock(self._path(job_type, ".lock"), timeout=0)
+        lock.acquire()
+        try:
+            job = {"type": job_type, "state": JOB_RUNNING, "params": params, "started_at": time.time(),
+                   "finished_at": None, "progress": None, "result": None, "error": None}
+            self._save(job)
+            thread = threading.Thread(target=self._run, args=(job, lock, target, params),
+                                      name=f"job-{job_type}", daemon=True)
+            thread.start()
+        except BaseException:
+            lock.release()
+            raise
+        return job
+
+    def _run(self, job: Dict[str, Any], lock: FileLock, target: Callable[..., Any], params: Dict[str, Any]):
+        last_write = 0.0
+
+        def progress(stage: str) -> ProgressCallback:
+            def _report(done: int, total: int, message: str):
+                nonlocal last_write
+                job["progress"] = {"stage": stage, "done": done, "total": total, "message": message}
+                now = time.monotonic()
+                if now - last_write >= PROGRESS_WRITE_INTERVAL_SEC or done >= total:
+                    self._save(job)
+                    last_write = now
+            return _report
+
+        try:
+            job["result"] = target(progress=progress, **params)
+            job["state"] = JOB_SUCCEEDED
+        except Exception as e:
+            job["state"] = JOB_FAILED
+            job["error"] = f"{type(e).__name__}: {e}"
+        finally:
+            job["finished_at"] = time.time()
+            try:
+                self._save(job)
+            finally:
+                lock.release()
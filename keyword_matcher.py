@@ -0,0 +1,103 @@
+import re
+from typing import Dict, FrozenSet, Hashable, Iterable, Iterator, List, Optional, Set, Tuple
+
+# ==========================================
+# 複数キーワード照合器
+# ==========================================
+# キーワード群をトライ木にまとめ、共通接頭辞を括りだした1本の正規表現にコンパイルする。
+# 正規表現エンジン(C実装)上でトライ木を辿るため、走査コストはキーワード数にほぼ依存せず
+# テキスト長に比例する。
+
+
+def _trie_to_pattern(node: Dict) -> str:
+    """トライ木を、各位置で最長一致を優先する正規表現に変換する"""
+    is_end = "" in node
+    branches = [re.escape(ch) + _trie_to_pattern(child) for ch, child in sorted(node.items()) if ch != ""]
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    # 貪欲な省略可能グループにすることで、長いキーワードを先に試す
+    return "(?:" + body + ")?" if is_end else body
+
+
+def _compile(keywords: Iterable[str]) -> Optional["re.Pattern"]:
+    """キーワード群をトライ木にまとめて1本の正規表現にする（キーワードが無ければ None）"""
+    trie: Dict = {}
+    for k in keywords:
+        node = trie
+        for ch in k:
+            node = node.setdefault(ch, {})
+        node[""] = True
+    return re.compile(_trie_to_pattern(trie)) if trie else None
+
+
+class KeywordMatcher:
+    """ラベル付きのキーワード群を1回の走査で照合する"""
+
+    def __init__(self, groups: Iterable[Tuple[Hashable, Iterable[str]]]):
+        labels: Dict[str, Set[Hashable]] = {}
+        for label, words in groups:
+            for w in words:
+                if w:
+                    labels.setdefault(w, set()).add(label)
+        self.keywords: List[str] = sorted(labels)
+
+        # 一致したキーワードに含まれる短いキーワードのラベルもまとめて返せるようにしておく
+        # (例: 「血液製剤」に一致したら「血液」のラベルも付与)
+        self._labels: Dict[str, FrozenSet[Hashable]] = {
+            k: frozenset().union(*(labels[j] for j in self.keywords if j in k)) for k in self.keywords
+        }
+        # 末尾が別キーワードの先頭と重なり得るキーワード。一致後は1文字先から再走査する
+        self._overlapping: Set[str] = {
+            k for k in self.keywords
+            if any(j != k and k[-n:] == j[:n] and len(j) > n
+                   for j in self.keywords for n in range(1, min(len(k), len(j))))
+        }
+
+        self._pattern = _compile(self.keywords)
+
+    def finditer(self, text: str) -> Iterator[Tuple[int, int, str]]:
+        """左から順に最長一致で (開始位置, 終了位置, キーワード) を返す"""
+        if not text or self._pattern is None:
+            return
+        search = self._pattern.search
+        pos = 0
+        m = search(text, pos)
+        while m:
+            keyword = m.group()
+            yield m.start(), m.end(), keyword
+            pos = m.start() + 1 if keyword in self._overlapping else m.end()
+            m = search(text, pos)
+
+    def labels(self, text: str) -> Set[Hashable]:
+        """テキスト中に現れる全キーワードのラベル集合を返す"""
+        found: Set[Hashable] = set()
+        for _, _, keyword in self.finditer(text):
+            found |= self._labels[keyword]
+        return found
+
+    def remove(self, text: str) -> str:
+        """一致したキーワードをすべて取り除く（左から最長一致・重なりなし）"""
+        if not text or self._pattern is None:
+            return text
+        return self._pattern.sub("", text)
+
+
+class RankedKeywordMatcher:
+    """優先順に並んだラベルのうち、キーワードがテキストに現れる最初のラベルを返す
+
+    ラベルごとに1本の正規表現にまとめ、優先順に検索する。上位のラベルが見つかれば残りは調べないため、
+    テキスト全体の全キーワードを照合して順位を比べるより速い（分類のように最初の1つだけが必要な場合に使う）。
+    """
+
+    def __init__(self, groups: Iterable[Tuple[Hashable, Iterable[str]]]):
+        self._patterns = [(label, pattern) for label, words in groups
+                          for pattern in [_compile(sorted({w for w in words if w}))] if pattern is not None]
+
+    def first_label(self, text: str) -> Optional[Hashable]:
+        if not text:
+            return None
+        for label, pattern in self._patterns:
+            if pattern.search(text):
+                return label
+        return None
@@ -0,0 +1,182 @@
+import json
+import math
+import os
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional
+
+from file_utils import FileLock, atomic_write_bytes
+
+# ==========================================
+# 処理時間の計測（ステージごとのスパン・カウンタ）
+# ==========================================
+# ステージ: fetch / extract / normalize / parse / classify / generate
+# パーセンタイルは直近 max_samples 件の所要時間から計算する（件数・合計は全件分）
+DEFAULT_MAX_SAMPLES = 10_000
+QUANTILES = (0.5, 0.95)
+PROMETHEUS_PREFIX = "medsafe"
+# 書き出し先のファイルは複数のプロセス（CLI・画面のサーバー）で共有し、プロセスごとの値を分けて持つ。
+# 終了したプロセスの値も、最後に書き出してからこの秒数の間は合算・Prometheus形式の出力に含める
+PROCESS_RETENTION_SEC = 7 * 24 * 3600
+LOCK_SUFFIX = ".lock"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """ソート済みの値の q 分位点（最近傍法）"""
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(q * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class Metrics:
+    """ステージごとの所要時間・処理バイト数と、イベントのカウンタを集計する（スレッドセーフ）"""
+
+    def __init__(self, max_samples: int = DEFAULT_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._samples: Dict[str, Deque[float]] = {}
+            # ステージごとの [件数, 合計秒, 合計バイト数]
+            self._totals: Dict[str, List[float]] = {}
+            self._counters: Dict[str, int] = {}
+
+    def observe(self, stage: str, seconds: float, nbytes: int = 0):
+        """1件分の所要時間（とバイト数）を記録する"""
+        with self._lock:
+            if stage not in self._samples:
+                self._samples[stage] = deque(maxlen=self.max_samples)
+                self._totals[stage] = [0, 0.0, 0]
+            self._samples[stage].append(seconds)
+            totals = self._totals[stage]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] += nbytes
+
+    @contextmanager
+    def span(self, stage: str, nbytes: int = 0) -> Iterator[None]:
+        """with ブロックの所要時間を stage の1件として記録する"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, nbytes)
+
+    def inc(self, name: str, n: int = 1):
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self) -> Dict[str, Any]:
+        """集計結果をJSONにできる形で返す"""
+        with self._lock:
+            stages = {}
+            for stage, samples in self._samples.items():
+                values = sorted(samples)
+                count, total, nbytes = self._totals[stage]
+                stages[stage] = {
+                    "count": count,
+                    "sum_seconds": total,
+                    "bytes": nbytes,
+                    "max_seconds": values[-1],
+                    "quantiles": {str(q): percentile(values, q) for q in QUANTILES},
+                }
+            return {"updated_at": time.time(), "stages": stages, "counters": dict(self._counters)}
+
+
+def process_label() -> str:
+    """共有ファイルの中でこのプロセスの値を区別するラベル"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def merge_snapshots(snapshots: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """複数プロセスのスナップショットを合算する
+
+    件数・合計・カウンタは足し合わせ、分位点と最大値はプロセスごとの値の最大をとる（上限の目安）。
+    """
+    stages: Dict[str, Dict[str, Any]] = {}
+    counters: Dict[str, int] = {}
+    updated_at = 0.0
+    processes = 0
+    for snapshot in snapshots:
+        processes += 1
+        updated_at = max(updated_at, snapshot["updated_at"])
+        for event, value in snapshot["counters"].items():
+            counters[event] = counters.get(event, 0) + value
+        for stage, s in snapshot["stages"].items():
+            merged = stages.get(stage)
+            if merged is None:
+                stages[stage] = {**s, "quantiles": dict(s["quantiles"])}
+                continue
+            merged["count"] += s["count"]
+            merged["sum_seconds"] += s["sum_seconds"]
+            merged["bytes"] += s["bytes"]
+            merged["max_seconds"] = max(merged["max_seconds"], s["max_seconds"])
+            for q, value in s["quantiles"].items():
+                merged["quantiles"][q] = max(merged["quantiles"].get(q, 0.0), value)
+    return {"updated_at": updated_at, "stages": stages, "counters": counters, "processes": processes}
+
+
+def to_prometheus(processes: Dict[str, Dict[str, Any]]) -> str:
+    """プロセスごとのスナップショットを、process ラベルを付けた Prometheus のテキスト形式にする"""
+    name = f"{PROMETHEUS_PREFIX}_stage_seconds"
+    lines = [f"# HELP {name} Per-document latency of each ingestion stage.", f"# TYPE {name} summary"]
+    for process, snapshot in sorted(processes.items()):
+        for stage, s in sorted(snapshot["stages"].items()):
+            labels = f'process="{process}",stage="{stage}"'
+            for q, value in s["quantiles"].items():
+                lines.append(f'{name}{{{labels},quantile="{q}"}} {value:.6f}')
+            lines.append(f'{name}_sum{{{labels}}} {s["sum_seconds"]:.6f}')
+            lines.append(f'{name}_count{{{labels}}} {s["count"]}')
+
+    name = f"{PROMETHEUS_PREFIX}_stage_bytes_total"
+    lines += [f"# HELP {name} Bytes processed by each ingestion stage.", f"# TYPE {name} counter"]
+    for process, snapshot in sorted(processes.items()):
+        for stage, s in sorted(snapshot["stages"].items()):
+            lines.append(f'{name}{{process="{process}",stage="{stage}"}} {s["bytes"]}')
+
+    name = f"{PROMETHEUS_PREFIX}_events_total"
+    lines += [f"# HELP {name} Ingestion event counters.", f"# TYPE {name} counter"]
+    for process, snapshot in sorted(processes.items()):
+        for event, value in sorted(snapshot["counters"].items()):
+            lines.append(f'{name}{{process="{process}",event="{event}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def _load_processes(json_path: str) -> Dict[str, Dict[str, Any]]:
+    # 旧形式（1プロセス分だけのファイル）は読み捨てる
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            processes = json.load(f).get("processes")
+    except (FileNotFoundError, json.JSONDecodeError, AttributeError):
+        return {}
+    return processes if isinstance(processes, dict) else {}
+
+
+def save_snapshot(snapshot: Dict[str, Any], json_path: str, prometheus_path: Optional[str] = None,
+                  process: Optional[str] = None):
+    """このプロセスのスナップショットを、ほかのプロセスの分と合わせてJSON（と Prometheus テキスト形式）で書き出す
+
+    ファイルロックの中で読み直して自分の分だけを置き換えるため、ほかのプロセスの値を上書きしない。
+    """
+    process = process or process_label()
+    with FileLock(json_path + LOCK_SUFFIX):
+        processes = _load_processes(json_path)
+        processes[process] = snapshot
+        cutoff = snapshot["updated_at"] - PROCESS_RETENTION_SEC
+        processes = {name: s for name, s in processes.items() if s["updated_at"] >= cutoff}
+        shared = {"updated_at": snapshot["updated_at"], "processes": processes}
+        atomic_write_bytes(json_path, json.dumps(shared, ensure_ascii=False, indent=2).encode("utf-8"))
+        if prometheus_path:
+            atomic_write_bytes(prometheus_path, to_prometheus(processes).encode("utf-8"))
+
+
+def load_snapshot(json_path: str) -> Optional[Dict[str, Any]]:
+    """共有ファイルを読み、全プロセスの分を合算したスナップショットを返す（まだ無ければ None）"""
+    processes = _load_processes(json_path)
+    return merge_snapshots(processes.values()) if processes else None
@@ -0,0 +1,119 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# ==========================================
+# 類似文の統合 (文字n-gram MinHash + LSH)
+# ==========================================
+DEFAULT_THRESHOLD = 0.6  # 文字n-gram集合のJaccard係数がこれ以上なら同じ項目とみなす
+DEFAULT_NGRAM = 2
+DEFAULT_NUM_PERM = 64
+
+_PRIME = np.uint64(4294967311)  # 2^32 より大きい素数
+_MIX = np.uint64(0x9E3779B97F4A7C15)
+_ROLL = np.uint64(0x100000001B3)
+_SEED = 20251201
+# 署名計算で一度に展開する要素数の上限（num_perm x n-gram数）
+_CHUNK_ELEMENTS = 4_000_000
+
+
+def shingles(text: str, n: int = DEFAULT_NGRAM) -> np.ndarray:
+    """文字n-gramを32bitのハッシュ値の配列にする（n文字未満の文は全体を1つのn-gramとする）"""
+    codes = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    if len(codes) == 0:
+        return np.zeros(1, dtype=np.uint64)
+    width = min(n, len(codes))
+    rolled = np.zeros(len(codes) - width + 1, dtype=np.uint64)
+    for k in range(width):
+        rolled = rolled * _ROLL + codes[k:len(codes) - width + 1 + k]
+    return np.unique((rolled * _MIX) >> np.uint64(32))
+
+
+def minhash_signatures(shingle_sets: Sequence[np.ndarray], num_perm: int = DEFAULT_NUM_PERM) -> np.ndarray:
+    """各文のMinHash署名 (文の数 x num_perm) を計算する"""
+    rng = np.random.RandomState(_SEED)
+    a = rng.randint(1, 2 ** 32, size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.randint(0, 2 ** 32, size=num_perm, dtype=np.uint64)[:, None]
+    signatures = np.empty((len(shingle_sets), num_perm), dtype=np.uint64)
+
+    start = 0
+    while start < len(shingle_sets):
+        # 展開する行列が大きくなりすぎないよう文をまとめて処理する
+        end, size = start, 0
+        while end < len(shingle_sets) and (end == start or (size + len(shingle_sets[end])) * num_perm <= _CHUNK_ELEMENTS):
+            size += len(shingle_sets[end])
+            end += 1
+        chunk = shingle_sets[start:end]
+        values = np.concatenate(chunk)
+        offsets = np.cumsum([0] + [len(s) for s in chunk[:-1]])
+        # a, b, ハッシュ値はいずれも 2^32 未満なので a*h+b は uint64 に収まる
+        permuted = (a * values[None, :] + b) % _PRIME
+        signatures[start:end] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = end
+    return signatures
+
+
+def lsh_params(threshold: float, num_perm: int) -> Tuple[int, int]:
+    """署名を bands x rows に分割する。(1/bands)^(1/rows) が閾値に最も近い組を選ぶ"""
+    candidates = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+    return min(candidates, key=lambda br: abs((1 / br[0]) ** (1 / br[1]) - threshold))
+
+
+def _find(parent: List[int], i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _jaccard(x: np.ndarray, y: np.ndarray) -> float:
+    inter = len(np.intersect1d(x, y, assume_unique=True))
+    return inter / (len(x) + len(y) - inter)
+
+
+def cluster_near_duplicates(texts: Sequence[str], threshold: float = DEFAULT_THRESHOLD,
+                            ngram: int = DEFAULT_NGRAM, num_perm: int = DEFAULT_NUM_PERM) -> List[List[int]]:
+    """類似した文のインデックスをクラスタにまとめる
+
+    LSHで同じバケットに入った文だけを実際のJaccard係数で確認するため、全ペア比較は行わない。
+    """
+    if not texts:
+        return []
+    sets = [shingles(t, ngram) for t in texts]
+    signatures = minhash_signatures(sets, num_perm)
+    bands, rows = lsh_params(threshold, num_perm)
+
+    parent = list(range(len(texts)))
+    band_rng = np.random.RandomState(_SEED + 1)
+    for band in range(bands):
+        # バンド内の行を1つのキーに畳み込み、同じキーの文を先頭の文と比較する
+        multipliers = band_rng.randint(1, 2 ** 32, size=rows, dtype=np.uint64)
+        keys = (signatures[:, band * rows:(band + 1) * rows] * multipliers).sum(axis=1)
+        order = np.argsort(keys, kind="stable")
+        sorted_keys = keys[order]
+        run_start = np.r_[True, sorted_keys[1:] != sorted_keys[:-1]]
+        anchors = order[np.maximum.accumulate(np.where(run_start, np.arange(len(order)), 0))]
+        for anchor, member in zip(anchors[~run_start].tolist(), order[~run_start].tolist()):
+            ra, rm = _find(parent, anchor), _find(parent, member)
+            if ra != rm and _jaccard(sets[anchor], sets[member]) >= threshold:
+                parent[rm] = ra
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(_find(parent, i), []).append(i)
+    return list(clusters.values())
+
+
+def merge_near_duplicates(counts: Dict[str, int], threshold: float = DEFAULT_THRESHOLD,
+                          ngram: int = DEFAULT_NGRAM) -> List[Tuple[str, int]]:
+    """出現回数付きの文を類似文ごとにまとめ、(代表文, 出現回数の合計) を多い順に返す
+
+    代表文はクラスタ内で最も出現回数が多い文（同数なら短い文）。
+    """
+    texts = list(counts)
+    merged = []
+    for cluster in cluster_near_duplicates(texts, threshold, ngram):
+        members = [texts[i] for i in cluster]
+        representative = min(members, key=lambda t: (-counts[t], len(t), t))
+        merged.append((representative, sum(counts[t] for t in members)))
+    return sorted(merged, key=lambda item: (-item[1], item[0]))
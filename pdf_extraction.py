@@ -0,0 +1,268 @@
+import io
+import multiprocessing
+import re
+import signal
+import time
+from collections import deque
+from contextlib import closing
+from typing import Any, Deque, Dict, Hashable, Iterator, List, Optional, Tuple
+
+from keyword_matcher import KeywordMatcher
+from metrics import Metrics
+from report_sections import ReportSegmenter
+
+try:
+    import resource
+except ImportError:  # Windows では使用不可（メモリ上限は設定しない）
+    resource = None
+
+# ==========================================
+# PDFテキスト抽出（ワーカープロセスで実行）
+# ==========================================
+DEFAULT_TIMEOUT_SEC = 60
+DEFAULT_MEMORY_LIMIT_MB = 2048
+DEFAULT_MAX_DOCS_PER_WORKER = 25
+DEFAULT_MAX_PAGES = 20
+# ワーカー内のタイマーが効かない（C拡張内で固まった等）場合に、親側で見切るまでの猶予
+HARD_TIMEOUT_GRACE_SEC = 10
+
+# 抽出結果: (テキスト, エラー種別)。成功時のエラー種別は None
+ExtractionResult = Tuple[str, Optional[str]]
+# 1文書あたりの所要時間の内訳（秒）: {"extract": pdfplumberでの抽出, "normalize": 正規化}
+StageTimings = Dict[str, float]
+ERROR_TIMEOUT = "timeout"
+ERROR_MEMORY = "memory"
+ERROR_FAILED = "error"
+ERROR_EMPTY = "empty"
+
+ALLOWED_CHARS_REGEX = re.compile(
+    r'[^\u4E00-\u9FFF\u3040-\u309F\u30A0-\u30FF\u3000-\u303F\u0020-\u007E\uff10-\uff19\n、。]')
+
+
+def normalize_page_text(text: str, noise_matcher: KeywordMatcher) -> str:
+    """1ページ分のテキストから制御文字・定型文・対象外の文字を取り除く"""
+    text_bytes = text.encode('utf-8', errors='ignore')
+    text = text_bytes.decode('utf-8', errors='ignore')
+
+    text = text.replace('\ufffd', '')
+    text = re.sub(r'[\x00-\x1F\x7F]', '', text)
+    text = text.replace(u'\xa0', u' ').replace('　', ' ')
+
+    text = re.sub(r'\s+', ' ', text).strip()
+
+    text = noise_matcher.remove(text)
+
+    return ALLOWED_CHARS_REGEX.sub('', text)
+
+
+def _new_timings() -> StageTimings:
+    return {"extract": 0.0, "normalize": 0.0}
+
+
+def iter_page_texts(pdf_bytes: bytes, noise_matcher: KeywordMatcher,
+                    max_pages: Optional[int] = DEFAULT_MAX_PAGES,
+                    timings: Optional[StageTimings] = None) -> Iterator[str]:
+    """ページ単位でテキストを正規化して返す。各ページのレイアウト情報は使い終わり次第解放する
+
+    timings を渡すと、抽出・正規化それぞれの所要時間を加算する。
+    """
+    import pdfplumber  # 読み込みが重いため、実際に抽出する時（主にワーカープロセス内）で読み込む
+
+    timings = timings if timings is not None else _new_timings()
+    start = time.perf_counter()
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages[:max_pages]:
+            try:
+                raw = page.extract_text(errors='ignore') or ""
+            finally:
+                page.close()
+            extracted = time.perf_counter()
+            timings["extract"] += extracted - start
+            page_text = normalize_page_text(raw, noise_matcher)
+            start = time.perf_counter()
+            timings["normalize"] += start - extracted
+            yield page_text
+
+
+def _extract_raw(pdf_bytes: bytes, noise_matcher: KeywordMatcher,
+                 max_pages: Optional[int] = DEFAULT_MAX_PAGES,
+                 sections: Optional[ReportSegmenter] = None,
+                 timings: Optional[StageTimings] = None) -> str:
+    text = ""
+    with closing(iter_page_texts(pdf_bytes, noise_matcher, max_pages, timings)) as pages:
+        for page_text in pages:
+            if page_text:
+                text = f"{text} {page_text}" if text else page_text
+            if sections and sections.complete(text):
+                break
+    return text
+
+
+def extract_text(pdf_bytes: bytes, noise_matcher: KeywordMatcher,
+                 max_pages: Optional[int] = DEFAULT_MAX_PAGES,
+                 sections: Optional[ReportSegmenter] = None) -> str:
+    """PDFからテキストを抽出し、強力な文字化け除去を行う
+
+    先頭から最大 max_pages ページを順に読み、sections の見出しが揃った時点で打ち切る。
+    """
+    try:
+        return _extract_raw(pdf_bytes, noise_matcher, max_pages, sections)
+    except Exception:
+        return ""
+
+
+# --- ワーカープロセス側 ---
+class _ExtractionTimeout(BaseException):
+    """except Exception で握りつぶされないよう BaseException から派生させる"""
+
+
+_worker_noise_matcher: Optional[KeywordMatcher] = None
+_worker_timeout: float = DEFAULT_TIMEOUT_SEC
+_worker_max_pages: Optional[int] = DEFAULT_MAX_PAGES
+_worker_sections: Optional[ReportSegmenter] = None
+
+
+def _on_alarm(signum, frame):
+    raise _ExtractionTimeout()
+
+
+def _init_worker(noise_keywords: List[str], timeout: float, memory_limit_mb: Optional[int],
+                 max_pages: Optional[int], sections: Optional[ReportSegmenter]):
+    global _worker_noise_matcher, _worker_timeout, _worker_max_pages, _worker_sections
+    _worker_noise_matcher = KeywordMatcher([(("noise", None), noise_keywords)])
+    _worker_timeout = timeout
+    _worker_max_pages = max_pages
+    _worker_sections = sections
+    if hasattr(signal, "setitimer"):
+        signal.signal(signal.SIGALRM, _on_alarm)
+    if resource is not None and memory_limit_mb:
+        limit = memory_limit_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+
+def _extract_job(pdf_bytes: bytes) -> Tuple[str, Optional[str], StageTimings]:
+    use_alarm = hasattr(signal, "setitimer")
+    timings = _new_timings()
+    try:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, _worker_timeout)
+        text = _extract_raw(pdf_bytes, _worker_noise_matcher, _worker_max_pages, _worker_sections, timings)
+        return text, None, timings
+    except _ExtractionTimeout:
+        return "", ERROR_TIMEOUT, timings
+    except MemoryError:
+        return "", ERROR_MEMORY, timings
+    except Exception:
+        return "", ERROR_FAILED, timings
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+# --- 親プロセス側 ---
+class PdfExtractionPool:
+    """PDFテキスト抽出を並列実行し、結果を投入順に返すワーカープロセスプール
+
+    - 1文書ごとに実行時間の上限(timeout)を設け、超えたものは打ち切る
+    - ワーカーのアドレス空間に上限(memory_limit_mb)を設ける
+    - ワーカーは max_docs_per_worker 件処理するごとに作り直す
+    - 各文書は最大 max_pages ページまで読み、sections の見出しが揃った時点で打ち切る
+    - metrics を渡すと、文書ごとの抽出・正規化の所要時間とエラー件数を記録する
+    """
+
+    def __init__(self, noise_keywords: List[str], workers: Optional[int] = None,
+                 timeout: float = DEFAULT_TIMEOUT_SEC,
+                 memory_limit_mb: Optional[int] = DEFAULT_MEMORY_LIMIT_MB,
+                 max_docs_per_worker: int = DEFAULT_MAX_DOCS_PER_WORKER,
+                 max_pages: Optional[int] = DEFAULT_MAX_PAGES,
+                 sections: Optional[ReportSegmenter] = None,
+                 metrics: Optional[Metrics] = None):
+        self.workers = workers or multiprocessing.cpu_count()
+        self.timeout = timeout
+        self._initargs = (list(noise_keywords), timeout, memory_limit_mb, max_pages, sections)
+        self._max_docs_per_worker = max_docs_per_worker
+        self._metrics = metrics
+        # Streamlitのサーバープロセスはスレッドを多数抱えているため fork ではなく spawn を使う
+        self._ctx = multiprocessing.get_context("spawn")
+        self._pool = self._new_pool()
+        # 投入順の待ち行列: [キー, PDFバイト列（結果が確定したら手放す）, AsyncResult または確定済みの結果, バイト数]
+        self._pending: Deque[List[Any]] = deque()
+
+    def _new_pool(self):
+        return self._ctx.Pool(self.workers, initializer=_init_worker, initargs=self._initargs,
+                              maxtasksperchild=self._max_docs_per_worker)
+
+    def submit(self, key: Hashable, pdf_bytes: Optional[bytes]):
+        """抽出を投入する。pdf_bytes が空の場合は即座に ERROR_EMPTY として扱う"""
+        if pdf_bytes:
+            self._pending.append([key, pdf_bytes, self._pool.apply_async(_extract_job, (pdf_bytes,)), len(pdf_bytes)])
+        else:
+            self._pending.append([key, None, ("", ERROR_EMPTY, None), 0])
+
+    @staticmethod
+    def _is_done(entry: List[Any]) -> bool:
+        return isinstance(entry[2], tuple) or entry[2].ready()
+
+    def _restart(self):
+        """固まったワーカーごとプールを作り直し、未完了の文書を投入し直す"""
+        self._pool.terminate()
+        self._pool.join()
+        self._pool = self._new_pool()
+        for entry in self._pending:
+            if not isinstance(entry[2], tuple):
+                entry[2] = self._pool.apply_async(_extract_job, (entry[1],))
+
+    def _settle(self):
+        # 先頭が未完了でも、完了済みの文書は結果を確定させてPDFバイト列を手放す（再投入はもう不要）
+        for entry in self._pending:
+            if not isinstance(entry[2], tuple) and entry[2].ready():
+                entry[2] = entry[2].get()
+                entry[1] = None
+
+    def _record(self, nbytes: int, error: Optional[str], timings: Optional[StageTimings]):
+        if self._metrics is None:
+            return
+        if error:
+            self._metrics.inc(f"extract_{error}")
+        if timings is not None:
+            self._metrics.observe("extract", timings["extract"], nbytes)
+            self._metrics.observe("normalize", timings["normalize"])
+
+    def _pop_head(self, block: bool) -> ExtractionResult:
+        entry = self._pending[0]
+        if isinstance(entry[2], tuple):
+            text, error, timings = entry[2]
+        else:
+            try:
+                text, error, timings = entry[2].get(timeout=self.timeout + HARD_TIMEOUT_GRACE_SEC if block else 0)
+            except multiprocessing.TimeoutError:
+                self._pending.popleft()
+                self._restart()
+                self._record(entry[3], ERROR_TIMEOUT, None)
+                return "", ERROR_TIMEOUT
+        self._pending.popleft()
+        self._record(entry[3], error, timings)
+        return text, error
+
+    def iter_ready(self) -> Iterator[Tuple[Hashable, ExtractionResult]]:
+        """投入順で先頭から完了済みのものだけを返す（ブロックしない）"""
+        self._settle()
+        while self._pending and self._is_done(self._pending[0]):
+            key = self._pending[0][0]
+            yield key, self._pop_head(block=False)
+
+    def iter_results(self, leave: int = 0) -> Iterator[Tuple[Hashable, ExtractionResult]]:
+        """未回収の文書が leave 件になるまで、結果を投入順に待って返す（既定は残りすべて）"""
+        while len(self._pending) > leave:
+            key = self._pending[0][0]
+            yield key, self._pop_head(block=True)
+
+    def close(self):
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
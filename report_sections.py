@@ -0,0 +1,90 @@
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from keyword_matcher import KeywordMatcher
+
+# ==========================================
+# 報告書テキストの見出しによる区切り
+# ==========================================
+# 項目の定義: 項目名 -> (見出し候補（先に書いたものを優先）, 本文の最大文字数)
+SectionFields = Dict[str, Tuple[Sequence[str], int]]
+# 区切り: (見出し, 見出しの位置, 本文の開始位置, 本文の終了位置 = 次の見出しの位置かテキストの末尾)
+Section = Tuple[str, int, int, int]
+# 項目の本文の範囲: (開始位置, 終了位置)
+Span = Tuple[int, int]
+
+
+class ReportSegmenter:
+    """報告書テキストを見出しで区切り、項目ごとの本文の範囲を返す
+
+    すべての見出しを1つの正規表現で1回だけ走査し、テキストは切り出す本文の分しかコピーしない。
+    各項目の最優先の見出しの本文が確定した時点で走査を打ち切るため、長い報告書でも後ろのページは読まない。
+    長い見出しを優先するため「原因分析」の中の「原因」は見出しとして扱わない。
+    各項目の本文は、次の見出し（種類を問わない）の手前か最大文字数までとする。
+    """
+
+    def __init__(self, fields: SectionFields, boundaries: Iterable[str] = ()):
+        self.fields = {field: (list(markers), window) for field, (markers, window) in fields.items()}
+        headings = [m for markers, _ in self.fields.values() for m in markers] + list(boundaries)
+        self._primary = frozenset(markers[0] for markers, _ in self.fields.values() if markers)
+        self._matcher = KeywordMatcher([("heading", headings)])
+
+    def _iter_sections(self, text: str) -> Iterator[Section]:
+        # 区切りは次の見出しが見つかった時点（最後のものはテキストの末尾で）返す
+        previous = None
+        body_start = 0
+        for start, end, heading in self._matcher.finditer(text):
+            # 見出し同士が重なる位置では先に一致したものだけを見出しとする
+            if start < body_start:
+                continue
+            if previous is not None:
+                yield previous + (start,)
+            previous = (heading, start, end)
+            body_start = end
+        if previous is not None:
+            yield previous + (len(text),)
+
+    def segment(self, text: str) -> List[Section]:
+        """テキスト中のすべての見出しの区切りを出現順に返す"""
+        return list(self._iter_sections(text))
+
+    def _first_sections(self, text: str) -> Dict[str, Section]:
+        # 見出しごとに最初の区切り。各項目の最優先の見出しが揃えば、それより後ろは結果に影響しない
+        first: Dict[str, Section] = {}
+        remaining = set(self._primary)
+        for section in self._iter_sections(text):
+            first.setdefault(section[0], section)
+            remaining.discard(section[0])
+            if not remaining:
+                break
+        return first
+
+    def spans(self, text: str) -> Dict[str, Span]:
+        """見つかった項目ごとの本文の範囲（見出しが無い項目は含めない）"""
+        first = self._first_sections(text)
+        spans: Dict[str, Span] = {}
+        for field, (markers, window) in self.fields.items():
+            section = _pick(first, markers)
+            if section is not None:
+                _, _, body_start, body_end = section
+                spans[field] = (body_start, min(body_end, body_start + window))
+        return spans
+
+    def extract(self, text: str) -> Dict[str, str]:
+        """見つかった項目ごとの本文"""
+        return {field: text[start:end] for field, (start, end) in self.spans(text).items()}
+
+    def complete(self, text: str) -> bool:
+        """すべての項目の見出しが見つかり、その本文も揃っているか（続きを読んでも結果が変わらないか）"""
+        first = self._first_sections(text)
+        # 次の見出しが現れているか、最大文字数が揃っていれば本文はそれ以上伸びない
+        return all(
+            any(m in first and (first[m][3] < len(text) or len(text) - first[m][2] >= window) for m in markers)
+            for markers, window in self.fields.values()
+        )
+
+
+def _pick(first: Dict[str, Section], markers: Sequence[str]) -> Optional[Section]:
+    for marker in markers:
+        if marker in first:
+            return first[marker]
+    return None
@@ -0,0 +1,200 @@
+import math
+import re
+import sqlite3
+import unicodedata
+from array import array
+from collections import Counter
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Tuple
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# ==========================================
+# 全文検索（文字2-gram転置インデックス）
+# ==========================================
+# 日本語は空白で単語に区切れないため、文字2-gramごとにインシデントIDの一覧(ポスティング)を持つ。
+# ポスティングはIDを BLOCK_SIZE 件ごとのブロックに分けて保存し、追記時は末尾のブロックだけを書き換える。
+# 検索語の2-gramをすべて含むIDを候補とし、3文字以上の語は本文に実際に含まれるかを確認する。
+# numpy は検索時にだけ読み込む（インシデントストアを開くだけのビューアでは読み込まない）。
+INDEX_VERSION = 1  # 正規化・2-gramの取り方を変えたら上げる（次回起動時に作り直す）
+BLOCK_SIZE = 4096
+MAX_TF = 0xFFFF
+SEARCH_FIELDS = ("description", "cause", "prevention")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_postings (
+    gram TEXT NOT NULL,
+    block INTEGER NOT NULL,
+    ids BLOB NOT NULL,
+    tfs BLOB NOT NULL,
+    PRIMARY KEY (gram, block)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS search_documents (
+    id INTEGER PRIMARY KEY,
+    incident_type TEXT,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_search_documents_type ON search_documents (incident_type);
+"""
+
+# 検索語: "..." で囲んだ部分は空白を含めて1語、それ以外は空白区切り（すべての語を含むものを返す）
+_QUERY_TERM_REGEX = re.compile(r'"([^"]+)"|(\S+)')
+_SPACES_REGEX = re.compile(r"\s+")
+_IN_CHUNK = 500
+
+
+def normalize(text: str) -> str:
+    """全角・半角や大文字・小文字の違いを吸収し、空白を1つにまとめる"""
+    return _SPACES_REGEX.sub(" ", unicodedata.normalize("NFKC", text or "").lower()).strip()
+
+
+def document_text(record: Dict) -> str:
+    # 末尾にも区切りを置き、どの文字も必ずいずれかの2-gramの先頭になるようにする（1文字検索用）
+    return "".join(normalize(record.get(field, "")) + "\n" for field in SEARCH_FIELDS)
+
+
+def gram_counts(text: str) -> Counter:
+    return Counter(text[i:i + 2] for i in range(len(text) - 1))
+
+
+def parse_query(query: str) -> List[str]:
+    """検索文字列を正規化した検索語のリストにする"""
+    terms = []
+    for quoted, word in _QUERY_TERM_REGEX.findall(query or ""):
+        term = normalize(quoted or word)
+        if term:
+            terms.append(term)
+    return terms
+
+
+# --- インデックスの更新 ---
+def add_documents(conn: sqlite3.Connection, docs: Iterable[Tuple[int, Optional[str], Dict]]):
+    """(ID, 種別, レコード) をインデックスに追加する。ID は既存のものより大きいこと"""
+    new_ids: Dict[Tuple[str, int], array] = {}
+    new_tfs: Dict[Tuple[str, int], array] = {}
+    rows = []
+    for doc_id, incident_type, record in docs:
+        text = document_text(record)
+        rows.append((doc_id, incident_type, text))
+        block = doc_id // BLOCK_SIZE
+        for gram, tf in gram_counts(text).items():
+            key = (gram, block)
+            if key not in new_ids:
+                new_ids[key] = array("I")
+                new_tfs[key] = array("H")
+            new_ids[key].append(doc_id)
+            new_tfs[key].append(min(tf, MAX_TF))
+    if not rows:
+        return
+    conn.executemany("INSERT OR REPLACE INTO search_documents (id, incident_type, text) VALUES (?, ?, ?)", rows)
+
+    # 既存のブロックがあれば後ろに連結して書き戻す（追記ではほぼ末尾のブロックだけが対象になる）
+    grams_by_block: Dict[int, List[str]] = {}
+    for gram, block in new_ids:
+        grams_by_block.setdefault(block, []).append(gram)
+    updates = []
+    for block, grams in grams_by_block.items():
+        existing = {}
+        for start in range(0, len(grams), _IN_CHUNK):
+            chunk = grams[start:start + _IN_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            existing.update((gram, (ids, tfs)) for gram, ids, tfs in conn.execute(
+                f"SELECT gram, ids, tfs FROM search_postings WHERE block = ? AND gram IN ({placeholders})",
+                [block, *chunk]))
+        for gram in grams:
+            ids, tfs = new_ids[(gram, block)].tobytes(), new_tfs[(gram, block)].tobytes()
+            if gram in existing:
+                old_ids, old_tfs = existing[gram]
+                ids, tfs = old_ids + ids, old_tfs + tfs
+            updates.append((gram, block, ids, tfs))
+    conn.executemany("INSERT OR REPLACE INTO search_postings (gram, block, ids, tfs) VALUES (?, ?, ?, ?)", updates)
+
+
+def clear(conn: sqlite3.Connection):
+    conn.execute("DELETE FROM search_postings")
+    conn.execute("DELETE FROM search_documents")
+
+
+# --- 検索 ---
+def _postings(conn: sqlite3.Connection, gram: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    import numpy as np
+    rows = conn.execute("SELECT ids, tfs FROM search_postings WHERE gram = ? ORDER BY block", (gram,)).fetchall()
+    if not rows:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+    return (np.frombuffer(b"".join(r[0] for r in rows), dtype=np.uint32),
+            np.frombuffer(b"".join(r[1] for r in rows), dtype=np.uint16))
+
+
+def _prefix_postings(conn: sqlite3.Connection, char: str) -> Tuple["np.ndarray", "np.ndarray"]:
+    import numpy as np
+    # 1文字の語は、その文字で始まる2-gramのポスティングの和集合（出現回数は合算）
+    rows = conn.execute("SELECT ids, tfs FROM search_postings WHERE gram >= ? AND gram < ?",
+                        (char, chr(ord(char) + 1))).fetchall()
+    if not rows:
+        return np.zeros(0, dtype=np.uint32), np.zeros(0, dtype=np.uint16)
+    ids = np.concatenate([np.frombuffer(r[0], dtype=np.uint32) for r in rows])
+    tfs = np.concatenate([np.frombuffer(r[1], dtype=np.uint16) for r in rows]).astype(np.uint32)
+    unique_ids, inverse = np.unique(ids, return_inverse=True)
+    return unique_ids, np.minimum(np.bincount(inverse, weights=tfs), MAX_TF).astype(np.uint16)
+
+
+def _term_postings(conn: sqlite3.Connection, term: str) -> List[Tuple["np.ndarray", "np.ndarray"]]:
+    if len(term) == 1:
+        return [_prefix_postings(conn, term)]
+    return [_postings(conn, gram) for gram in dict.fromkeys(term[i:i + 2] for i in range(len(term) - 1))]
+
+
+def _filter_ids(conn: sqlite3.Connection, sql: str, ids: "np.ndarray", params: Sequence = ()) -> "np.ndarray":
+    import numpy as np
+    found = []
+    for start in range(0, len(ids), _IN_CHUNK):
+        chunk = ids[start:start + _IN_CHUNK].tolist()
+        placeholders = ",".join("?" * len(chunk))
+        found.extend(row[0] for row in conn.execute(sql.format(placeholders=placeholders), [*params, *chunk]))
+    return np.array(sorted(found), dtype=np.uint32)
+
+
+def search(conn: sqlite3.Connection, query: str, incident_type: Optional[str] = None,
+           limit: int = 20, offset: int = 0) -> Tuple[int, List[Tuple[int, float]]]:
+    """すべての検索語を含むインシデントを関連度順に返す: (総件数, [(ID, スコア), ...])
+
+    スコアは検索語の各2-gramについて idf x log(1 + 出現回数) を合計したもの。同点は新しい順。
+    """
+    import numpy as np
+
+    terms = parse_query(query)
+    if not terms:
+        return 0, []
+    total_docs = conn.execute("SELECT COUNT(*) FROM search_documents").fetchone()[0]
+
+    postings = [p for term in terms for p in _term_postings(conn, term)]
+    # 件数の少ないポスティングから順に積集合をとる
+    candidates: Optional[np.ndarray] = None
+    for ids, _ in sorted(postings, key=lambda p: len(p[0])):
+        candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+        if len(candidates) == 0:
+            return 0, []
+
+    # 種別の絞り込みと、3文字以上の語が本文に続けて現れるかの確認（2-gramをすべて含んでも語句とは限らない）を
+    # 候補に対する1回の問い合わせでまとめて行う
+    conditions, params = [], []
+    if incident_type is not None:
+        conditions.append("incident_type = ?")
+        params.append(incident_type)
+    for term in terms:
+        if len(term) >= 3:
+            conditions.append("instr(text, ?) > 0")
+            params.append(term)
+    if conditions:
+        candidates = _filter_ids(
+            conn, f"SELECT id FROM search_documents WHERE {' AND '.join(conditions)} AND id IN ({{placeholders}})",
+            candidates, params)
+    if len(candidates) == 0:
+        return 0, []
+
+    scores = np.zeros(len(candidates))
+    for ids, tfs in postings:
+        idf = math.log(1 + total_docs / len(ids))
+        scores += idf * np.log1p(tfs[np.searchsorted(ids, candidates)].astype(np.float64))
+    order = np.lexsort((-candidates.astype(np.int64), -scores))[offset:offset + limit]
+    return len(candidates), [(int(candidates[i]), float(scores[i])) for i in order]
@@ -0,0 +1,101 @@
+"""巡回のエンドツーエンド確認: http.server で配信するローカルのミラーを、中断・再開しながら巡回する
+
+benchmarks/bench_crawl.py と同じサイトを小さくして使い、中断・再開・robots.txt・範囲・
+ホストごとの間隔・巡回後の条件付きGETによる再検証を確かめる。
+"""
+import time
+from collections import Counter
+
+import pytest
+
+import core
+import fetcher
+from benchmarks.bench_crawl import build_site
+from benchmarks.local_server import serve_directory
+
+PAGES = 6
+PDFS_PER_PAGE = 2
+FIRST_RUN_PAGES = 3
+INTERVAL = 0.03
+
+
+@pytest.fixture(scope="module")
+def crawl(tmp_path_factory):
+    """サイトを配信して3回巡回し、(サーバーのリクエストログ, 2・3回目の開始位置, 間隔制御を通過した時刻, PDF数) を返す"""
+    site = tmp_path_factory.mktemp("site")
+    workdir = tmp_path_factory.mktemp("work")
+    total_pdfs = build_site(str(site), PAGES, PDFS_PER_PAGE)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        # データセット・巡回状態・キャッシュはすべて作業ディレクトリに作る
+        monkeypatch.chdir(workdir)
+        core.get_http_cache.cache_clear()
+        yield _crawl_three_times(str(site), total_pdfs, monkeypatch)
+        core.get_http_cache.cache_clear()
+
+
+def _crawl_three_times(site: str, total_pdfs: int, monkeypatch):
+    # 間隔はクライアント側で、間隔制御を通過した（リクエストを開始する）時刻で確かめる。
+    # サーバー側で受けた時刻は、送信するスレッドの切り替え待ちで数十ms ずれることがある
+    turns = []
+    wait_turn = fetcher.HostLimiter._wait_turn
+
+    def recording_wait_turn(self, host):
+        wait_turn(self, host)
+        turns.append(time.monotonic())
+
+    monkeypatch.setattr(fetcher.HostLimiter, "_wait_turn", recording_wait_turn)
+
+    log = []
+    with serve_directory(site, request_log=log) as base_url:
+        options = dict(concurrency=4, seeds=[base_url + "report/index.html"], min_interval=INTERVAL)
+        core.scrape_and_update_dataset(total_pdfs, max_pages=FIRST_RUN_PAGES, **options)
+        resumed = len(log)
+        core.scrape_and_update_dataset(total_pdfs, max_pages=None, **options)
+        rerun = len(log)
+        core.scrape_and_update_dataset(total_pdfs, max_pages=None, **options)
+    return log, (resumed, rerun), turns, total_pdfs
+
+
+def test_crawl_resumes_and_fetches_everything_once(crawl):
+    log, (_, rerun), _, total_pdfs = crawl
+    paths = Counter(path for _, path in log[:rerun])
+    pages = {p: n for p, n in paths.items() if p.endswith(".html")}
+    pdfs = {p: n for p, n in paths.items() if p.endswith(".pdf")}
+    assert len(pages) == PAGES + 1
+    # 中断・再開しても索引ページ・PDFを取り直さない
+    assert all(n == 1 for n in pages.values()), pages
+    assert len(pdfs) == total_pdfs and all(n == 1 for n in pdfs.values()), pdfs
+    assert core.get_incident_store().count() == total_pdfs
+    assert core.get_crawl_frontier().summary()["pdf"].get("done") == total_pdfs
+
+
+def test_crawl_first_run_stops_at_max_pages(crawl):
+    log, (resumed, _), _, _ = crawl
+    assert sum(1 for _, path in log[:resumed] if path.endswith(".html")) == FIRST_RUN_PAGES
+
+
+def test_crawl_respects_robots_and_scope(crawl):
+    log, _, _, _ = crawl
+    paths = [path for _, path in log]
+    assert not any(p.startswith("/private/") for p in paths)
+    # 範囲外のリンク（別ホスト）はローカルのサーバーに届かず、画像などPDF以外のファイルも取得しない
+    assert not any(p.endswith(".png") for p in paths)
+    summary = core.get_crawl_frontier().summary()
+    assert sum(counts.get("disallowed", 0) for counts in summary.values()) > 0
+
+
+def test_crawl_keeps_per_host_interval(crawl):
+    _, _, turns, _ = crawl
+    gaps = [b - a for a, b in zip(turns, turns[1:])]
+    # 開始予定時刻は INTERVAL ずつ空けて確保される。sleep が予定より遅れて戻ったスレッドの次は
+    # その分だけ間隔が短く見えるため、数ms の余裕をみる（間隔制御が効いていなければ 0 に近くなる）
+    assert gaps and min(gaps) >= INTERVAL - 0.01, min(gaps)
+    assert turns[-1] - turns[0] >= (len(turns) - 1) * INTERVAL
+
+
+def test_recrawl_only_revalidates_index_pages(crawl):
+    log, (_, rerun), _, _ = crawl
+    again = [path for _, path in log[rerun:]]
+    # 巡回が終わった後は、索引ページを条件付きGETで再検証するだけで PDF は取得しない
+    assert not any(p.endswith(".pdf") for p in again)
+    assert core.get_http_cache().summary()["hits"] == sum(1 for p in again if p.endswith(".html")) > 0
@@ -0,0 +1,55 @@
+"""取り込み時の重複排除: 除外した文書は内容の重複判定に使わない"""
+import sqlite3
+
+import pytest
+
+import core
+from benchmarks.corpus import make_fixture_pdfs
+from benchmarks.pdf_fixtures import make_pdf
+from incident_store import IncidentStore
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # データセット・計測値などは作業ディレクトリに作られる
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+def _fixture_pdf() -> bytes:
+    return make_fixture_pdfs(1, garbled_ratio=0)[0]
+
+
+def test_rejected_upload_keeps_its_reason_on_reupload(workdir):
+    short = make_pdf(["概要 短い報告"])
+    _, results = core.ingest_uploaded_files([("short.pdf", short)], workers=1)
+    assert results == [("short.pdf", core.OUTCOME_TOO_SHORT)]
+    _, results = core.ingest_uploaded_files([("short.pdf", short), ("again.pdf", short)], workers=1)
+    assert results == [("short.pdf", core.OUTCOME_TOO_SHORT), ("again.pdf", core.OUTCOME_TOO_SHORT)]
+    assert core.get_incident_store().duplicates_skipped() == 0
+
+
+def test_accepted_upload_is_a_duplicate_on_reupload(workdir):
+    pdf = _fixture_pdf()
+    records, results = core.ingest_uploaded_files([("report.pdf", pdf)], workers=1)
+    assert len(records) == 1 and results == [("report.pdf", core.OUTCOME_ACCEPTED)]
+    records, results = core.ingest_uploaded_files([("copy.pdf", pdf)], workers=1)
+    assert records == [] and results == [("copy.pdf", core.OUTCOME_DUPLICATE)]
+
+
+def test_known_hashes_ignores_rejected_documents(tmp_path):
+    store = IncidentStore(str(tmp_path / "store.sqlite3"))
+    store.append([], documents=[("a", "h1", True), ("b", "h2", False)])
+    assert store.known_hashes(["h1", "h2"]) == {"h1"}
+    # 取得元は除外した文書も取り込み済みとして扱う（巡回で取り直さない）
+    assert store.known_sources(["a", "b", "c"]) == {"a", "b"}
+
+
+def test_legacy_documents_table_is_migrated(tmp_path):
+    path = str(tmp_path / "store.sqlite3")
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE ingested_documents (source TEXT PRIMARY KEY, content_hash TEXT NOT NULL)")
+        conn.execute("INSERT INTO ingested_documents VALUES ('a', 'h1')")
+    store = IncidentStore(path)
+    # 列が無かった頃の行は追加した文書として扱う
+    assert store.known_hashes(["h1"]) == {"h1"}
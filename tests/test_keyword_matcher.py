@@ -0,0 +1,125 @@
+"""KeywordMatcher / RankedKeywordMatcher と、置き換える前の部分文字列検索による実装との一致確認"""
+import random
+import re
+
+import pytest
+
+import core
+from keyword_matcher import KeywordMatcher, RankedKeywordMatcher
+
+FILLER = "患者に対して処置を行った際に看護師が気づいたがそのまま実施した事例である。病棟では夜勤帯で人手が少なく"
+# 重なり合う・互いに接頭辞になるキーワード（「血液」⊂「血液製剤」、「ABC」と「BCD」の重なりなど）
+OVERLAPPING_GROUPS = [
+    ("blood", ["血液", "血液製剤", "血液型"]),
+    ("drug", ["製剤", "液製"]),
+    ("abc", ["ABC", "AB", "ABCD"]),
+    ("bcd", ["BCD", "CDE", "C"]),
+]
+
+
+# --- 変更前の実装 ---
+def _legacy_classify_procedure(text: str) -> str:
+    if not text:
+        return "その他"
+    for proc, words in core.PROCEDURES.items():
+        if any(w in text for w in words):
+            return proc
+    return "その他"
+
+
+def _legacy_extract_action_items(prevention_text: str):
+    actions = []
+    for s in re.split(r'[。\n]', prevention_text):
+        s = s.strip()
+        if not s: continue
+        if len(s) < 5 or len(s) > 100: continue
+        if any(noise in s for noise in core.NOISE_KEYWORDS): continue
+        if any(action in s for action in core.ACTION_KEYWORDS):
+            cleaned_s = re.sub(r'[、。]$', '', s)
+            cleaned_s = re.sub(r'^[-\d\.\s・]+', '', cleaned_s).strip()
+            actions.append(cleaned_s)
+    return actions
+
+
+def _legacy_remove_noise(text: str, keywords) -> str:
+    for noise in keywords:
+        text = text.replace(noise, '')
+    return text
+
+
+def _make_text(rng: random.Random, length: int) -> str:
+    keywords = [w for ws in core.PROCEDURES.values() for w in ws] + core.ACTION_KEYWORDS + core.NOISE_KEYWORDS
+    out = []
+    while sum(map(len, out)) < length:
+        out.append(rng.choice(keywords) if rng.random() < 0.1 else FILLER[rng.randrange(len(FILLER) - 8):][:8])
+        if rng.random() < 0.1:
+            out.append(rng.choice("。\n"))
+    return "".join(out)[:length]
+
+
+@pytest.fixture(scope="module")
+def texts():
+    rng = random.Random(0)
+    return [_make_text(rng, length) for length in (0, 5, 50, 200, 3000) for _ in range(200)]
+
+
+def test_classify_procedure_matches_legacy(texts):
+    assert [core.classify_procedure(t) for t in texts] == [_legacy_classify_procedure(t) for t in texts]
+
+
+def test_extract_action_items_matches_legacy(texts):
+    assert [core.extract_action_items(t) for t in texts] == [_legacy_extract_action_items(t) for t in texts]
+
+
+def test_noise_removal_matches_legacy_for_separate_keywords():
+    # 他のキーワードを含まないキーワードが区切られて現れる場合は、旧実装と同じ結果になる
+    keywords = core.PDF_NOISE_KEYWORDS
+    minimal = [k for k in keywords if not any(k != j and j in k for j in keywords)]
+    rng = random.Random(1)
+    for _ in range(500):
+        text = "＿".join(rng.choice(minimal) if rng.random() < 0.3 else FILLER[:rng.randrange(1, 12)]
+                        for _ in range(rng.randrange(1, 20)))
+        assert core.NOISE_MATCHER.remove(text) == _legacy_remove_noise(text, keywords)
+
+
+def test_noise_removal_prefers_longest_keyword():
+    # 旧実装は1語ずつ順に置換するため、短い方のキーワードだけを消して「おります」を残すことがあった
+    text = "本報告は情報提供と位置づけております。"
+    assert _legacy_remove_noise(text, core.PDF_NOISE_KEYWORDS) != "本報告は。"
+    assert core.NOISE_MATCHER.remove(text) == "本報告は。"
+
+
+def test_noise_matcher_keeps_report_headings():
+    text = "概要 輸血を実施した。 原因 確認不足。 対策 照合する。"
+    assert core.NOISE_MATCHER.remove(text) == text
+
+
+def test_labels_match_substring_search_with_overlapping_keywords():
+    matcher = KeywordMatcher(OVERLAPPING_GROUPS)
+    rng = random.Random(2)
+    alphabet = "".join({ch for _, words in OVERLAPPING_GROUPS for w in words for ch in w}) + "xy"
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(0, 12)))
+        expected = {label for label, words in OVERLAPPING_GROUPS if any(w in text for w in words)}
+        assert matcher.labels(text) == expected, text
+
+
+def test_first_label_matches_ranked_substring_search():
+    matcher = RankedKeywordMatcher(OVERLAPPING_GROUPS)
+    rng = random.Random(3)
+    alphabet = "".join({ch for _, words in OVERLAPPING_GROUPS for w in words for ch in w}) + "xy"
+    for _ in range(2000):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randrange(0, 12)))
+        expected = next((label for label, words in OVERLAPPING_GROUPS if any(w in text for w in words)), None)
+        assert matcher.first_label(text) == expected, text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("血液製剤", {"blood", "drug"}),
+    ("ABCDE", {"abc", "bcd"}),
+    ("AB", {"abc"}),
+    ("xyz", set()),
+    ("", set()),
+])
+def test_labels_examples(text, expected):
+    assert KeywordMatcher(OVERLAPPING_GROUPS).labels(text) == expected